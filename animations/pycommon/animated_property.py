@@ -1,5 +1,10 @@
-from itertools import chain
+from bisect import bisect_right
+from collections.abc import Sequence
+from itertools import chain, count, islice
+import math
 import sys
+from time import perf_counter
+from . import batch, frame_cache, profiling
 from .maths import Point
 
 
@@ -21,13 +26,14 @@ def is_iterator(obj):
 
 class AnimatedProperty:
 
-    def dynamic_property(self, name, initial_value=0):
+    def dynamic_property(self, name, initial_value=0, depends_on=None):
         def decorator_func(func):
             self.register_child_property(
                 name,
                 initial_value,
                 property_type="dynamic",
-                dynamic_updater=func)
+                dynamic_updater=func,
+                depends_on=depends_on)
         return decorator_func
 
     def terminator(self):
@@ -39,6 +45,8 @@ class AnimatedProperty:
 
         """Represents a single frame in an AnimatedProperty"""
 
+        __slots__ = ('props', 'ap', 'frame_num')
+
         def __init__(self, props, ap, frame_num=None):
             """
             :props: a dictionary where each key is the property name, and value is the data,
@@ -52,58 +60,20 @@ class AnimatedProperty:
             self.frame_num = frame_num
 
         def get_frame_data(self):
-            return self.ap.get_frame_data(self)
-
-    def _get_snapshot(self, property_states, frame_num=None):
-        """returns a PropertyFrame as a snapshot for a property_states object
-
-        :property_states: a dictionary where each key is the name of the property, and the value is a dictionary containing a 'value' property: for static and dynamic, this is the actual value. For animated, it is a PropertyFrame.
-        :returns: a PropertyFrame object.
-
-        """
-        return self.PropertyFrame(
-            props={
-                k: v['value'] for k,
-                v in property_states.items()},
-            ap=self,
-            frame_num=frame_num)
-
-    def _advance_animated_and_iterated_property(
-            self, property_states, property_name):
-        """ advance the specified animated property, set value to the yielded value, handle StopIteration error based on the end_action
-
-        :property_states: a dictionary where each key is the name of the property, and the value is a dictionary containing an 'iterator' property
-                {
-                    type: animated or iterated
-                    iterator: the iterator to be advanced
-                    value: the current value as a PropertyFrame
-                    end_action: same as in register_child_property
-                    end_value: same as in register_child_property
-                }
-        :returns: the yielded object from the iterator, None if unavailable.
-        :raises: a StopIteration error if the specified property terminates and its end_action is 'terminate'
-
-        """
-        prop = property_states[property_name]
-        iterator = prop['iterator']
-        if not is_iterator(iterator):
-            raise ValueError(
-                f"The 'iterator' slot of [{property_name}] does not have an iterator: {iterator}")
-        try:
-            next_value = next(iterator)
-            prop['value'] = next_value
-            return next_value
-        except StopIteration:
-            if prop['end_action'] == 'terminate':
-                raise
-            elif prop['end_action'] == 'drop':
-                del property_states[property_name]
-            elif prop['end_action'] == 'keep':
-                pass
-            elif prop['end_action'] == 'end_value':
-                prop['value'] = prop['end_value']
-            else:
-                raise ValueError(f"unknown end_action [{prop['end_action']}]")
+            cache = frame_cache.active_cache()
+            if cache is not None:
+                return cache.get_frame_data(self)
+            return self._build_frame_data()
+
+        def _build_frame_data(self):
+            profiler = profiling.active_profiler()
+            if profiler is None:
+                return self.ap.get_frame_data(self)
+            start = perf_counter()
+            try:
+                return self.ap.get_frame_data(self)
+            finally:
+                profiler.node_of(self.ap).add('get_frame_data', perf_counter() - start)
 
     def get_frame_data(self, property_frame):
         """ should be defined in subclass, used to generate the frame data in the final animation.
@@ -126,6 +96,8 @@ class AnimatedProperty:
         # { 'prop_name': { 'seed': ..., 'type': "animated|static|dynamic", 'end_action', 'end_value' }, ... }
         self.__prop_map = {}
         self.__terminators = []
+        # the number of frames set by end_at
+        self.__max_frames = math.inf
 
     # @property
     # def prop_map(self):
@@ -139,7 +111,8 @@ class AnimatedProperty:
             property_type="auto",
             end_action="terminate",
             end_value=0,
-            dynamic_updater=None):
+            dynamic_updater=None,
+            depends_on=None):
         """ to be called by subclass to register an AnimatedProperty to be used in the current AnimatedProperty
 
         :name: the name of the property
@@ -159,6 +132,10 @@ class AnimatedProperty:
                 terminate means terminating the parent animation when the child property ends.
         :end_value: the value to be used when the property terminates, only effective when `end_action` is set to 'value'
         :dynamic_updater: a function with the following signature dynamic_updater(property_frame): new_value, used to update dynamic values
+        :depends_on: the names of the properties the dynamic_updater reads, None if unknown.
+                When specified, the updater is only called again once one of them has changed since its last call,
+                the value being kept otherwise. Values are compared with ==, changes made in place are not detected.
+                The updater must not read anything else, including its own previous value.
         :returns: None
 
         """
@@ -196,13 +173,17 @@ class AnimatedProperty:
                 raise ValueError(
                     f"Failed to register iterated property [{name}], "
                     f"because the dynamic_updater is either not specified or not callable")
+        elif depends_on is not None:
+            raise ValueError(f"Failed to register property [{name}], only dynamic properties have dependencies")
 
         self.__prop_map[name] = {
             "type": property_type,
             "seed": prop,
+            "segments": [prop],
             "end_action": end_action,
             "end_value": end_value,
-            "dynamic_updater": dynamic_updater
+            "dynamic_updater": dynamic_updater,
+            "depends_on": None if depends_on is None else tuple(depends_on)
         }
 
     def append_child_property(self, name, prop):
@@ -216,10 +197,9 @@ class AnimatedProperty:
         property_type = self.__prop_map[name]['type']
         if property_type != 'animated' and property_type != 'iterated':
             raise ValueError(f"Cannot append property to non-iterable type [{property_type}]")
-        seed = self.__prop_map[name]['seed']
-        seed = chain(seed, prop)
-        self.__prop_map[name]['seed'] = seed
-        
+        self.__prop_map[name]['segments'].append(prop)
+        # the segment offsets are recomputed on the next seek
+        self.__prop_map[name].pop('offsets', None)
 
     def remove_child_property(self, name):
         """ reverses the effect of register_child_property
@@ -238,43 +218,544 @@ class AnimatedProperty:
             raise ValueError("terminator must be callable")
         self.__terminators.append(terminator)
 
+    def end_at(self, num_frames):
+        """ end the animation after num_frames frames. Same as the terminator `lambda pf: pf.frame_num >= num_frames`,
+        but the length is known in advance: no terminator is called on every frame, and the animation can still seek.
+
+        :num_frames: the maximum number of frames, the animation ends earlier if a child property terminates it
+        :returns: None
+
+        """
+        if not isinstance(num_frames, int) or num_frames < 0:
+            raise ValueError(f"number of frames [{num_frames}] is not a non-negative integer")
+        self.__max_frames = min(self.__max_frames, num_frames)
+
+    def __len__(self):
+        """ the number of frames of the animation, worked out from its child properties without iterating:
+        lerp and keyframe lengths, list lengths, the total of appended segments and their end_action, and end_at.
+
+        :returns: the number of frames
+        :raises: a TypeError if the animation never ends, or if its length can only be known by iterating it,
+                 because of terminators or child properties of unknown length such as generators
+
+        """
+        num_frames = self._num_frames()
+        if num_frames is None:
+            raise TypeError(f"the length of [{get_class_name(self)}] can only be known by iterating it")
+        if num_frames == math.inf:
+            raise TypeError(f"[{get_class_name(self)}] never ends")
+        return num_frames
+
+    def __bool__(self):
+        # an animation is not a container of frames, it stays true even when it has no frames or no known length
+        return True
+
     def __iter__(self):
-        property_states = {
-            k: {
-                "type": v['type'],
-                "iterator": iter(
-                    v['seed']) if v['type'] == 'animated' or v['type'] == 'iterated' else v['seed'],
-                "value": None if v['type'] == 'animated' or v['type'] == 'iterated' else v['seed'],
-                "end_action": v['end_action'],
-                "end_value": v['end_value'],
-                "dynamic_updater": v['dynamic_updater']}
-            for k, v in self.__prop_map.items()
-        }
+        plan = _IterationPlan(self.__prop_map)
+        names = plan.names
+        values = plan.values
+        advancing = plan.advancing
+        dynamic = plan.dynamic
+        terminators = self.__terminators
+        PropertyFrame = self.PropertyFrame
+        profiler = profiling.active_profiler()
+        node = None
+        if profiler is not None:
+            # the first frame is requested by the parent while it has set the node of this property as current
+            node = profiler.current
+            profiler.bind(self, node)
+        # animations of known length stop by counting, terminators are left to the user's own conditions
+        max_frames = self.__max_frames
         frame_num = 0
-        while True:
-            # update all animated and iterated properties, create a copy because properties
-            # might be removed
-            for name in property_states.copy():
-                if (property_states[name]["type"] != "animated" and
-                        property_states[name]["type"] != "iterated"):
-                    continue
+        while frame_num < max_frames:
+            # update all animated and iterated properties
+            exhausted = None
+            for entry in advancing:
                 try:
-                    self._advance_animated_and_iterated_property(
-                        property_states, name)
+                    if node is None:
+                        values[entry[0]] = next(entry[2])
+                    else:
+                        values[entry[0]] = self._advance_profiled(entry, profiler, node)
                 except StopIteration:
-                    return
+                    if exhausted is None:
+                        exhausted = []
+                    exhausted.append(entry)
+            if exhausted is not None:
+                for entry in exhausted:
+                    if not plan.end(entry):
+                        return
+                # exhausted properties are not advanced anymore, and dropped ones shift the slots after them
+                names = plan.names
+                values = plan.values
+                advancing = plan.advancing
+                dynamic = plan.dynamic
+            if node is not None:
+                start = perf_counter()
             # take a snapshot (as a PropertyFrame object)
-            snapshot = self._get_snapshot(property_states, frame_num)
+            snapshot = PropertyFrame(dict(zip(names, values)), self, frame_num)
+            if node is not None:
+                now = perf_counter()
+                node.add('snapshot', now - start)
+                start = now
 
             # check whether should terminate
-            for terminate in self.__terminators:
+            for terminate in terminators:
                 if terminate(snapshot):
                     return
-            
+            if node is not None:
+                node.add('terminator', perf_counter() - start)
+
             yield snapshot
-            # update all dynamic properties
-            for name in property_states:
-                if property_states[name]["type"] == "dynamic":
-                    update = property_states[name]["dynamic_updater"]
-                    property_states[name]["value"] = update(snapshot)
+            # update all dynamic properties, skipping the ones whose inputs have not changed
+            for group in dynamic:
+                if group.depends_on is not None:
+                    props = snapshot.props
+                    inputs = [props.get(input_name, _MISSING) for input_name in group.depends_on]
+                    if inputs == group.last_inputs:
+                        continue
+                    group.last_inputs = inputs
+                for slot, name, update in group.updaters:
+                    if node is None:
+                        values[slot] = update(snapshot)
+                    else:
+                        start = perf_counter()
+                        values[slot] = update(snapshot)
+                        node.child(name).add('updater', perf_counter() - start)
             frame_num += 1
+
+    def _advance_profiled(self, entry, profiler, node):
+        """ advance an animated or iterated property, recording its time in the child node of the property.
+        Child AnimatedProperties starting their iteration record into that node as well.
+
+        :entry: an entry of _IterationPlan.advancing
+        :profiler: the active profiling.Profiler
+        :node: the profiling.ProfileNode of this property
+        :returns: the yielded object from the iterator
+        :raises: a StopIteration error if the property is exhausted
+
+        """
+        child_node = node.child(entry[1])
+        profiler.current = child_node
+        start = perf_counter()
+        try:
+            value = next(entry[2])
+        finally:
+            profiler.current = node
+            child_node.add('advance', perf_counter() - start)
+        if isinstance(value, AnimatedProperty.PropertyFrame):
+            # frames of closed-form properties such as lerps do not go through __iter__
+            profiler.bind(value.ap, child_node)
+        return value
+
+    def _segment_length(self, segment):
+        """ the number of frames a single segment of an animated or iterated property yields
+
+        :segment: an AnimatedProperty or an iterable registered through register_child_property or append_child_property
+        :returns: the number of frames, math.inf if the segment never ends, None if it can only be known by iterating
+
+        """
+        if isinstance(segment, AnimatedProperty):
+            return segment._num_frames()
+        if isinstance(segment, Sequence):
+            return len(segment)
+        return None
+
+    def _segment_offsets(self, prop):
+        """ the timeline of an animated or iterated property: the frame each of its segments starts at, followed by
+        the total length. Computed on the first seek and kept in prop until another segment is appended,
+        segments are expected not to change their length once registered.
+
+        :prop: an entry in __prop_map
+        :returns: a list of len(segments) + 1 frame numbers, None if the length of a segment is unknown
+
+        """
+        if 'offsets' not in prop:
+            offsets = [0]
+            for segment in prop['segments']:
+                length = self._segment_length(segment)
+                if length is None:
+                    offsets = None
+                    break
+                offsets.append(offsets[-1] + length)
+            prop['offsets'] = offsets
+        return prop['offsets']
+
+    def _child_length(self, prop):
+        """ the total number of frames yielded by all segments of an animated or iterated property
+
+        :prop: an entry in __prop_map
+        :returns: same as _segment_length
+
+        """
+        offsets = self._segment_offsets(prop)
+        return None if offsets is None else offsets[-1]
+
+    def _can_seek(self):
+        """ whether any frame can be computed directly by _seek_frame, without replaying the frames before it.
+        Subclasses that can compute their frames in closed form should override this together with _num_frames and _seek_frame.
+
+        :returns: True if the property is seekable
+
+        """
+        if self.__terminators or self._replays_only():
+            return False
+        for prop in self.__prop_map.values():
+            if prop['type'] == 'dynamic':
+                return False
+            if prop['type'] != 'animated' and prop['type'] != 'iterated':
+                continue
+            if self._child_length(prop) is None:
+                return False
+            # a segment of known length may still need to be replayed, e.g. with dynamic properties of its own
+            for segment in prop['segments']:
+                if isinstance(segment, AnimatedProperty) and not segment._can_seek():
+                    return False
+        return True
+
+    def _num_frames(self):
+        """ the number of frames of the animation, as far as it can be known without iterating
+
+        :returns: the number of frames, math.inf if the animation never ends, None if unknown
+
+        """
+        if self.__terminators or self._replays_only():
+            return None
+        num_frames = self.__max_frames
+        for prop in self.__prop_map.values():
+            if prop['type'] != 'animated' and prop['type'] != 'iterated':
+                continue
+            if prop['end_action'] != 'terminate':
+                continue
+            length = self._child_length(prop)
+            if length is None:
+                return None
+            num_frames = min(num_frames, length)
+        return num_frames
+
+    def _replays_only(self):
+        """ whether a subclass yields frames of its own from __iter__ without computing them in _seek_frame,
+        the frames are then unrelated to the registered child properties and can only be known by iterating
+
+        :returns: True if the property overrides __iter__ but not _seek_frame
+
+        """
+        cls = type(self)
+        return cls.__iter__ is not AnimatedProperty.__iter__ and cls._seek_frame is AnimatedProperty._seek_frame
+
+    def _seek_frame(self, frame_num):
+        """ compute the frame at frame_num directly, only valid when _can_seek() is True
+
+        :frame_num: a non-negative frame number, or a fractional one between two frames, see sample
+        :returns: a PropertyFrame object
+        :raises: an IndexError if the animation terminates before frame_num
+
+        """
+        if frame_num >= self._num_frames():
+            raise IndexError(f"frame [{frame_num}] is out of range")
+        props = {}
+        for name, prop in self.__prop_map.items():
+            if prop['type'] != 'animated' and prop['type'] != 'iterated':
+                props[name] = prop['seed']
+                continue
+            if frame_num < self._child_length(prop):
+                props[name] = self._seek_child(prop, frame_num)
+                continue
+            # all segments are exhausted, mirror _IterationPlan.end
+            end_action = prop['end_action']
+            if end_action == 'drop':
+                continue
+            elif end_action == 'keep':
+                last = self._child_length(prop) - 1
+                props[name] = None if last < 0 else self._seek_child(prop, last)
+            elif end_action == 'end_value':
+                props[name] = prop['end_value']
+            else:
+                raise ValueError(f"unknown end_action [{end_action}]")
+        return self.PropertyFrame(props=props, ap=self, frame_num=frame_num)
+
+    def _seek_child(self, prop, frame_num):
+        """ get the value of an animated or iterated property at a frame within its segments
+
+        :prop: an entry in __prop_map
+        :frame_num: a frame number smaller than the total length of the segments
+        :returns: the value yielded at that frame
+
+        """
+        offsets = self._segment_offsets(prop)
+        if not 0 <= frame_num < offsets[-1]:
+            raise IndexError(f"frame [{frame_num}] is out of range")
+        # the last segment starting at or before frame_num, skipping empty segments
+        i = bisect_right(offsets, frame_num) - 1
+        segment = prop['segments'][i]
+        if isinstance(segment, AnimatedProperty):
+            return segment._seek_frame(frame_num - offsets[i])
+        # lists hold their value until the next frame
+        return segment[int(frame_num - offsets[i])]
+
+    def frame_at(self, frame_num):
+        """ get a single frame of the animation. Seekable animations compute the frame directly,
+        others replay the animation from the first frame.
+
+        :frame_num: the frame number, negative numbers count from the end when the length is known
+        :returns: a PropertyFrame object
+        :raises: an IndexError if the animation does not have the specified frame
+
+        """
+        if frame_num < 0:
+            num_frames = self._num_frames()
+            if num_frames is None or num_frames == math.inf:
+                raise IndexError(
+                    f"frame [{frame_num}] cannot be counted from the end of an animation of unknown length")
+            frame_num += num_frames
+            if frame_num < 0:
+                raise IndexError(f"frame [{frame_num - num_frames}] is out of range")
+        if self._can_seek():
+            return self._seek_frame(frame_num)
+        for property_frame in islice(iter(self), frame_num, None):
+            return property_frame
+        raise IndexError(f"frame [{frame_num}] is out of range")
+
+    def frames(self, start=0, stop=None, step=1):
+        """ iterate through a range of frames, like islice(self, start, stop, step).
+        Seekable animations jump directly to each frame, others replay from the first frame once.
+
+        :start: the first frame number
+        :stop: the frame number to stop before, None to go until the animation ends
+        :step: the distance between two frames
+        :returns: an iterator of PropertyFrame objects
+
+        """
+        if start < 0 or (stop is not None and stop < 0) or step < 1:
+            raise ValueError(f"invalid frame range [{start}:{stop}:{step}]")
+        if not self._can_seek():
+            yield from islice(iter(self), start, stop, step)
+            return
+        num_frames = self._num_frames()
+        if stop is not None:
+            num_frames = min(num_frames, stop)
+        frame_nums = count(start, step) if num_frames == math.inf else range(start, num_frames, step)
+        profiler = profiling.active_profiler()
+        for frame_num in frame_nums:
+            if profiler is None:
+                yield self._seek_frame(frame_num)
+                continue
+            t0 = perf_counter()
+            property_frame = self._seek_frame(frame_num)
+            profiler.current.add('seek', perf_counter() - t0)
+            self._bind_profiled(property_frame, profiler, profiler.current)
+            yield property_frame
+
+    @staticmethod
+    def _bind_profiled(property_frame, profiler, node):
+        """ record the get_frame_data timings of a seeked frame, and of its nested frames, into the profile tree """
+        profiler.bind(property_frame.ap, node)
+        for name, value in property_frame.props.items():
+            if isinstance(value, AnimatedProperty.PropertyFrame):
+                AnimatedProperty._bind_profiled(value, profiler, node.child(name))
+
+    def evaluate_batch(self, frames):
+        """ evaluate many frames at once into NumPy arrays, one column per property.
+        Seekable animations are computed with vectorized array operations, others are replayed once.
+
+        :frames: a range or a sequence of non-negative frame numbers
+        :returns: a batch.FrameBatch object, PropertyFrame objects are only built from it on request
+        :raises: an IndexError if the animation does not have some of the frames
+
+        """
+        frame_nums = batch.frame_array(frames)
+        if not self._can_seek():
+            return batch.FrameBatch.replay(self, frame_nums)
+        if len(frame_nums) and frame_nums.max() >= self._num_frames():
+            raise IndexError(f"frame [{frame_nums.max()}] is out of range")
+        return self._evaluate_batch(frame_nums)
+
+    def _evaluate_batch(self, frame_nums):
+        """ the vectorized counterpart of _seek_frame, only valid when _can_seek() is True
+
+        :frame_nums: an array of frame numbers within the animation
+        :returns: a batch.FrameBatch object
+
+        """
+        columns = {}
+        for name, prop in self.__prop_map.items():
+            if prop['type'] != 'animated' and prop['type'] != 'iterated':
+                columns[name] = batch.static_column(prop['seed'], len(frame_nums))
+            else:
+                columns[name] = self._evaluate_child_batch(prop, frame_nums)
+        return batch.FrameBatch(self, frame_nums, columns)
+
+    def _evaluate_child_batch(self, prop, frame_nums):
+        """ the vectorized counterpart of _seek_child, including the frames after the child ends
+
+        :prop: an entry in __prop_map
+        :frame_nums: an array of frame numbers within the animation
+        :returns: a column, see batch.FrameBatch
+
+        """
+        np = batch.np
+        offsets = self._segment_offsets(prop)
+        segments = prop['segments']
+        # group the frames by the segment they fall into, len(segments) for frames after the last segment
+        indices = np.searchsorted(np.asarray(offsets, dtype=float), frame_nums, side='right') - 1
+        order = np.argsort(indices, kind='stable')
+        groups, starts = np.unique(indices[order], return_index=True)
+        parts = []
+        for i, start, stop in zip(groups, starts, list(starts[1:]) + [len(order)]):
+            if i == len(segments):
+                continue
+            positions = order[start:stop]
+            segment = segments[i]
+            local_nums = frame_nums[positions] - offsets[i]
+            parts.append((positions, segment._evaluate_batch(local_nums)
+                          if isinstance(segment, AnimatedProperty)
+                          else batch.sequence_column(segment, local_nums)))
+        offset = offsets[-1]
+        # frames after all segments are exhausted, mirror _IterationPlan.end
+        positions = batch.np.flatnonzero(frame_nums >= offset)
+        if len(positions):
+            end_action = prop['end_action']
+            if end_action == 'drop':
+                end_column = batch.static_column(batch.DROPPED, len(positions))
+            elif end_action == 'keep' and offset == 0:
+                end_column = batch.static_column(None, len(positions))
+            elif end_action == 'keep':
+                end_column = self._evaluate_child_batch(prop, batch.np.full(len(positions), offset - 1))
+            elif end_action == 'end_value':
+                end_column = batch.static_column(prop['end_value'], len(positions))
+            else:
+                raise ValueError(f"unknown end_action [{end_action}]")
+            parts.append((positions, end_column))
+        return batch.merge_columns(len(frame_nums), parts)
+
+    def sample(self, times):
+        """ evaluate the animation at times on its timeline, counted in frames, e.g. to change its frame rate.
+        Seekable animations are evaluated at each time directly, lerps, keyframes and easings being interpolated
+        between frames at fractional times; others are replayed once, holding the frame at or before each time.
+
+        :times: an iterable of non-negative times, in frames; not decreasing if the animation cannot seek
+        :returns: an iterator of PropertyFrame objects until the animation ends. Seeked frames have the time as
+                  frame_num, replayed frames keep the frame_num of the frame held, which is the same frame for
+                  all the times until the next one
+
+        """
+        if self._can_seek():
+            num_frames = self._num_frames()
+            for time in times:
+                if time >= num_frames:
+                    return
+                yield self._seek_frame(time)
+            return
+        frames = iter(self)
+        property_frame = None
+        for time in times:
+            # the frame at or before time
+            frame_num = math.floor(time)
+            if property_frame is not None and frame_num < property_frame.frame_num:
+                raise ValueError(f"cannot replay time [{time}] after frame [{property_frame.frame_num}]")
+            while property_frame is None or property_frame.frame_num < frame_num:
+                property_frame = next(frames, None)
+                if property_frame is None:
+                    return
+            yield property_frame
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return list(self.frames(
+                0 if key.start is None else key.start,
+                key.stop,
+                1 if key.step is None else key.step))
+        return self.frame_at(key)
+
+
+# the input of an updater that has been dropped from the snapshots
+_MISSING = object()
+
+
+class _UpdaterGroup:
+
+    """The dynamic updaters of an _IterationPlan sharing the same inputs, which are compared once per frame for all of
+    them. Updaters without declared inputs are grouped with depends_on None and run on every frame.
+    """
+
+    __slots__ = ('depends_on', 'last_inputs', 'updaters')
+
+    def __init__(self, depends_on):
+        self.depends_on = depends_on
+        # the inputs of the last call, None before the first one
+        self.last_inputs = None
+        # (slot, name, dynamic_updater) of the dynamic properties in the group
+        self.updaters = []
+
+
+class _IterationPlan:
+
+    """The state of a single iteration of an AnimatedProperty, compiled once per __iter__ call.
+
+    The values of all properties are kept in a list in registration order, from which the props of each snapshot are
+    built, and the properties are partitioned by type so that each frame only visits the ones it has to update.
+    Dynamic updaters are grouped by the properties they depend on, so that a group is only updated once one of its
+    inputs has changed.
+    """
+
+    __slots__ = ('names', 'values', 'advancing', 'dynamic')
+
+    def __init__(self, prop_map):
+        """
+        :prop_map: the __prop_map of the AnimatedProperty being iterated
+        """
+        self.names = []
+        self.values = []
+        # (slot, name, iterator, end_action, end_value) of animated and iterated properties
+        self.advancing = []
+        # _UpdaterGroup of dynamic properties, by the properties they depend on
+        groups = {}
+        for name, prop in prop_map.items():
+            slot = len(self.names)
+            self.names.append(name)
+            if prop['type'] == 'animated' or prop['type'] == 'iterated':
+                self.values.append(None)
+                self.advancing.append(
+                    (slot, name, chain.from_iterable(prop['segments']), prop['end_action'], prop['end_value']))
+            else:
+                self.values.append(prop['seed'])
+                if prop['type'] == 'dynamic':
+                    depends_on = prop['depends_on']
+                    for input_name in depends_on or ():
+                        if input_name not in prop_map:
+                            raise ValueError(
+                                f"Dynamic property [{name}] depends on unknown property [{input_name}]")
+                    if depends_on not in groups:
+                        groups[depends_on] = _UpdaterGroup(depends_on)
+                    groups[depends_on].updaters.append((slot, name, prop['dynamic_updater']))
+        self.dynamic = list(groups.values())
+
+    def end(self, entry):
+        """ apply the end_action of an exhausted property, which is not advanced anymore
+
+        :entry: an entry of advancing whose iterator raised StopIteration
+        :returns: False if the animation terminates, True otherwise
+
+        """
+        _, name, _, end_action, end_value = entry
+        if end_action == 'terminate':
+            return False
+        self.advancing = [e for e in self.advancing if e[1] != name]
+        if end_action == 'drop':
+            self._drop(name)
+        elif end_action == 'keep':
+            pass
+        elif end_action == 'end_value':
+            # look the slot up, another property exhausted in the same frame may have been dropped
+            self.values[self.names.index(name)] = end_value
+        else:
+            raise ValueError(f"unknown end_action [{end_action}]")
+        return True
+
+    def _drop(self, name):
+        """ remove a property from the snapshots, shifting the slots of the properties after it """
+        slot = self.names.index(name)
+        del self.names[slot]
+        del self.values[slot]
+        self.advancing = [(s - 1 if s > slot else s,) + tuple(rest) for s, *rest in self.advancing]
+        for group in self.dynamic:
+            group.updaters = [(s - 1 if s > slot else s,) + tuple(rest) for s, *rest in group.updaters]
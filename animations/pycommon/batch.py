@@ -0,0 +1,283 @@
+from .maths import Point, _point
+
+# NumPy is imported on first use: it takes longer to import than everything else framebuilder needs, and only batch
+# evaluation uses it
+_numpy = None
+
+
+class _Dropped:
+    """ marks a property that has been dropped (end_action='drop') in an object column """
+
+    def __repr__(self):
+        return "DROPPED"
+
+
+DROPPED = _Dropped()
+
+
+def require_numpy():
+    """ import NumPy for batch evaluation
+
+    :returns: the numpy module
+    :raises: an ImportError if NumPy is not installed
+    """
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("NumPy is required for batch evaluation")
+        _numpy = numpy
+    return _numpy
+
+
+def __getattr__(name):
+    # batch.np, the numpy module imported on first use, None if NumPy is not installed
+    if name == 'np':
+        try:
+            return require_numpy()
+        except ImportError:
+            return None
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def frame_array(frames):
+    """ convert the frames passed to evaluate_batch into an array of frame numbers
+
+    :frames: a range or a sequence of non-negative frame numbers
+    :returns: a 1-d int64 array
+
+    """
+    np = require_numpy()
+    if isinstance(frames, range):
+        frame_nums = np.arange(frames.start, frames.stop, frames.step, dtype=np.int64)
+    else:
+        frame_nums = np.asarray(frames, dtype=np.int64).reshape(-1)
+    if len(frame_nums) and frame_nums.min() < 0:
+        raise IndexError("frame numbers of a batch must not be negative")
+    return frame_nums
+
+
+def _object_column(values):
+    # assign one by one, otherwise numpy unpacks values that look like sequences
+    np = require_numpy()
+    column = np.empty(len(values), dtype=object)
+    for i, value in enumerate(values):
+        column[i] = value
+    return column
+
+
+def _is_number(value):
+    return type(value) in (int, float)
+
+
+def static_column(value, n):
+    """ a column holding the same value for n frames, without copying it n times
+
+    :value: the value of a static property
+    :n: the number of frames
+    :returns: a read-only array of n elements
+
+    """
+    np = require_numpy()
+    if _is_number(value):
+        return np.broadcast_to(np.asarray(value), (n,))
+    cell = np.empty((), dtype=object)
+    cell[()] = value
+    return np.broadcast_to(cell, (n,))
+
+
+def sequence_column(sequence, indices):
+    """ the column of an iterated property backed by a sequence
+
+    :sequence: a list, tuple or other sequence
+    :indices: the indices into the sequence for each frame
+    :returns: an array with one element per index
+
+    """
+    np = require_numpy()
+    types = {type(value) for value in sequence}
+    if len(types) == 1 and types <= {int, float}:
+        return np.asarray(sequence)[indices]
+    if types == {Point}:
+        return np.array([value.toList() for value in sequence])[indices]
+    return _object_column(list(sequence))[indices]
+
+
+def lerp_column(start, increment, frame_nums, value_at):
+    """ the column of start + increment * frame_num, vectorized when the values are numbers or Points
+
+    :start: the starting value
+    :increment: the increment per frame
+    :frame_nums: the frame numbers
+    :value_at: a fallback function computing a single value, used when the values cannot be vectorized
+    :returns: an array with one element (or one row for Points) per frame
+
+    """
+    if isinstance(start, Point) and isinstance(increment, Point):
+        components = list(zip(start.toList(), increment.toList()))
+        # numpy keeps one dtype per array, only vectorize when every component has the same type
+        # as it would in Python, so that the frame data is identical
+        types = {type(s + d) for s, d in components}
+        if len(types) == 1 and all(_is_number(s) and _is_number(d) for s, d in components):
+            np = require_numpy()
+            return np.asarray(start.toList()) + np.asarray(increment.toList()) * frame_nums[:, None]
+    elif _is_number(start) and _is_number(increment):
+        return start + increment * frame_nums
+    return _object_column([value_at(frame_num) for frame_num in frame_nums.tolist()])
+
+
+def column_value(column, i):
+    """ get the value of a single frame from a column, as it would appear in PropertyFrame.props
+
+    :column: an array or a FrameBatch
+    :i: the position in the batch
+    :returns: the value, DROPPED if the property is dropped at that frame
+
+    """
+    if isinstance(column, FrameBatch):
+        return column.frame(i)
+    if column.dtype == object:
+        return column[i]
+    if column.ndim == 2:
+        return _point(*column[i].tolist())
+    return column[i].item()
+
+
+def merge_columns(n, parts):
+    """ combine the columns of several segments into a single column
+
+    :n: the length of the combined column
+    :parts: a list of (positions, column) pairs, where positions is an array of indices into the combined column
+    :returns: an array or a FrameBatch
+
+    """
+    np = require_numpy()
+    if len(parts) == 1 and len(parts[0][0]) == n:
+        return parts[0][1]
+    columns = [column for _, column in parts]
+    if all(isinstance(column, FrameBatch) for column in columns):
+        return FrameBatch.merge(n, parts)
+    if all(isinstance(column, np.ndarray) for column in columns) and \
+            len({(column.dtype, column.shape[1:]) for column in columns}) == 1:
+        merged = np.empty((n,) + columns[0].shape[1:], dtype=columns[0].dtype)
+        for positions, column in parts:
+            merged[positions] = column
+        return merged
+    merged = np.empty(n, dtype=object)
+    for positions, column in parts:
+        for j, position in enumerate(positions.tolist()):
+            merged[position] = column_value(column, j)
+    return merged
+
+
+class FrameBatch:
+
+    """A range of frames of an AnimatedProperty, evaluated at once and stored as one column per property.
+
+    Numbers are stored as 1-d arrays, Points as (n, 3) arrays, animated properties as nested FrameBatch
+    objects, and anything else as object arrays. PropertyFrame objects are only built when a frame is requested.
+    """
+
+    def __init__(self, ap, frame_nums, columns):
+        """
+        :ap: the AnimatedProperty the frames belong to, or an object array with one AnimatedProperty per frame
+        :frame_nums: an array of frame numbers
+        :columns: a dictionary where each key is the property name, and the value is its column
+        """
+        self.ap = ap
+        self.frame_nums = frame_nums
+        self.columns = columns
+
+    @classmethod
+    def replay(cls, ap, frame_nums):
+        """ build a batch by iterating through the animation once, for animations that cannot be seeked
+
+        :ap: the AnimatedProperty
+        :frame_nums: an array of frame numbers
+        :returns: a FrameBatch with object columns
+        """
+        np = require_numpy()
+        positions = {}
+        for i, frame_num in enumerate(frame_nums.tolist()):
+            positions.setdefault(frame_num, []).append(i)
+        snapshots = [None] * len(frame_nums)
+        remaining = len(positions)
+        if remaining:
+            for frame_num, property_frame in enumerate(ap):
+                for i in positions.get(frame_num, ()):
+                    snapshots[i] = property_frame
+                if frame_num in positions:
+                    remaining -= 1
+                    if remaining == 0:
+                        break
+            else:
+                raise IndexError(f"frame [{max(positions)}] is out of range")
+        columns = {}
+        for snapshot in snapshots:
+            for name in snapshot.props:
+                if name not in columns:
+                    columns[name] = np.full(len(snapshots), DROPPED, dtype=object)
+        for i, snapshot in enumerate(snapshots):
+            for name, value in snapshot.props.items():
+                columns[name][i] = value
+        return cls(ap, frame_nums, columns)
+
+    @classmethod
+    def merge(cls, n, parts):
+        """ combine several batches into one
+
+        :n: the length of the combined batch
+        :parts: a list of (positions, FrameBatch) pairs, see merge_columns
+        :returns: a FrameBatch
+        """
+        np = require_numpy()
+        aps = {id(batch.ap): batch.ap for _, batch in parts}
+        if len(aps) == 1 and not isinstance(parts[0][1].ap, np.ndarray):
+            ap = parts[0][1].ap
+        else:
+            ap = np.empty(n, dtype=object)
+            for positions, batch in parts:
+                ap[positions] = batch.ap if isinstance(batch.ap, np.ndarray) else static_column(batch.ap, 1)
+        frame_nums = np.empty(n, dtype=np.int64)
+        names = {}
+        for positions, batch in parts:
+            frame_nums[positions] = batch.frame_nums
+            names.update(dict.fromkeys(batch.columns))
+        columns = {
+            name: merge_columns(n, [
+                (positions, batch.columns.get(name, static_column(DROPPED, len(positions))))
+                for positions, batch in parts])
+            for name in names}
+        return cls(ap, frame_nums, columns)
+
+    def __len__(self):
+        return len(self.frame_nums)
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def keys(self):
+        return self.columns.keys()
+
+    def frame(self, i):
+        """ build the PropertyFrame at a position of the batch
+
+        :i: the position in the batch, not the frame number
+        :returns: a PropertyFrame object
+        """
+        np = require_numpy()
+        ap = self.ap[i] if isinstance(self.ap, np.ndarray) else self.ap
+        props = {}
+        for name, column in self.columns.items():
+            value = column_value(column, i)
+            if value is not DROPPED:
+                props[name] = value
+        return ap.PropertyFrame(props=props, ap=ap, frame_num=int(self.frame_nums[i]))
+
+    def get_frame_data(self, i):
+        return self.frame(i).get_frame_data()
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.frame(i)
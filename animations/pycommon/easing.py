@@ -0,0 +1,203 @@
+""" Easing curves, to change the pace of a LerpValue or LerpPoint without changing its path.
+
+An easing function maps the linear progress t of an animation, from 0 at the first frame to 1 at the last one, to an
+eased progress that starts at 0 and ends at 1. Each curve is evaluated once per number of frames into a lookup table,
+which is shared by every property using the same curve and duration.
+"""
+from functools import lru_cache
+import math
+
+from . import batch
+from .animated_property import AnimatedProperty
+
+# the maximum number of lookup tables kept, the least recently used ones are evicted first
+TABLE_CACHE_SIZE = 128
+
+
+def linear(t):
+    return t
+
+
+def ease_in_quad(t):
+    return t * t
+
+
+def ease_out_quad(t):
+    return 1 - (1 - t) * (1 - t)
+
+
+def ease_in_out_quad(t):
+    return 2 * t * t if t < 0.5 else 1 - (-2 * t + 2) ** 2 / 2
+
+
+def ease_in_cubic(t):
+    return t * t * t
+
+
+def ease_out_cubic(t):
+    return 1 - (1 - t) ** 3
+
+
+def ease_in_out_cubic(t):
+    return 4 * t * t * t if t < 0.5 else 1 - (-2 * t + 2) ** 3 / 2
+
+
+def ease_in_sine(t):
+    return 1 - math.cos(t * math.pi / 2)
+
+
+def ease_out_sine(t):
+    return math.sin(t * math.pi / 2)
+
+
+def ease_in_out_sine(t):
+    return -(math.cos(math.pi * t) - 1) / 2
+
+
+def ease_in_expo(t):
+    return 0 if t == 0 else 2 ** (10 * t - 10)
+
+
+def ease_out_expo(t):
+    return 1 if t == 1 else 1 - 2 ** (-10 * t)
+
+
+def ease_in_back(t):
+    # overshoots backwards before starting
+    c1 = 1.70158
+    return (c1 + 1) * t * t * t - c1 * t * t
+
+
+def ease_out_back(t):
+    # overshoots the end before settling
+    return 1 - ease_in_back(1 - t)
+
+
+def ease_in_elastic(t):
+    if t == 0 or t == 1:
+        return t
+    return -(2 ** (10 * t - 10)) * math.sin((t * 10 - 10.75) * (2 * math.pi) / 3)
+
+
+def ease_out_elastic(t):
+    if t == 0 or t == 1:
+        return t
+    return 2 ** (-10 * t) * math.sin((t * 10 - 0.75) * (2 * math.pi) / 3) + 1
+
+
+def ease_out_bounce(t):
+    n1, d1 = 7.5625, 2.75
+    if t < 1 / d1:
+        return n1 * t * t
+    elif t < 2 / d1:
+        t -= 1.5 / d1
+        return n1 * t * t + 0.75
+    elif t < 2.5 / d1:
+        t -= 2.25 / d1
+        return n1 * t * t + 0.9375
+    t -= 2.625 / d1
+    return n1 * t * t + 0.984375
+
+
+def ease_in_bounce(t):
+    return 1 - ease_out_bounce(1 - t)
+
+
+EASINGS = {func.__name__: func for func in [
+    linear,
+    ease_in_quad, ease_out_quad, ease_in_out_quad,
+    ease_in_cubic, ease_out_cubic, ease_in_out_cubic,
+    ease_in_sine, ease_out_sine, ease_in_out_sine,
+    ease_in_expo, ease_out_expo,
+    ease_in_back, ease_out_back,
+    ease_in_elastic, ease_out_elastic,
+    ease_in_bounce, ease_out_bounce,
+]}
+
+
+def get_easing(easing):
+    """ look an easing function up by name
+
+    :easing: the name of a function in EASINGS, or a function of its own mapping [0, 1] to the eased progress
+    :returns: the easing function
+    """
+    if callable(easing):
+        return easing
+    if easing not in EASINGS:
+        raise ValueError(f"unknown easing [{easing}]")
+    return EASINGS[easing]
+
+
+@lru_cache(maxsize=TABLE_CACHE_SIZE)
+def easing_table(easing, num_frames):
+    """ the eased position of every frame of an animation, shared by all callers with the same arguments
+
+    :easing: an easing function
+    :num_frames: the number of frames of the animation
+    :returns: a tuple with the eased (fractional) frame number of each frame,
+              from 0 at the first frame to num_frames - 1 at the last one
+    """
+    last = num_frames - 1
+    if last <= 0:
+        return (0.0,) * num_frames
+    return tuple(easing(i / last) * last for i in range(num_frames))
+
+
+class EasedProperty(AnimatedProperty):
+
+    """ A LerpValue or LerpPoint following an easing curve: the frames go along the same path, from the same start
+    to the same end, at the pace given by the curve.
+    """
+
+    def __init__(self, lerp, easing="ease_in_out_cubic"):
+        """
+        :lerp: a LerpValue or LerpPoint with a finite number of frames
+        :easing: the name of an easing function in EASINGS, or an easing function
+        """
+        super().__init__()
+        if lerp.max_frame is None:
+            raise ValueError("Cannot ease a lerp that never ends, it needs a max_frame")
+        self.lerp = lerp
+        self.easing = get_easing(easing)
+        self.table = easing_table(self.easing, lerp.max_frame)
+
+    def value_at(self, frame_num):
+        """ the value of the lerp at the eased position of a frame, or of a fractional frame between two frames """
+        if frame_num == int(frame_num):
+            return self.lerp.value_at(self.table[int(frame_num)])
+        last = len(self.table) - 1
+        return self.lerp.value_at(self.easing(min(frame_num / last, 1)) * last if last > 0 else 0.0)
+
+    def __iter__(self):
+        lerp, value_at = self.lerp, self.lerp.value_at
+        PropertyFrame = self.PropertyFrame
+        for frame_num, position in enumerate(self.table):
+            yield PropertyFrame(
+                {'start': lerp.start, 'increment': lerp.increment, 'value': value_at(position)},
+                self,
+                frame_num)
+
+    def _can_seek(self):
+        return True
+
+    def _num_frames(self):
+        return len(self.table)
+
+    def _seek_frame(self, frame_num):
+        if frame_num >= self._num_frames():
+            raise IndexError(f"frame [{frame_num}] is out of range")
+        return self.PropertyFrame(
+            props={'start': self.lerp.start, 'increment': self.lerp.increment, 'value': self.value_at(frame_num)},
+            ap=self,
+            frame_num=frame_num)
+
+    def _evaluate_batch(self, frame_nums):
+        n = len(frame_nums)
+        positions = batch.np.asarray(self.table)[frame_nums]
+        return batch.FrameBatch(self, frame_nums, {
+            'start': batch.static_column(self.lerp.start, n),
+            'increment': batch.static_column(self.lerp.increment, n),
+            'value': batch.lerp_column(self.lerp.start, self.lerp.increment, positions, self.lerp.value_at)})
+
+    def get_frame_data(self, property_frame):
+        return self.lerp.get_frame_data(property_frame)
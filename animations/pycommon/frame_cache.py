@@ -0,0 +1,141 @@
+""" Opt-in memoization of frame data.
+
+While a FrameDataCache is active (`with FrameDataCache() as cache:`), PropertyFrame.get_frame_data looks the frame
+data of every PropertyFrame up by the AnimatedProperty it belongs to and by the values of its props, nested
+PropertyFrames standing for the frame data looked up for them. A part of the scene whose values are the same as in a
+previous frame reuses the frame data built then instead of building it again; a child kept with end_action='keep' is
+the same PropertyFrame in every frame and is found by identity, without looking at its props.
+
+Looking frame data up costs about as much as building the plain dictionaries of AnimatedProperty.get_frame_data, the
+cache pays off for kept children and for properties whose get_frame_data does more work.
+
+Cached frame data is shared between frames and must not be changed in place, and get_frame_data must only depend on
+the props of the PropertyFrame, not on its frame_num. The frame data of properties with props that are not hashable,
+such as lists, is built every time.
+"""
+from collections import OrderedDict
+
+from .maths import Point
+
+# the FrameDataCache currently in use, None when caching is disabled
+_active = None
+
+# the default maximum number of frame data kept
+DEFAULT_CACHE_SIZE = 4096
+
+
+def _typed(value):
+    """ the components of a Point or a tuple with their types, since Point(1, 2, 3) == Point(1.0, 2, 3) """
+    if type(value) is Point:
+        value = value.toList()
+    return tuple((_typed(item), type(item)) if isinstance(item, (Point, tuple)) else (item, type(item))
+                 for item in value)
+
+
+def active_cache():
+    """ the FrameDataCache currently in use, None when caching is disabled """
+    return _active
+
+
+class FrameDataCache:
+
+    """A bounded cache of frame data by property and prop values, the least recently used entries being evicted first.
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        """
+        :maxsize: the maximum number of frame data kept
+        """
+        # deferred, animated_property looks the active cache up
+        from .animated_property import AnimatedProperty
+        if maxsize < 1:
+            raise ValueError(f"cache size [{maxsize}] must be at least 1")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._frame_type = AnimatedProperty.PropertyFrame
+        # the frame data of the PropertyFrames met while building the frame data of the current and of the previous
+        # outermost PropertyFrame, by id. A child kept with end_action='keep' is the same PropertyFrame from one frame
+        # to the next, and is found here without looking at its props.
+        self._current = {}
+        self._last = {}
+        self._depth = 0
+        self._previous = None
+
+    def get_frame_data(self, property_frame):
+        """ the frame data of a PropertyFrame, built by its AnimatedProperty unless it is cached """
+        seen = self._current.get(id(property_frame))
+        if seen is not None and seen[0] is property_frame:
+            return seen[1]
+        seen = self._last.get(id(property_frame))
+        if seen is not None and seen[0] is property_frame:
+            self.hits += 1
+            self._current[id(property_frame)] = seen
+            return seen[1]
+        self._depth += 1
+        try:
+            data = self._lookup(property_frame)
+            self._current[id(property_frame)] = (property_frame, data)
+            return data
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                self._last = self._current
+                self._current = {}
+
+    def _lookup(self, property_frame):
+        # nested PropertyFrames are looked up first, their frame data stands for them in the key. As long as an entry
+        # holds the frame data of the children it was built from, no other object has the same id.
+        values = []
+        types = []
+        children = []
+        for value in property_frame.props.values():
+            # 1 and 1.0 are equal, but not the same frame data
+            types.append(type(value))
+            if isinstance(value, self._frame_type):
+                value = self.get_frame_data(value)
+                children.append(value)
+                value = id(value)
+            elif isinstance(value, (Point, tuple)):
+                value = _typed(value)
+            values.append(value)
+        key = (property_frame.ap, tuple(property_frame.props), tuple(values), tuple(types))
+        try:
+            entry = self._entries.get(key)
+        except TypeError:
+            # a prop is not hashable
+            return property_frame._build_frame_data()
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+        self.misses += 1
+        data = property_frame._build_frame_data()
+        self._entries[key] = (data, children)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return data
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __bool__(self):
+        return True
+
+    def clear(self):
+        self._entries.clear()
+        self._last = {}
+
+    def __enter__(self):
+        global _active
+        self._previous = _active
+        _active = self
+        return self
+
+    def __exit__(self, *exc_info):
+        global _active
+        _active = self._previous
+        self._previous = None
@@ -0,0 +1,145 @@
+import json
+import mmap
+import os
+import struct
+
+# the index holds one little-endian uint64 offset per frame into the container,
+# followed by the size of the container
+INDEX_SUFFIX = ".idx"
+_OFFSET = struct.Struct("<Q")
+# frames are small, buffer them into large writes
+_BUFFER_SIZE = 1 << 20
+
+
+def index_path(path):
+    """ the path of the offset index of a container """
+    return path + INDEX_SUFFIX
+
+
+class FrameContainerWriter:
+
+    """Streams frames into a single newline-delimited JSON file, and records the offset of every frame in an index.
+
+    Each frame takes exactly one line, so the container can also be read with line-based tools.
+    """
+
+    def __init__(self, path, fsync=False):
+        """
+        :path: the path of the container, the index is written next to it
+        :fsync: sync the container and its index to storage when closed
+        """
+        self.path = path
+        self.fsync = fsync
+        self.num_frames = 0
+        # the size of the container so far, the offset of the next frame
+        self.size = 0
+        self._file = open(path, "wb", buffering=_BUFFER_SIZE)
+        # offsets are streamed to the index as frames are appended, so memory does not grow with the frames
+        self._index = open(index_path(path), "wb", buffering=_BUFFER_SIZE)
+        self._index.write(_OFFSET.pack(0))
+
+    def append(self, text):
+        """ append a serialized frame
+
+        :text: the frame as a json string without newlines, or as bytes
+        :returns: the frame number within the container
+        """
+        data = text.encode() if isinstance(text, str) else text
+        self._file.write(data + b"\n")
+        self.size += len(data) + 1
+        self._index.write(_OFFSET.pack(self.size))
+        self.num_frames += 1
+        return self.num_frames - 1
+
+    def append_container(self, path):
+        """ append all frames of another container, as written by a worker process
+
+        :path: the path of the container to be appended, its index must exist
+        """
+        with FrameContainerReader(path) as reader:
+            base = self.size
+            self._file.write(reader.data)
+            self._index.write(b"".join(_OFFSET.pack(base + reader.offset(i + 1)) for i in range(len(reader))))
+            self.size += len(reader.data)
+            self.num_frames += len(reader)
+
+    def close(self):
+        if self._file.closed:
+            return
+        for f in (self._file, self._index):
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class FrameContainerReader:
+
+    """Random access to the frames of a container written by FrameContainerWriter.
+
+    Both the container and its index are memory-mapped, getting frame N only reads that frame.
+    """
+
+    def __init__(self, path):
+        """
+        :path: the path of the container
+        """
+        self.path = path
+        self._mmaps = []
+        self.data = self._map(path)
+        self._index = self._map(index_path(path))
+        if len(self._index) % _OFFSET.size != 0 or len(self._index) == 0:
+            raise ValueError(f"Invalid frame container index [{index_path(path)}]")
+        if self.offset(len(self)) != len(self.data):
+            raise ValueError(f"Frame container index [{index_path(path)}] does not match [{path}]")
+
+    def _map(self, path):
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._mmaps.append(mapped)
+        return mapped
+
+    def __len__(self):
+        return len(self._index) // _OFFSET.size - 1
+
+    def offset(self, frame_num):
+        return _OFFSET.unpack_from(self._index, frame_num * _OFFSET.size)[0]
+
+    def frame_bytes(self, frame_num):
+        """ the serialized frame, without parsing any other frame
+
+        :frame_num: the frame number, negative numbers count from the end
+        :returns: the frame as json bytes
+        """
+        if frame_num < 0:
+            frame_num += len(self)
+        if not 0 <= frame_num < len(self):
+            raise IndexError(f"frame [{frame_num}] is out of range")
+        # strip the newline ending the frame
+        return self.data[self.offset(frame_num):self.offset(frame_num + 1) - 1]
+
+    def __getitem__(self, frame_num):
+        return json.loads(self.frame_bytes(frame_num))
+
+    def __iter__(self):
+        for frame_num in range(len(self)):
+            yield self[frame_num]
+
+    def close(self):
+        for mapped in self._mmaps:
+            mapped.close()
+        self._mmaps = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,78 @@
+import struct
+
+# each record is the little-endian uint32 size of the frame, followed by the frame as json bytes
+_LENGTH = struct.Struct("<I")
+DEFAULT_BUFFER_SIZE = 64 * 1024
+
+
+class FrameStreamWriter:
+
+    """Streams frames to a binary stream, such as stdout piped into the renderer, as length-prefixed records.
+
+    Records are buffered until buffer_size bytes are pending and then written at once. Writing to a pipe blocks while
+    the reader is behind, so a producer never holds more than buffer_size bytes, plus the pipe's own buffer, ahead of
+    the consumer. The first frame is written immediately so that the consumer can start right away.
+    """
+
+    def __init__(self, stream, buffer_size=DEFAULT_BUFFER_SIZE):
+        """
+        :stream: a binary stream, e.g. sys.stdout.buffer
+        :buffer_size: the number of bytes buffered before writing them to the stream
+        """
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self.num_frames = 0
+        self._pending = []
+        self._pending_size = 0
+
+    def append(self, data):
+        """ append a serialized frame
+
+        :data: the frame as json bytes or as a string
+        :returns: the frame number within the stream
+        """
+        if isinstance(data, str):
+            data = data.encode()
+        self._pending.append(_LENGTH.pack(len(data)))
+        self._pending.append(data)
+        self._pending_size += _LENGTH.size + len(data)
+        self.num_frames += 1
+        if self.num_frames == 1 or self._pending_size >= self.buffer_size:
+            self.flush()
+        return self.num_frames - 1
+
+    def flush(self):
+        if self._pending:
+            self.stream.write(b"".join(self._pending))
+            self._pending = []
+            self._pending_size = 0
+        self.stream.flush()
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_frame_stream(stream):
+    """ read the frames written by FrameStreamWriter, as they arrive
+
+    :stream: a binary stream, e.g. sys.stdin.buffer
+    :returns: an iterator of the frames as json bytes
+    :raises: a ValueError if the stream ends within a record
+    """
+    while True:
+        header = stream.read(_LENGTH.size)
+        if not header:
+            return
+        if len(header) < _LENGTH.size:
+            raise ValueError("frame stream ends within a record header")
+        size, = _LENGTH.unpack(header)
+        data = stream.read(size)
+        if len(data) < size:
+            raise ValueError("frame stream ends within a frame")
+        yield data
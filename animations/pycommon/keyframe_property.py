@@ -0,0 +1,175 @@
+from bisect import bisect_right
+
+from . import batch
+from .animated_property import AnimatedProperty
+from .maths import Point, _point
+
+INTERPOLATIONS = ("linear", "catmull-rom", "bezier")
+
+
+class KeyframeValue(AnimatedProperty):
+
+    """ A value interpolated between keyframes, lasting until the frame of the last key.
+
+    Each segment between two keys is stored as the coefficients of a cubic polynomial a + b*t + c*t^2 + d*t^3,
+    computed once, where t goes from 0 at the key starting the segment to 1 at the next key. A frame is evaluated by
+    looking up its segment, so the cost of a frame does not depend on the number of keys.
+    Frames before the first key hold the value of the first key.
+    """
+
+    def __init__(self, keys, interpolation="linear", controls=None):
+        """
+        :keys: a list of (frame, value) pairs, with strictly increasing non-negative frame numbers
+        :interpolation: linear|catmull-rom|bezier.
+                linear goes straight from one key to the next;
+                catmull-rom passes smoothly through every key, with the tangent at each key pointing from
+                the previous key to the next one;
+                bezier uses the control points in `controls`, or the catmull-rom tangents if not specified
+        :controls: for bezier, one (control1, control2) pair of values for each segment between two keys
+        """
+        super().__init__()
+        if not keys:
+            raise ValueError("At least one key is required")
+        if interpolation not in INTERPOLATIONS:
+            raise ValueError(f"unknown interpolation [{interpolation}]")
+        frames = [frame for frame, _ in keys]
+        for frame in frames:
+            if not isinstance(frame, int) or frame < 0:
+                raise ValueError(f"key frame [{frame}] is not a non-negative integer")
+        for previous, frame in zip(frames, frames[1:]):
+            if frame <= previous:
+                raise ValueError(f"key frames must be strictly increasing, got [{previous}] then [{frame}]")
+        if controls is not None and len(controls) != len(keys) - 1:
+            raise ValueError(f"expected [{len(keys) - 1}] control pairs, one for each segment, got [{len(controls)}]")
+        self.keys = list(keys)
+        self.interpolation = interpolation
+        self.key_frames = frames
+        points = [self._components(value) for _, value in keys]
+        if interpolation == "linear":
+            # a straight line has no higher order terms, keep them exactly zero
+            coefficients = [(p, [b - a for a, b in zip(p, q)], [0.0] * len(p), [0.0] * len(p))
+                            for p, q in zip(points, points[1:])]
+        else:
+            if controls is None or interpolation == "catmull-rom":
+                controls = self._catmull_rom_controls(frames, points)
+            else:
+                controls = [(self._components(c1), self._components(c2)) for c1, c2 in controls]
+            coefficients = [self._bezier_coefficients(p, c1, c2, q)
+                            for p, (c1, c2), q in zip(points, controls, points[1:])]
+        # the last key is a segment of its own, holding its value
+        last = points[-1]
+        coefficients.append((last, [0.0] * len(last), [0.0] * len(last), [0.0] * len(last)))
+        self.coefficients = [tuple([float(x) for x in term] for term in row) for row in coefficients]
+        # the length of each segment, 1 for the last key so that its t is 0
+        self.durations = [q - p for p, q in zip(frames, frames[1:])] + [1]
+
+    @staticmethod
+    def _catmull_rom_controls(frames, points):
+        """ the bezier control points of each segment giving a Catmull-Rom spline.
+        The tangent at a key is the slope per frame from the previous key to the next one (one-sided at both ends),
+        so keys spaced unevenly still give a constant speed through each key.
+
+        :returns: a (control1, control2) pair of component lists for each segment
+        """
+        slopes = []
+        for i in range(len(points)):
+            before, after = max(i - 1, 0), min(i + 1, len(points) - 1)
+            span = frames[after] - frames[before]
+            slopes.append([0.0 if span == 0 else (q - p) / span for p, q in zip(points[before], points[after])])
+        controls = []
+        for i in range(len(points) - 1):
+            duration = frames[i + 1] - frames[i]
+            controls.append(([p + m * duration / 3 for p, m in zip(points[i], slopes[i])],
+                             [p - m * duration / 3 for p, m in zip(points[i + 1], slopes[i + 1])]))
+        return controls
+
+    @staticmethod
+    def _bezier_coefficients(p0, p1, p2, p3):
+        """ the polynomial coefficients of a cubic bezier curve, component-wise
+
+        :returns: a tuple (a, b, c, d) of component lists
+        """
+        return ([a for a in p0],
+                [3 * (b - a) for a, b in zip(p0, p1)],
+                [3 * (a - 2 * b + c) for a, b, c in zip(p0, p1, p2)],
+                [d - a + 3 * (b - c) for a, b, c, d in zip(p0, p1, p2, p3)])
+
+    def _components(self, value):
+        """ the value as a list of numbers """
+        return [value]
+
+    def _value(self, components):
+        """ the reverse of _components """
+        return components[0]
+
+    def _evaluate(self, segment, frame_num):
+        """ the value at a frame within a segment, with Horner's scheme """
+        a, b, c, d = self.coefficients[segment]
+        t = max(frame_num - self.key_frames[segment], 0) / self.durations[segment]
+        return self._value([a[k] + t * (b[k] + t * (c[k] + t * d[k])) for k in range(len(a))])
+
+    def value_at(self, frame_num):
+        """ the interpolated value at a frame
+
+        :frame_num: a frame number within the animation
+        :returns: the value
+
+        """
+        return self._evaluate(max(bisect_right(self.key_frames, frame_num) - 1, 0), frame_num)
+
+    def __iter__(self):
+        PropertyFrame = self.PropertyFrame
+        segment = 0
+        for frame_num in range(self._num_frames()):
+            # walk through the segments instead of looking each frame up
+            while segment + 1 < len(self.key_frames) and self.key_frames[segment + 1] <= frame_num:
+                segment += 1
+            yield PropertyFrame({'value': self._evaluate(segment, frame_num)}, self, frame_num)
+
+    def _can_seek(self):
+        return True
+
+    def _num_frames(self):
+        return self.key_frames[-1] + 1
+
+    def _seek_frame(self, frame_num):
+        if frame_num >= self._num_frames():
+            raise IndexError(f"frame [{frame_num}] is out of range")
+        return self.PropertyFrame(props={'value': self.value_at(frame_num)}, ap=self, frame_num=frame_num)
+
+    def _evaluate_batch(self, frame_nums):
+        np = batch.np
+        key_frames = np.asarray(self.key_frames)
+        segments = np.maximum(np.searchsorted(key_frames, frame_nums, side='right') - 1, 0)
+        t = np.maximum(frame_nums - key_frames[segments], 0) / np.asarray(self.durations)[segments]
+        # (segments, 4 terms, components) indexed into (frames, 4 terms, components)
+        a, b, c, d = np.moveaxis(np.asarray(self.coefficients)[segments], 1, 0)
+        t = t[:, None]
+        values = a + t * (b + t * (c + t * d))
+        return batch.FrameBatch(self, frame_nums, {'value': self._column(values)})
+
+    def _column(self, values):
+        """ the value column of a batch, from an array with one row of components per frame """
+        return values[:, 0]
+
+    def get_frame_data(self, property_frame):
+        return property_frame.props['value']
+
+
+class KeyframePoint(KeyframeValue):
+
+    """ A point in 3D interpolated between keyframes, see KeyframeValue """
+
+    def _components(self, value):
+        if not isinstance(value, Point):
+            raise ValueError(f"expected a Point, got [{type(value).__name__}]")
+        return value.toList()
+
+    def _value(self, components):
+        return _point(*components)
+
+    def _column(self, values):
+        return values
+
+    def get_frame_data(self, property_frame):
+        return property_frame.props['value'].toList()
@@ -1,7 +1,44 @@
+from itertools import count
+import math
+
+from . import batch, frame_cache, profiling
 from .animated_property import AnimatedProperty
+from .maths import _point
+
+_new_frame = object.__new__
+
+
+class _LerpFrame(AnimatedProperty.PropertyFrame):
+
+    """A frame of a lerp holding its frame data only. The props, repeating the start and increment of the lerp on
+    every frame, are built when they are read. The frame data is shared by every call to get_frame_data and must not be
+    changed in place, as with a FrameDataCache.
+    """
+
+    __slots__ = ('data',)
+
+    @property
+    def props(self):
+        return self.ap._props(self.data)
+
+    def get_frame_data(self):
+        # the frame data is already built, it only goes through the cache or the profiler while one of them is active
+        if frame_cache._active is None and profiling._active is None:
+            return self.data
+        return super().get_frame_data()
+
+
+def _lerp_frame(data, ap, frame_num):
+    """ build a _LerpFrame without going through PropertyFrame.__init__ """
+    frame = _new_frame(_LerpFrame)
+    frame.data = data
+    frame.ap = ap
+    frame.frame_num = frame_num
+    return frame
+
 
 class LerpValue(AnimatedProperty):
-    """ A linearly interpolated value """
+    """ A linearly interpolated value, where the value at frame i is computed as start + increment * i """
 
     def __init__(self, start, increment, max_frame=None):
         """
@@ -12,15 +49,9 @@ class LerpValue(AnimatedProperty):
 
         """
         super().__init__()
-        self.register_child_property('start', start)
-        self.register_child_property('increment', increment)
-
-        @self.dynamic_property('value', start)
-        def update(property_frame):
-            return property_frame.props['value'] + property_frame.props['increment']
-
-        if max_frame is not None:
-            self.register_terminator(lambda pf: pf.frame_num >= max_frame)
+        self.start = start
+        self.increment = increment
+        self.max_frame = max_frame
 
     @classmethod
     def from_interval(cls, start, end, num_frames):
@@ -33,8 +64,57 @@ class LerpValue(AnimatedProperty):
         increment = interval / (num_frames - 1)
         return cls(start, increment, num_frames)
 
+    def value_at(self, frame_num):
+        """ the interpolated value at a frame, computed in closed form so that
+        iterating and seeking give bit-identical results. __iter__ computes the same expression inline.
+
+        :frame_num: the frame number
+        :returns: start + increment * frame_num
+
+        """
+        return self.start + self.increment * frame_num
+
+    def __iter__(self):
+        start, increment = self.start, self.increment
+        for frame_num in count() if self.max_frame is None else range(self.max_frame):
+            frame = _new_frame(_LerpFrame)
+            frame.data = start + increment * frame_num
+            frame.ap = self
+            frame.frame_num = frame_num
+            yield frame
+
+    def _props(self, data):
+        """ the props of a frame, from its frame data """
+        return {'start': self.start, 'increment': self.increment, 'value': data}
+
+    def _frame_data(self, value):
+        """ the frame data of a value """
+        return value
+
+    def _can_seek(self):
+        return True
+
+    def _num_frames(self):
+        return math.inf if self.max_frame is None else self.max_frame
+
+    def _seek_frame(self, frame_num):
+        if frame_num >= self._num_frames():
+            raise IndexError(f"frame [{frame_num}] is out of range")
+        # between the last frame and the end, hold the end value instead of going past it
+        position = frame_num if self.max_frame is None else min(frame_num, self.max_frame - 1)
+        return _lerp_frame(self._frame_data(self.value_at(position)), self, frame_num)
+
+    def _evaluate_batch(self, frame_nums):
+        n = len(frame_nums)
+        return batch.FrameBatch(self, frame_nums, {
+            'start': batch.static_column(self.start, n),
+            'increment': batch.static_column(self.increment, n),
+            'value': batch.lerp_column(self.start, self.increment, frame_nums, self.value_at)})
+
     def get_frame_data(self, property_frame):
-        return property_frame.props['value']
+        if isinstance(property_frame, _LerpFrame):
+            return property_frame.data
+        return self._frame_data(property_frame.props['value'])
 
 
 class LerpPoint(LerpValue):
@@ -44,5 +124,27 @@ class LerpPoint(LerpValue):
     def __init__(self, start, direction, max_frame=None):
         super().__init__(start, direction, max_frame)
 
-    def get_frame_data(self, property_frame):
-        return property_frame.props['value'].toList() 
+    def value_at(self, frame_num):
+        # component-wise, to allocate one Point instead of one per operator;
+        # gives the same result as start + direction * frame_num
+        start, direction = self.start, self.increment
+        return _point(start.x + direction.x * frame_num,
+                      start.y + direction.y * frame_num,
+                      start.z + direction.z * frame_num)
+
+    def __iter__(self):
+        # the frame data of value_at, without building the Point
+        sx, sy, sz = self.start.toList()
+        dx, dy, dz = self.increment.toList()
+        for frame_num in count() if self.max_frame is None else range(self.max_frame):
+            frame = _new_frame(_LerpFrame)
+            frame.data = [sx + dx * frame_num, sy + dy * frame_num, sz + dz * frame_num]
+            frame.ap = self
+            frame.frame_num = frame_num
+            yield frame
+
+    def _props(self, data):
+        return {'start': self.start, 'increment': self.increment, 'value': _point(*data)}
+
+    def _frame_data(self, value):
+        return value.toList()
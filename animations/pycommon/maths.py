@@ -2,7 +2,9 @@ import math
 
 class Point(object):
 
-    """A point or vector in 3D"""
+    """A point or vector in 3D. Points are immutable, every operation returns a new Point."""
+
+    __slots__ = ('_x', '_y', '_z')
 
     def __init__(self, x, y, z):
         """TODO: to be defined.
@@ -46,14 +48,16 @@ class Point(object):
     def fromList(cls, l):
         """construct a point object from list
 
-        :l: TODO
-        :returns: TODO
+        :l: a list, tuple or any other iterable of 3 numbers
+        :returns: a Point
 
         """
-        if len(l) != 3:
+        try:
+            x, y, z = l
+        except ValueError:
             raise ValueError(
                     f"List passed in to a point constructor must be 3 elements: {l}")
-        return cls(*l)
+        return cls(x, y, z)
 
     def toList(self):
         """TODO: Docstring for toList.
@@ -70,42 +74,40 @@ class Point(object):
 
         """
         if isinstance(other, (float, int)):
-            return Point(self.x * other,
-                         self.y * other,
-                         self.z * other)
+            return _point(self._x * other,
+                          self._y * other,
+                          self._z * other)
         elif isinstance(other, Point):
-            return Point(self.x * other.x,
-                         self.y * other.y,
-                         self.z * other.z)
+            return _point(self._x * other._x,
+                          self._y * other._y,
+                          self._z * other._z)
         else:
             raise ValueError(f"Unknown type for other: {type(other)}")
 
     def __truediv__(self, other):
         if isinstance(other, (float, int)):
-            return Point(self.x / other,
-                         self.y / other,
-                         self.z / other)
+            return _point(self._x / other,
+                          self._y / other,
+                          self._z / other)
         elif isinstance(other, Point):
-            return Point(self.x / other.x,
-                         self.y / other.y,
-                         self.z / other.z)
+            return _point(self._x / other._x,
+                          self._y / other._y,
+                          self._z / other._z)
         else:
             raise ValueError(f"Unknown type for other: {type(other)}")
 
     def __floordiv__(self, other):
         if isinstance(other, (float, int)):
-            return Point(self.x // other,
-                         self.y // other,
-                         self.z // other)
+            return _point(self._x // other,
+                          self._y // other,
+                          self._z // other)
         elif isinstance(other, Point):
-            return Point(self.x // other.x,
-                         self.y // other.y,
-                         self.z // other.z)
+            return _point(self._x // other._x,
+                          self._y // other._y,
+                          self._z // other._z)
         else:
             raise ValueError(f"Unknown type for other: {type(other)}")
 
-
-
     def __sub__(self, other):
         """minus operator
 
@@ -114,21 +116,56 @@ class Point(object):
 
         """
         if isinstance(other, Point):
-            return Point(self._x - other._x,
-                         self._y - other._y,
-                         self._z - other._z)
+            return _point(self._x - other._x,
+                          self._y - other._y,
+                          self._z - other._z)
         elif isinstance(other, (float, int)):
-            return Point(self._x - other,
-                         self._y - other,
-                         self._z - other)
+            return _point(self._x - other,
+                          self._y - other,
+                          self._z - other)
         else:
             raise ValueError(f"Unknown type for other: {type(other)}")
 
     def __add__(self, other):
-        return self - (other * -1)
+        """plus operator
+
+        :other: either a number or a point
+        :returns: a point
+
+        """
+        if isinstance(other, Point):
+            return _point(self._x + other._x,
+                          self._y + other._y,
+                          self._z + other._z)
+        elif isinstance(other, (float, int)):
+            return _point(self._x + other,
+                          self._y + other,
+                          self._z + other)
+        else:
+            raise ValueError(f"Unknown type for other: {type(other)}")
 
     def __neg__(self):
-        return self * -1
+        return _point(-self._x, -self._y, -self._z)
+
+    def __eq__(self, other):
+        if not isinstance(other, Point):
+            return NotImplemented
+        return self._x == other._x and self._y == other._y and self._z == other._z
+
+    def __hash__(self):
+        return hash((self._x, self._y, self._z))
 
     def __repr__(self):
         return f"Point({self._x}, {self._y}, {self._z})"
+
+
+_new_point = object.__new__
+
+
+def _point(x, y, z):
+    """ construct a Point without validating the coordinates, for results of arithmetic on valid Points """
+    point = _new_point(Point)
+    point._x = x
+    point._y = y
+    point._z = z
+    return point
@@ -0,0 +1,72 @@
+from .maths import Point
+
+
+def same_value(a, b):
+    """ whether two values of frame data are encoded to the same json. Values that are equal in Python can still be
+    encoded differently, such as 1 and 1.0 or True and 1, so the types are compared as well, recursively.
+
+    :a: a value of frame data
+    :b: another value of frame data
+    :returns: True if the values and their types are the same, and dictionaries have their keys in the same order
+    """
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, dict):
+        return list(a) == list(b) and all(same_value(value, b[key]) for key, value in a.items())
+    if isinstance(a, (list, tuple)):
+        return len(a) == len(b) and all(same_value(x, y) for x, y in zip(a, b))
+    if isinstance(a, Point):
+        return same_value(a.toList(), b.toList())
+    if hasattr(a, 'dtype') and hasattr(a, 'tolist'):
+        # NumPy arrays and scalars
+        return a.dtype == b.dtype and same_value(a.tolist(), b.tolist())
+    try:
+        return bool(a == b)
+    except (TypeError, ValueError):
+        return False
+
+
+def make_merge_patch(base, target):
+    """ compute the JSON merge patch (RFC 7386) that turns base into target.
+
+    Unchanged keys are left out, see same_value for what counts as unchanged. Nested dictionaries are patched
+    recursively, and anything else that changed, including lists, is replaced as a whole. Keys missing from target, or set to None in target, are removed by the
+    patch, which a scene loader treats the same way.
+
+    :base: the frame data the patch applies to
+    :target: the frame data to be reached
+    :returns: the patch, a dictionary if both base and target are dictionaries
+
+    """
+    if not isinstance(base, dict) or not isinstance(target, dict):
+        return target
+    patch = {}
+    for key, value in target.items():
+        if key not in base:
+            patch[key] = value
+        elif not same_value(base[key], value):
+            patch[key] = make_merge_patch(base[key], value) \
+                if isinstance(value, dict) and isinstance(base[key], dict) else value
+    for key in base:
+        if key not in target:
+            patch[key] = None
+    return patch
+
+
+def apply_merge_patch(base, patch):
+    """ apply a JSON merge patch (RFC 7386), the reverse of make_merge_patch
+
+    :base: the frame data the patch applies to, left unchanged
+    :patch: the patch
+    :returns: the patched frame data
+
+    """
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(base) if isinstance(base, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = apply_merge_patch(result.get(key), value)
+    return result
@@ -0,0 +1,252 @@
+""" A low resolution preview of the frames written by framebuilder.py, to check an animation without raytracing it.
+
+The frame data is shaded like raytrace.dart does, with the same camera, intersections, shadows and Blinn-Phong
+lighting, but without reflection, refraction or pixel samples, and with the rays of all pixels traced at once as
+NumPy array operations. Spheres and quads are drawn, other surfaces are skipped.
+"""
+from .batch import np
+
+# the closest distance of an intersection along a ray, the same as in raytrace.dart
+RAY_EPSILON = 1e-4
+
+_DEFAULT_LIGHT = {'type': 'point', 'frame': {}, 'intensity': [1, 1, 1]}
+_DEFAULT_SURFACE = {'type': 'sphere', 'size': 1, 'frame': {}, 'material': {}}
+
+
+def require_numpy():
+    """ make sure NumPy is available for previews """
+    if np is None:
+        raise ImportError("NumPy is required for previews")
+
+
+def _normalize(v):
+    return v / np.linalg.norm(v, axis=-1, keepdims=True)
+
+
+def frame_axes(frame):
+    """ the orthonormal axes of a frame in the frame data, completed the same way as Frame in common/maths.dart
+
+    :frame: a dictionary with the origin 'o' and any of the axes 'x', 'y' and 'z'
+    :returns: a tuple of arrays (o, x, y, z)
+    """
+    o = np.asarray(frame.get('o', [0, 0, 0]), dtype=float)
+    x, y, z = (None if frame.get(axis) is None else _normalize(np.asarray(frame[axis], dtype=float))
+               for axis in 'xyz')
+    given = sum(axis is not None for axis in (x, y, z))
+    if given == 0:
+        x, y, z = np.eye(3)
+    elif given == 1:
+        # any vector that is not parallel, as picked by the renderer
+        if x is not None:
+            y = _normalize(np.array([-x[0] + 3.14, x[1] + 42, x[2] - 1.61]))
+            z = _normalize(np.cross(x, y))
+            y = _normalize(np.cross(z, x))
+        elif y is not None:
+            x = _normalize(np.array([-y[0] + 3.14, y[1] + 42, y[2] - 1.61]))
+            z = _normalize(np.cross(x, y))
+            x = _normalize(np.cross(y, z))
+        else:
+            x = _normalize(np.array([-z[0] + 3.14, z[1] + 42, z[2] - 1.61]))
+            y = _normalize(-np.cross(x, z))
+            x = _normalize(np.cross(y, z))
+    elif given == 2:
+        if z is None:
+            z = _normalize(np.cross(x, y))
+            y = _normalize(np.cross(z, x))
+        elif y is None:
+            y = _normalize(np.cross(z, x))
+            x = _normalize(np.cross(y, z))
+        else:
+            x = _normalize(np.cross(y, z))
+            y = _normalize(np.cross(z, x))
+    else:
+        x = _normalize(np.cross(y, z))
+        y = _normalize(np.cross(z, x))
+    return o, x, y, z
+
+
+class _Surfaces:
+
+    """ The spheres and quads of a frame, as one array per attribute """
+
+    def __init__(self, surfaces):
+        spheres = [s for s in surfaces if s.get('type', 'sphere') == 'sphere']
+        quads = [s for s in surfaces if s.get('type', 'sphere') == 'quad']
+        self.sphere_center = np.array([frame_axes(s.get('frame', {}))[0] for s in spheres]).reshape(-1, 3)
+        self.sphere_radius = np.array([float(s.get('size', 1)) for s in spheres])
+        axes = [frame_axes(s.get('frame', {})) for s in quads]
+        self.quad_o, self.quad_x, self.quad_y, self.quad_z = (
+            np.array([a[k] for a in axes]).reshape(-1, 3) for k in range(4))
+        self.quad_size = np.array([float(s.get('size', 1)) for s in quads])
+        # the terms of the intersections that only depend on the surfaces
+        self._sphere_k = np.einsum('ij,ij->i', self.sphere_center, self.sphere_center) - self.sphere_radius ** 2
+        self._quad_zo, self._quad_xo, self._quad_yo = (np.einsum('ij,ij->i', axis, self.quad_o)
+                                                       for axis in (self.quad_z, self.quad_x, self.quad_y))
+        # the materials of the spheres followed by the quads, indexed by the surface hit
+        materials = [s.get('material', {}) for s in spheres + quads]
+        self.kd = np.array([m.get('kd', [1, 1, 1]) for m in materials], dtype=float).reshape(-1, 3)
+        self.ks = np.array([m.get('ks', [0, 0, 0]) for m in materials], dtype=float).reshape(-1, 3)
+        self.n = np.array([float(m.get('n', 10)) for m in materials])
+
+    def intersect(self, origins, directions, t_max=None):
+        """ the first intersection of each ray with the surfaces
+
+        :origins: an (n, 3) array, or a single origin for all rays
+        :directions: an (n, 3) array of unit directions
+        :t_max: the largest distance along the rays, a number or an array of n numbers, None for no limit
+        :returns: a tuple (t, surface), with t inf and surface -1 for the rays that hit nothing
+        """
+        num_rays = len(directions)
+        origins = np.broadcast_to(origins, directions.shape)
+        # every product below is a matrix product of the rays with the surfaces, without (rays, surfaces, 3) arrays
+        candidates = []
+        if len(self.sphere_radius):
+            # |e + t*d - c|^2 = r^2 with |d| = 1, t = -b +- sqrt(b^2 - k) with b = d.(e - c)
+            b = np.einsum('ij,ij->i', directions, origins)[:, None] - directions @ self.sphere_center.T
+            k = np.einsum('ij,ij->i', origins, origins)[:, None] - 2 * origins @ self.sphere_center.T \
+                + self._sphere_k
+            determinant = b * b - k
+            root = np.sqrt(np.maximum(determinant, 0))
+            near = -b - root
+            t = np.where(near >= RAY_EPSILON, near, root - b)
+            candidates.append(np.where((determinant >= 0) & (t >= RAY_EPSILON), t, np.inf))
+        if len(self.quad_size):
+            determinant = directions @ self.quad_z.T
+            with np.errstate(divide='ignore', invalid='ignore'):
+                t = (self._quad_zo - origins @ self.quad_z.T) / determinant
+                # the offset of the intersection from the center of the quad, along both its axes
+                x = origins @ self.quad_x.T + t * (directions @ self.quad_x.T) - self._quad_xo
+                y = origins @ self.quad_y.T + t * (directions @ self.quad_y.T) - self._quad_yo
+                inside = (np.abs(x) <= self.quad_size) & (np.abs(y) <= self.quad_size)
+            candidates.append(np.where(inside & (determinant != 0) & (t >= RAY_EPSILON), t, np.inf))
+        if not candidates:
+            return np.full(num_rays, np.inf), np.full(num_rays, -1)
+        t = np.concatenate(candidates, axis=1)
+        if t_max is not None:
+            t = np.where(t <= np.reshape(t_max, (-1, 1)), t, np.inf)
+        surface = np.argmin(t, axis=1)
+        t = t[np.arange(num_rays), surface]
+        return t, np.where(np.isfinite(t), surface, -1)
+
+    def normals(self, points, surface):
+        """ the normals at points on the surfaces hit, following the renderer: away from the center of spheres, the
+        z axis of quads """
+        num_spheres = len(self.sphere_radius)
+        normals = np.zeros_like(points)
+        is_sphere = surface < num_spheres
+        if num_spheres:
+            normals[is_sphere] = _normalize(points[is_sphere] - self.sphere_center[surface[is_sphere]])
+        if len(self.quad_size):
+            normals[~is_sphere] = self.quad_z[surface[~is_sphere] - num_spheres]
+        return normals
+
+
+class PreviewRenderer:
+
+    """ Renders frame data into small images.
+
+    The geometry of the surfaces is kept from one frame to the next as long as it does not change, which in most
+    animations only the camera does.
+    """
+
+    def __init__(self, width=64, shadows=True):
+        """
+        :width: the width of the images, the height follows the aspect ratio of the resolution of the frame
+        :shadows: trace shadow rays towards the lights, skip them for an even faster preview
+        """
+        require_numpy()
+        if width < 1:
+            raise ValueError(f"preview width [{width}] must be at least 1")
+        self.width = width
+        self.shadows = shadows
+        self._surface_data = None
+        self._surfaces = None
+
+    def _get_surfaces(self, surface_data):
+        if surface_data != self._surface_data:
+            self._surfaces = _Surfaces(surface_data)
+            self._surface_data = surface_data
+        return self._surfaces
+
+    def size(self, frame):
+        """ the (width, height) of the preview of a frame """
+        resolution_width, resolution_height = frame.get('resolution', [512, 512])
+        return self.width, max(1, round(self.width * resolution_height / resolution_width))
+
+    def primary_rays(self, frame):
+        """ the ray through the center of each pixel, row by row from the top left
+
+        :returns: a tuple (eye, directions) with directions an (height * width, 3) array
+        """
+        camera = frame.get('camera', {})
+        eye = np.asarray(camera.get('eye', [0, 0, 1]), dtype=float)
+        target = np.asarray(camera.get('target', [0, 0, 0]), dtype=float)
+        up = np.asarray(camera.get('up', [0, 1, 0]), dtype=float)
+        sensor_width, sensor_height = camera.get('sensorSize', [1, 1])
+        sensor_distance = float(camera.get('sensorDistance', 1))
+        # Frame.lookAt
+        z = _normalize(eye - target)
+        x = _normalize(np.cross(up, z))
+        y = np.cross(z, x)
+        width, height = self.size(frame)
+        h = ((np.arange(width) + 0.5) / width - 0.5) * sensor_width
+        v = -((np.arange(height) + 0.5) / height - 0.5) * sensor_height
+        directions = h[None, :, None] * x + v[:, None, None] * y - sensor_distance * z
+        return eye, _normalize(directions.reshape(-1, 3))
+
+    def render(self, frame):
+        """ shade every pixel of a frame
+
+        :frame: the frame data, as written by framebuilder.py
+        :returns: a (height, width, 3) array of colors, 1 being the full intensity
+        """
+        width, height = self.size(frame)
+        surfaces = self._get_surfaces(frame.get('surfaces', [_DEFAULT_SURFACE]))
+        eye, directions = self.primary_rays(frame)
+        background = np.asarray(frame.get('backgroundIntensity', [0.2, 0.2, 0.2]), dtype=float)
+        ambient = np.asarray(frame.get('ambientIntensity', [0.2, 0.2, 0.2]), dtype=float)
+        colors = np.broadcast_to(background, directions.shape).copy()
+
+        t, surface = surfaces.intersect(eye, directions)
+        hit = surface >= 0
+        surface, directions = surface[hit], directions[hit]
+        points = eye + t[hit, None] * directions
+        normals = surfaces.normals(points, surface)
+        kd, ks, shininess = surfaces.kd[surface], surfaces.ks[surface], surfaces.n[surface]
+        color = ambient * kd
+        for light in frame.get('lights', [_DEFAULT_LIGHT]):
+            origin, _, _, axis = frame_axes(light.get('frame', {}))
+            intensity = np.asarray(light.get('intensity', [1, 1, 1]), dtype=float)
+            if light.get('type', 'point') == 'direction':
+                light_directions = np.broadcast_to(axis, points.shape)
+                response = np.broadcast_to(intensity, points.shape)
+                distance = None
+            else:
+                to_light = origin - points
+                distance = np.linalg.norm(to_light, axis=1)
+                light_directions = -to_light / distance[:, None]
+                response = intensity / (distance ** 2)[:, None]
+            lit = np.ones(len(points), dtype=bool)
+            if self.shadows:
+                lit = surfaces.intersect(points, -light_directions, distance)[1] < 0
+            light_normal = np.einsum('ij,ij->i', normals, -light_directions)
+            viewing_normal = np.einsum('ij,ij->i', normals, -directions)
+            # light reflects only if light and eye are on the same side of the surface
+            lit &= light_normal * viewing_normal > 0
+            bisector = _normalize(-light_directions - directions)
+            specular = np.maximum(np.einsum('ij,ij->i', normals, bisector), 0) ** shininess
+            contribution = response * light_normal[:, None] * (kd + ks * specular[:, None])
+            color += np.where(lit[:, None], contribution, 0)
+        colors[hit] = color
+        return colors.reshape(height, width, 3)
+
+
+def to_ppm(colors):
+    """ encode colors as a binary PPM image, converted to bytes the same way as the renderer
+
+    :colors: a (height, width, 3) array, as returned by PreviewRenderer.render
+    :returns: the image as bytes
+    """
+    height, width, _ = colors.shape
+    pixels = np.clip((colors * 255.999).astype(np.int64), 0, 255).astype(np.uint8)
+    return f"P6\n{width} {height}\n255\n".encode() + pixels.tobytes()
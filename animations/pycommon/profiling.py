@@ -0,0 +1,103 @@
+""" Opt-in timing of AnimatedProperty iteration.
+
+While a Profiler is active (`with Profiler() as profiler:`), AnimatedProperty.__iter__ records the time spent
+advancing each child property, running dynamic updaters, terminators and snapshots, and PropertyFrame.get_frame_data
+records the time spent building frame data. Timings are aggregated into a tree following the nesting of child
+properties. When no Profiler is active, iteration only checks a module-level variable once per __iter__ call.
+"""
+
+# the Profiler currently recording, None when profiling is disabled
+_active = None
+
+
+def active_profiler():
+    """ the Profiler currently recording, None when profiling is disabled """
+    return _active
+
+
+class ProfileNode:
+
+    """Timings of a property in the profile tree. Nested properties are children of the node."""
+
+    def __init__(self, name):
+        self.name = name
+        self.times = {}
+        self.calls = {}
+        self.children = {}
+
+    def add(self, category, seconds):
+        """ record the time of one call
+
+        :category: advance|updater|terminator|snapshot|get_frame_data, or anything recorded by the caller
+        :seconds: the duration of the call
+        """
+        self.times[category] = self.times.get(category, 0.0) + seconds
+        self.calls[category] = self.calls.get(category, 0) + 1
+
+    def child(self, name):
+        """ get the node of a child property, creating it if needed """
+        node = self.children.get(name)
+        if node is None:
+            node = self.children[name] = ProfileNode(name)
+        return node
+
+    def merge(self, report):
+        """ add the timings of a report, as returned by to_dict, to this node and its children """
+        for category, seconds in report['times'].items():
+            self.times[category] = self.times.get(category, 0.0) + seconds
+            self.calls[category] = self.calls.get(category, 0) + report['calls'][category]
+        for name, child_report in report['children'].items():
+            self.child(name).merge(child_report)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'times': dict(self.times),
+            'calls': dict(self.calls),
+            'children': {name: child.to_dict() for name, child in self.children.items()},
+        }
+
+
+class Profiler:
+
+    """Records the timings of every AnimatedProperty iterated while it is active.
+
+    Times are inclusive: the 'advance' time of an animated child includes everything recorded in its own node, and
+    the 'get_frame_data' time of a property includes the get_frame_data of its children.
+    """
+
+    def __init__(self, name="root"):
+        """
+        :name: the name of the root node, usually the name of the scene being profiled
+        """
+        self.root = ProfileNode(name)
+        # the node that an AnimatedProperty starting its iteration records into
+        self.current = self.root
+        # id(ap) -> (ap, node), the AnimatedProperty is kept alive so that its id is not reused
+        self._nodes = {}
+        self._previous = None
+
+    def bind(self, ap, node):
+        """ record the get_frame_data timings of the frames of ap into node """
+        self._nodes[id(ap)] = (ap, node)
+
+    def node_of(self, ap):
+        """ the node recording the timings of ap, a child of the root named after its class if ap was not iterated """
+        entry = self._nodes.get(id(ap))
+        if entry is None:
+            return self.root.child(type(ap).__name__)
+        return entry[1]
+
+    def report(self):
+        """ the profile tree as a json serializable dictionary """
+        return self.root.to_dict()
+
+    def __enter__(self):
+        global _active
+        self._previous = _active
+        _active = self
+        return self
+
+    def __exit__(self, *exc_info):
+        global _active
+        _active = self._previous
@@ -0,0 +1,96 @@
+""" Looks scenes up by name, importing the module of a scene only when it is first used.
+
+A scene is found, in this order:
+    - registered in-process with register_scene;
+    - by naming convention: a scene named FooBarScene is the class FooBarScene in the module scene_foo_bar of this
+      package;
+    - by an entry point in the ENTRY_POINT_GROUP group of an installed package, named after the scene, e.g.
+      `MyScene = my_package.scenes:MyScene`.
+"""
+import importlib
+import os
+import re
+
+# the entry point group of the scenes provided by installed packages
+ENTRY_POINT_GROUP = "animation.scenes"
+
+# scenes registered in-process or already imported, by name
+_scenes = {}
+
+
+def register_scene(name, scene):
+    """ make a scene available by name, taking precedence over the naming convention and entry points
+
+    :name: the name of the scene, as written in animation scripts
+    :scene: the scene class, or any callable taking the params of the script and returning an AnimatedProperty
+    """
+    _scenes[name] = scene
+
+
+def scene_module_name(name):
+    """ the module holding a scene by naming convention, e.g. scene_planet for PlanetScene
+
+    :name: the name of the scene
+    :returns: the name of the module within this package
+    """
+    if name.endswith("Scene") and name != "Scene":
+        name = name[:-len("Scene")]
+    return "scene_" + re.sub(r"(?<=[a-z0-9])(?=[A-Z])", "_", name).lower()
+
+
+def _entry_points():
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        return []
+    points = entry_points()
+    if hasattr(points, "select"):
+        return points.select(group=ENTRY_POINT_GROUP)
+    # python < 3.10 returns a dictionary of groups
+    return points.get(ENTRY_POINT_GROUP, [])
+
+
+def _import_by_convention(name):
+    module_name = f"{__package__}.{scene_module_name(name)}"
+    try:
+        module = importlib.import_module(module_name)
+    except ModuleNotFoundError as e:
+        # a missing module of the convention means the scene is elsewhere, a missing import within it is an error
+        if e.name != module_name:
+            raise
+        return None
+    return getattr(module, name, None)
+
+
+def get_scene(name):
+    """ look a scene up by name, importing its module the first time
+
+    :name: the name of the scene, as written in animation scripts
+    :returns: the scene class
+    :raises: a ValueError if no scene has that name
+    """
+    if name in _scenes:
+        return _scenes[name]
+    scene = _import_by_convention(name)
+    if scene is None:
+        scene = next((point.load() for point in _entry_points() if point.name == name), None)
+    if scene is None:
+        raise ValueError(f"unknown scene [{name}], expected the class {name} in "
+                         f"{__package__}.{scene_module_name(name)} or an entry point in [{ENTRY_POINT_GROUP}]")
+    _scenes[name] = scene
+    return scene
+
+
+def available_scenes():
+    """ the names of the scenes that can be looked up, without importing them.
+    Scenes found by naming convention are listed by module, with their name derived from it.
+
+    :returns: a sorted list of names
+    """
+    names = set(_scenes)
+    for file_name in os.listdir(os.path.dirname(__file__)):
+        module, ext = os.path.splitext(file_name)
+        if ext == ".py" and module.startswith("scene_"):
+            names.add("".join(part.capitalize() for part in module.split("_")[1:]) + "Scene")
+    names.update(point.name for point in _entry_points())
+    return sorted(names)
@@ -0,0 +1,73 @@
+""" Changing the frame rate or the length of an animation without changing the scene, by evaluating its timeline
+only at the times of the frames to be written, see AnimatedProperty.sample.
+"""
+from . import batch
+from .animated_property import AnimatedProperty
+
+
+def sample_times(num_frames, every=1, fps=None, duration=None, timeline_fps=30):
+    """ the times on the timeline of an animation at which to evaluate its frames
+
+    :num_frames: the number of frames of the timeline
+    :every: only keep every k-th time, for drafts
+    :fps: the frame rate of the frames written, None for the frame rate of the timeline
+    :duration: the length in seconds of the frames written, None for the length of the timeline at its frame rate.
+            The timeline is stretched to the duration, its first and last frames are always written.
+    :timeline_fps: the frame rate of the timeline
+    :returns: a range of frame numbers if the timeline is not resampled, a list of fractional times otherwise
+
+    """
+    if every < 1:
+        raise ValueError(f"--every must be at least 1, got [{every}]")
+    if fps is not None and fps <= 0:
+        raise ValueError(f"--fps must be positive, got [{fps}]")
+    if duration is not None and duration <= 0:
+        raise ValueError(f"--duration must be positive, got [{duration}]")
+    if duration is None:
+        duration = num_frames / timeline_fps
+    if fps is None:
+        fps = timeline_fps
+    num_samples = max(1, round(duration * fps))
+    if num_frames == 0 or num_samples == num_frames:
+        return range(0, num_frames, every)
+    if num_samples == 1:
+        return [0]
+    # the first and the last frame are kept, with the frames in between evenly spread. Dividing last, the last time
+    # is exactly the last frame, multiplying by a rounded scale could fall just short of it
+    return [i * (num_frames - 1) / (num_samples - 1) for i in range(0, num_samples, every)]
+
+
+class ResampledProperty(AnimatedProperty):
+
+    """ An animation evaluated at given times of the timeline of another one: frame i is the frame of the sampled
+    animation at times[i]. Seeks when the animation it samples can seek.
+    """
+
+    def __init__(self, animation, times):
+        """
+        :animation: the AnimatedProperty being sampled
+        :times: a sequence of times in frames, see sample_times
+        """
+        super().__init__()
+        self.animation = animation
+        self.times = times
+
+    def __iter__(self):
+        return self.animation.sample(self.times)
+
+    def _can_seek(self):
+        return self.animation._can_seek()
+
+    def _num_frames(self):
+        return len(self.times)
+
+    def _seek_frame(self, frame_num):
+        if frame_num >= self._num_frames():
+            raise IndexError(f"frame [{frame_num}] is out of range")
+        return self.animation._seek_frame(self.times[frame_num])
+
+    def _evaluate_batch(self, frame_nums):
+        if isinstance(self.times, range):
+            return self.animation._evaluate_batch(frame_nums * self.times.step + self.times.start)
+        # batches are evaluated at whole frames, fractional times are sampled one at a time
+        return batch.FrameBatch.replay(self, frame_nums)
@@ -4,21 +4,24 @@ from .maths import Point
 
 
 class PlanetScene(AnimatedProperty):
-    def __init__(self):
+    def __init__(self, num_frames=1000):
+        """
+        :num_frames: the length of the animation, the camera moves along the same path in that many frames
+        """
         super().__init__()
 
         self.register_child_property(
             'cameraEye', LerpPoint.from_interval(
                 start=Point(
                     22, 0, 50), end=Point(
-                    22, 20, 0), num_frames=500))
+                    22, 20, 0), num_frames=num_frames // 2))
         self.append_child_property(
             'cameraEye', LerpPoint.from_interval(
                 start=Point(
                     22, 20, 0), end=Point(
-                    22, 0, -50), num_frames=500))
+                    22, 0, -50), num_frames=num_frames - num_frames // 2))
         self.register_child_property('cameraTarget', LerpPoint.from_interval(
-            start=Point(-20, 0, 0), end=Point(40, 0, 0), num_frames=1000))
+            start=Point(-20, 0, 0), end=Point(40, 0, 0), num_frames=num_frames))
 
     def get_frame_data(self, property_frame):
         return {
@@ -143,3 +143,382 @@ def test_append_child_property(ap):
     for pf, i in zip(ap, [1,2,3,4,5,6]):
         assert pf.props['iterated'] == i
 
+
+def test_frame_at_matches_iteration(ap):
+    # GIVEN a seekable animation with static, iterated, appended and nested properties
+    ap.register_child_property('const', 1, property_type="static")
+    ap.register_child_property('iterated', [1, 2, 3], property_type="iterated")
+    ap.append_child_property('iterated', [4, 5, 6])
+    ap.register_child_property('keep', [1, 2], end_action="keep")
+    ap.register_child_property('end_value', [1], end_action="end_value", end_value=99)
+    ap.register_child_property('drop', [1, 2, 3, 4], end_action="drop")
+    child = AnimatedProperty()
+    child.register_child_property('child_value', [7, 8, 9, 10, 11, 12, 13])
+    ap.register_child_property('child', child)
+    # WHEN we seek to each frame directly
+    # THEN we expect the same frame data as iterating
+    iterated = [pf.get_frame_data() for pf in ap]
+    assert len(iterated) == 6
+    for i, frame_data in enumerate(iterated):
+        property_frame = ap.frame_at(i)
+        assert property_frame.frame_num == i
+        assert property_frame.get_frame_data() == frame_data
+    # THEN we expect indexing and ranges to work like a sequence
+    assert ap[-1].get_frame_data() == iterated[-1]
+    assert [pf.get_frame_data() for pf in ap[1:6:2]] == iterated[1:6:2]
+    assert [pf.get_frame_data() for pf in ap.frames(2)] == iterated[2:]
+    with pytest.raises(IndexError):
+        ap.frame_at(6)
+
+
+def test_frame_at_replays_dynamic_property(ap):
+    # GIVEN an animation with a dynamic property, which cannot be computed directly
+    ap.register_child_property('step', 2, property_type="static")
+    ap.register_child_property(
+        'value',
+        0,
+        dynamic_updater=lambda pf: pf.props['step'] + pf.props['value'])
+    # WHEN we seek to a frame
+    # THEN we expect the animation to be replayed up to that frame
+    assert ap.frame_at(10).props['value'] == 20
+    assert [pf.props['value'] for pf in ap.frames(3, 9, 3)] == [6, 12]
+    # THEN we expect negative frames to be rejected since the length is unknown
+    with pytest.raises(IndexError):
+        ap.frame_at(-1)
+
+
+def test_frame_at_custom_iteration():
+    # GIVEN a subclass yielding frames of its own from __iter__, without child properties
+    class Counter(AnimatedProperty):
+        def __iter__(self):
+            for frame_num in range(5):
+                yield self.PropertyFrame({'count': frame_num * 2}, self, frame_num)
+
+    counter = Counter()
+    # WHEN we seek to its frames
+    # THEN we expect the animation to be replayed, since its frames cannot be computed directly
+    assert not counter._can_seek()
+    assert counter.frame_at(1).props == {'count': 2}
+    assert counter[1].props == {'count': 2}
+    assert [pf.props['count'] for pf in counter.frames(1)] == [2, 4, 6, 8]
+    assert [pf.props['count'] for pf in counter.evaluate_batch(range(3))] == [0, 2, 4]
+    # THEN we expect its length to be unknown without iterating
+    with pytest.raises(TypeError):
+        len(counter)
+
+
+def test_frame_at_lerp():
+    from pycommon.lerp_property import LerpValue
+    # GIVEN chained lerp segments
+    ap = AnimatedProperty()
+    ap.register_child_property('lerp', LerpValue.from_interval(0, 8, 5))
+    ap.append_child_property('lerp', LerpValue.from_interval(8, 0, 5))
+    # WHEN we seek to the frames in the second segment
+    # THEN we expect the value to be computed directly
+    assert ap._can_seek()
+    assert ap.frame_at(6).get_frame_data() == {'lerp': 6}
+    assert ap[-1].get_frame_data() == {'lerp': 0}
+    # THEN we expect the chain to be iterable more than once
+    assert len(list(ap)) == len(list(ap)) == 10
+
+
+def test_lerp_closed_form():
+    from pycommon.lerp_property import LerpPoint
+    from pycommon.maths import Point
+    # GIVEN a long lerp with an increment that is not exactly representable
+    lerp = LerpPoint.from_interval(Point(0, 0, 0), Point(1, 2, 3), 1000)
+    # WHEN we iterate to the last frame and seek to it directly
+    frames = list(lerp)
+    # THEN we expect the animation to know its length
+    assert len(frames) == lerp._num_frames() == 1000
+    # THEN we expect the value to be bit-identical either way, and not drift
+    assert frames[999].get_frame_data() == lerp.frame_at(999).get_frame_data()
+    assert frames[999].get_frame_data() == (lerp.start + lerp.increment * 999).toList()
+    assert frames[999].get_frame_data() == pytest.approx([1, 2, 3])
+
+
+def test_lerp_frame_props():
+    from pycommon import frame_cache
+    from pycommon.lerp_property import LerpPoint
+    from pycommon.maths import Point
+    # GIVEN a lerp whose frames hold their frame data only
+    lerp = LerpPoint.from_interval(Point(0, 0, 0), Point(1, 2, 3), 5)
+    frame = list(lerp)[2]
+    # THEN we expect the props to be built on request, the same as the props of a seeked frame
+    assert frame.props == {'start': lerp.start, 'increment': lerp.increment, 'value': lerp.value_at(2)}
+    assert frame.props == lerp.frame_at(2).props
+    # THEN we expect the same frame data with and without a cache
+    with frame_cache.FrameDataCache():
+        assert frame.get_frame_data() == lerp.frame_at(2).get_frame_data() == [0.5, 1.0, 1.5]
+    assert frame.get_frame_data() == [0.5, 1.0, 1.5]
+
+
+def test_evaluate_batch(ap):
+    np = pytest.importorskip("numpy")
+    from pycommon.lerp_property import LerpPoint, LerpValue
+    from pycommon.maths import Point
+    # GIVEN an animation with static values, lists, end_actions and chained lerps
+    ap.register_child_property('const', 1, property_type="static")
+    ap.register_child_property('iterated', [1, 2.5, 'three', 4, 5, 6, 7, 8])
+    ap.register_child_property('keep', [1, 2], end_action="keep")
+    ap.register_child_property('drop', [1, 2, 3], end_action="drop")
+    ap.register_child_property('point', LerpPoint.from_interval(Point(0, 0, 0), Point(1, 2, 3), 4))
+    ap.append_child_property('point', LerpPoint.from_interval(Point(1, 2, 3), Point(0, 0, 0), 4))
+    ap.register_child_property('value', LerpValue(0.5, 0.25), end_action="keep")
+    # WHEN we evaluate all frames as a batch
+    frames = ap.evaluate_batch(range(8))
+    # THEN we expect lerps to be vectorized into arrays
+    assert frames['point']['value'].shape == (8, 3)
+    assert np.array_equal(frames['value']['value'], 0.5 + 0.25 * np.arange(8))
+    # THEN we expect the frames sliced out of the batch to match iterating
+    assert [frames.get_frame_data(i) for i in range(8)] == [pf.get_frame_data() for pf in ap]
+    # THEN we expect any subset of frames to match seeking
+    subset = ap.evaluate_batch([7, 0, 3])
+    assert [pf.get_frame_data() for pf in subset] == [ap.frame_at(i).get_frame_data() for i in [7, 0, 3]]
+    with pytest.raises(IndexError):
+        ap.evaluate_batch(range(9))
+
+
+def test_evaluate_batch_replays_dynamic_property(ap):
+    pytest.importorskip("numpy")
+    # GIVEN an animation with a dynamic property
+    ap.register_child_property(
+        'value',
+        0,
+        dynamic_updater=lambda pf: pf.props['value'] + 1)
+    # WHEN we evaluate a batch
+    frames = ap.evaluate_batch(range(2, 10, 3))
+    # THEN we expect the frames to be replayed
+    assert [pf.props['value'] for pf in frames] == [2, 5, 8]
+
+
+def test_profiler(ap):
+    from pycommon import profiling
+    # GIVEN an animation with a nested child, a dynamic property and a terminator
+    child = AnimatedProperty()
+    child.register_child_property('frames', range(10), property_type="iterated")
+    ap.register_child_property('child', child)
+    ap.register_child_property('value', 0, dynamic_updater=lambda pf: pf.props['value'] + 1)
+    ap.register_terminator(lambda pf: pf.props['value'] == 5)
+    # WHEN we iterate and get the frame data while profiling
+    with profiling.Profiler("scene") as profiler:
+        data = [pf.get_frame_data() for pf in ap]
+    # THEN we expect profiling to be disabled afterwards, and the frames to be unchanged
+    assert profiling.active_profiler() is None
+    assert data == [pf.get_frame_data() for pf in ap]
+    # THEN we expect the timings to follow the nesting of the properties
+    report = profiler.report()
+    assert report['calls']['snapshot'] == 6
+    assert report['calls']['get_frame_data'] == 5
+    assert report['children']['child']['calls']['advance'] == 6
+    assert report['children']['child']['calls']['get_frame_data'] == 5
+    assert report['children']['child']['children']['frames']['calls']['advance'] == 6
+    assert report['children']['value']['calls']['updater'] == 5
+    assert report['children']['value']['times']['updater'] >= 0
+
+
+def test_frame_cache(ap):
+    from pycommon import frame_cache
+    # GIVEN a child kept after it ends, a child made of static values and a property changing every frame
+    kept = AnimatedProperty()
+    kept.register_child_property('frames', range(2), property_type="iterated")
+    still = AnimatedProperty()
+    still.register_child_property('value', 1, property_type="static")
+    ap.register_child_property('kept', kept, end_action='keep')
+    ap.register_child_property('still', still)
+    ap.register_child_property('frames', range(5))
+    mixed = AnimatedProperty()
+    mixed.register_child_property('value', [1, 1.0, 1, 1.0, 1])
+    ap.register_child_property('mixed', mixed)
+    # WHEN we get the frame data while caching
+    with frame_cache.FrameDataCache() as cache:
+        data = [pf.get_frame_data() for pf in ap]
+    # THEN we expect caching to be disabled afterwards, and the frames to be unchanged
+    assert frame_cache.active_cache() is None
+    assert data == [pf.get_frame_data() for pf in ap]
+    # THEN we expect the unchanged children to reuse their frame data, and equal values of another type not to
+    assert [type(frame['mixed']['value']) for frame in data] == [int, float, int, float, int]
+    assert data[2]['kept'] is data[4]['kept']
+    assert data[0]['still'] is data[4]['still']
+    assert cache.hits > 0
+
+
+def test_frame_cache_bounded(ap):
+    from pycommon import frame_cache
+    # GIVEN a child whose value changes every frame, nested in a property whose props cannot be hashed
+    child = AnimatedProperty()
+    child.register_child_property('frames', range(10))
+    ap.register_child_property('child', child)
+    ap.register_child_property('list', [1, 2], property_type="static")
+    # WHEN we get the frame data with a cache holding two of them
+    with frame_cache.FrameDataCache(2) as cache:
+        data = [pf.get_frame_data() for pf in ap]
+    # THEN we expect the frames to be unchanged, and the oldest frame data to be evicted
+    assert data == [pf.get_frame_data() for pf in ap]
+    assert len(cache) <= 2
+    assert cache.evictions > 0
+    # THEN we expect an invalid size to be refused
+    with pytest.raises(ValueError):
+        frame_cache.FrameDataCache(0)
+
+
+def test_frame_cache_point_components(ap):
+    from pycommon import frame_cache
+    from pycommon.maths import Point
+    # GIVEN Points and tuples that are equal, but with components of other types
+    values = [Point(1, 2, 3), Point(1.0, 2, 3), (1, (2, 3)), (1, (2.0, 3)), Point(1, 2, 3)]
+    child = AnimatedProperty()
+    child.register_child_property('value', values)
+    ap.register_child_property('child', child)
+    # WHEN we get the frame data while caching
+    with frame_cache.FrameDataCache():
+        data = [pf.get_frame_data()['child']['value'] for pf in ap]
+    # THEN we expect the components to keep their types
+    assert [type(data[i].x) for i in (0, 1, 4)] == [int, float, int]
+    assert [type(data[i][1][0]) for i in (2, 3)] == [int, float]
+
+
+def test_drop_shifts_later_properties(ap):
+    # GIVEN properties registered after one that is dropped, ending in the same frame
+    ap.register_child_property('drop', [1], end_action="drop")
+    ap.register_child_property('end_value', [1], end_action="end_value", end_value=99)
+    ap.register_child_property('iterated', range(4))
+    ap.register_child_property('value', 0, dynamic_updater=lambda pf: pf.props['value'] + 1)
+    # WHEN we iterate the animation
+    frames = [pf.props for pf in ap]
+    # THEN we expect the later properties to keep their values, in registration order
+    assert frames[0] == {'drop': 1, 'end_value': 1, 'iterated': 0, 'value': 0}
+    assert frames[1:] == [{'end_value': 99, 'iterated': i, 'value': i} for i in range(1, 4)]
+    assert list(frames[1]) == ['end_value', 'iterated', 'value']
+    # THEN we expect previous frames to be unaffected, and the animation to be re-iterable
+    assert [pf.props for pf in ap] == frames
+
+
+def test_segment_timeline(ap):
+    # GIVEN a property chained from segments of different lengths, including an empty one
+    ap.register_child_property('frames', [0, 1])
+    for start, stop in [(2, 2), (2, 5), (5, 12), (12, 13)]:
+        ap.append_child_property('frames', list(range(start, stop)))
+    # WHEN we seek to every frame
+    # THEN we expect the segment holding the frame to be found
+    assert [ap.frame_at(i).props['frames'] for i in range(13)] == list(range(13))
+    with pytest.raises(IndexError):
+        ap.frame_at(13)
+    # WHEN we append another segment after seeking
+    ap.append_child_property('frames', [13, 14])
+    # THEN we expect the timeline to include it
+    assert ap[-1].props['frames'] == 14
+    assert [pf.props['frames'] for pf in ap] == list(range(15))
+
+
+def test_len(ap):
+    from pycommon.lerp_property import LerpValue
+    # GIVEN an animation with chained lerps, a list that keeps its value, and a nested child with a dynamic property
+    ap.register_child_property('lerp', LerpValue.from_interval(0, 4, 5))
+    ap.append_child_property('lerp', LerpValue.from_interval(4, 0, 5))
+    ap.register_child_property('keep', [1, 2], end_action="keep")
+    child = AnimatedProperty()
+    child.register_child_property('lerp', LerpValue.from_interval(0, 1, 8))
+
+    @child.dynamic_property('total')
+    def total(pf):
+        return pf.props['total'] + 1
+    ap.register_child_property('child', child)
+    # THEN we expect the length to be known without iterating, the shortest child terminating the animation
+    assert len(child) == 8
+    assert len(ap) == len(list(ap)) == 8
+    # THEN we expect the nested dynamic property to prevent seeking, but not counting
+    assert not ap._can_seek()
+    # WHEN the animation is ended earlier
+    ap.end_at(6)
+    # THEN we expect the iteration to stop there without a terminator
+    assert len(ap) == len(list(ap)) == 6
+    assert ap[-1].frame_num == 5
+
+
+def test_len_unknown(ap):
+    from pycommon.lerp_property import LerpValue
+    # GIVEN an animation that never ends
+    ap.register_child_property('lerp', LerpValue(0, 1))
+    # THEN we expect no length, but the animation to stay true
+    with pytest.raises(TypeError, match="never ends"):
+        len(ap)
+    assert ap
+    # WHEN it is ended by a frame count
+    ap.end_at(3)
+    # THEN we expect it to keep seeking
+    assert len(ap) == 3 and ap._can_seek()
+    assert [pf.get_frame_data() for pf in ap.frames()] == [{'lerp': 0}, {'lerp': 1}, {'lerp': 2}]
+    # WHEN a terminator is registered
+    ap.register_terminator(lambda pf: pf.frame_num >= 2)
+    # THEN we expect the length to be known only by iterating
+    with pytest.raises(TypeError, match="iterating"):
+        len(ap)
+    assert len(list(ap)) == 2
+
+
+def test_dynamic_property_depends_on(ap):
+    # GIVEN dynamic properties declaring their inputs: a static value, and a list that keeps its last value
+    calls = []
+    ap.register_child_property('scale', 2, property_type="static")
+    ap.register_child_property('steps', [1, 2, 3], end_action="keep")
+    ap.register_child_property('frames', range(6))
+
+    @ap.dynamic_property('scaled', depends_on=['scale'])
+    def scaled(pf):
+        calls.append('scaled')
+        return pf.props['scale'] * 10
+
+    @ap.dynamic_property('double', depends_on=['steps', 'scale'])
+    def double(pf):
+        calls.append('double')
+        return pf.props['steps'] * pf.props['scale']
+
+    @ap.dynamic_property('count')
+    def count(pf):
+        return pf.props['count'] + 1
+    # WHEN we iterate through the frames
+    frames = [pf.props for pf in ap]
+    # THEN we expect each updater to run only once its inputs have changed, and the values to be kept otherwise
+    assert [props['scaled'] for props in frames] == [0, 20, 20, 20, 20, 20]
+    assert [props['double'] for props in frames] == [0, 2, 4, 6, 6, 6]
+    assert calls.count('scaled') == 1
+    assert calls.count('double') == 3
+    # THEN we expect updaters without declared inputs to run on every frame
+    assert [props['count'] for props in frames] == [0, 1, 2, 3, 4, 5]
+
+
+def test_dynamic_property_depends_on_dropped(ap):
+    # GIVEN a dynamic property depending on a property that is dropped once it ends
+    ap.register_child_property('dropped', [1, 2], end_action="drop")
+    ap.register_child_property('frames', range(4))
+
+    @ap.dynamic_property('seen', depends_on=['dropped'])
+    def seen(pf):
+        return pf.props.get('dropped', 'gone')
+    # THEN we expect the drop to count as a change, and the slot of the dynamic property to follow the drop
+    assert [pf.props['seen'] for pf in ap] == [0, 1, 2, 'gone']
+    # THEN we expect dependencies on unknown properties, or of properties that are not dynamic, to be refused
+    ap.register_child_property('typo', 0, dynamic_updater=lambda pf: 0, depends_on=['no_such_property'])
+    with pytest.raises(ValueError):
+        list(ap)
+    with pytest.raises(ValueError):
+        ap.register_child_property('static', 0, property_type="static", depends_on=['frames'])
+
+
+def test_sample(ap):
+    from pycommon.lerp_property import LerpValue
+    # GIVEN chained lerps
+    ap.register_child_property('lerp', LerpValue.from_interval(0, 4, 5))
+    ap.append_child_property('lerp', LerpValue.from_interval(4, 0, 5))
+    # WHEN we sample it at fractional times
+    values = [pf.get_frame_data()['lerp'] for pf in ap.sample([0, 1.5, 4.5, 5.5, 9, 9.5])]
+    # THEN we expect the lerps to be interpolated, holding the end of a segment until the next one starts
+    assert values == [0, 1.5, 4, 3.5, 0, 0]
+    # WHEN the animation cannot seek
+    ap.register_child_property('count', 0, dynamic_updater=lambda pf: pf.props['count'] + 1)
+    # THEN we expect the frame at or before each time, until the animation ends
+    frames = list(ap.sample([0, 1.5, 1.9, 4.5, 9, 12]))
+    assert [pf.frame_num for pf in frames] == [0, 1, 1, 4, 9]
+    with pytest.raises(ValueError):
+        list(ap.sample([2, 1]))
@@ -0,0 +1,66 @@
+from pycommon.animated_property import AnimatedProperty
+from pycommon.easing import EASINGS, EasedProperty, easing_table
+from pycommon.lerp_property import LerpPoint, LerpValue
+from pycommon.maths import Point
+import pytest
+
+
+def test_easings_start_and_end():
+    # GIVEN every easing function
+    for name, easing in EASINGS.items():
+        # THEN we expect it to start at 0 and end at 1
+        assert easing(0) == pytest.approx(0, abs=1e-9), name
+        assert easing(1) == pytest.approx(1), name
+
+
+def test_eased_lerp():
+    # GIVEN a lerp eased in
+    lerp = LerpValue.from_interval(0, 10, 11)
+    eased = EasedProperty(lerp, "ease_in_quad")
+    # WHEN we iterate through the frames
+    values = [pf.get_frame_data() for pf in eased]
+    # THEN we expect the same start, end and number of frames as the lerp, at the pace of the curve
+    assert len(values) == 11
+    assert values[0] == 0 and values[-1] == 10
+    assert values[5] == pytest.approx(2.5)
+    # THEN we expect seeking to give the same frames
+    assert [eased.frame_at(i).get_frame_data() for i in range(11)] == values
+
+
+def test_eased_lerp_batch():
+    pytest.importorskip("numpy")
+    # GIVEN an eased point in an animation
+    ap = AnimatedProperty()
+    ap.register_child_property('eye', EasedProperty(
+        LerpPoint.from_interval(Point(0, 0, 0), Point(10, 20, 30), 50), "ease_out_elastic"))
+    # WHEN we evaluate the frames as a batch
+    # THEN we expect the same frames as iterating
+    assert [pf.get_frame_data() for pf in ap.evaluate_batch(range(50))] == [pf.get_frame_data() for pf in ap]
+
+
+def test_easing_tables_are_shared():
+    # GIVEN two properties with the same curve and duration
+    a = EasedProperty(LerpValue.from_interval(0, 1, 30), "ease_in_out_sine")
+    b = EasedProperty(LerpPoint.from_interval(Point(0, 0, 0), Point(1, 1, 1), 30), "ease_in_out_sine")
+    # THEN we expect them to share one lookup table
+    assert a.table is b.table
+    # THEN we expect the number of tables kept to be bounded
+    assert easing_table.cache_info().maxsize is not None
+
+
+def test_easing_validation():
+    with pytest.raises(ValueError):
+        EasedProperty(LerpValue(0, 1), "ease_in_quad")
+    with pytest.raises(ValueError):
+        EasedProperty(LerpValue.from_interval(0, 1, 10), "ease_sideways")
+
+
+def test_eased_lerp_fractional_frames():
+    # GIVEN a lerp eased in and out
+    eased = EasedProperty(LerpValue.from_interval(0, 10, 11), "ease_in_out_quad")
+    # WHEN we sample it between frames
+    values = [pf.get_frame_data() for pf in eased.sample([0, 2.5, 5, 7.5, 10])]
+    # THEN we expect the curve at those times, and the lookup table at whole frames
+    assert values[0] == 0 and values[2] == pytest.approx(5) and values[4] == 10
+    assert values[1] == pytest.approx(10 * 2 * 0.25 ** 2)
+    assert values[1] + values[3] == pytest.approx(10)
@@ -0,0 +1,62 @@
+from pycommon.animated_property import AnimatedProperty
+from pycommon.keyframe_property import KeyframePoint, KeyframeValue
+from pycommon.maths import Point
+import pytest
+
+
+def test_linear_keyframes():
+    # GIVEN linear keys spaced unevenly
+    kv = KeyframeValue([(0, 0), (4, 8), (6, 0)])
+    # WHEN we iterate through the frames
+    values = [pf.get_frame_data() for pf in kv]
+    # THEN we expect straight lines between the keys, ending at the last key
+    assert values == [0, 2, 4, 6, 8, 4, 0]
+
+
+def test_catmull_rom_keyframes():
+    # GIVEN catmull-rom keys
+    kv = KeyframeValue([(0, 0), (10, 10), (20, 0)], interpolation="catmull-rom")
+    values = [pf.get_frame_data() for pf in kv]
+    # THEN we expect the curve to pass through every key
+    assert values[0] == 0 and values[10] == 10 and values[20] == 0
+    # THEN we expect the curve to be smooth, symmetric around the middle key
+    assert values[9] < 10 and values[9] == pytest.approx(values[11])
+    # THEN we expect evenly spaced collinear keys to be interpolated linearly
+    line = KeyframeValue([(0, 0), (10, 10), (20, 20)], interpolation="catmull-rom")
+    assert [pf.get_frame_data() for pf in line] == pytest.approx(list(range(21)))
+
+
+def test_bezier_keyframes():
+    # GIVEN a bezier segment with control points
+    kp = KeyframePoint([(0, Point(0, 0, 0)), (2, Point(4, 0, 0))], interpolation="bezier",
+                       controls=[(Point(0, 4, 0), Point(4, 4, 0))])
+    # THEN we expect the curve to go through the keys, and to be pulled towards the control points in between
+    assert kp[0].get_frame_data() == [0, 0, 0]
+    assert kp[1].get_frame_data() == [2, 3, 0]
+    assert kp[2].get_frame_data() == [4, 0, 0]
+
+
+def test_keyframes_seek_and_batch():
+    # GIVEN a keyframed point, chained in an animation
+    keys = [(0, Point(0, 0, 0)), (3, Point(3, 1, 2)), (7, Point(-1, 5, 0)), (8, Point(0, 0, 1))]
+    ap = AnimatedProperty()
+    ap.register_child_property('eye', KeyframePoint(keys, interpolation="catmull-rom"))
+    # WHEN we seek to each frame
+    # THEN we expect the same frames as iterating
+    expected = [pf.get_frame_data() for pf in ap]
+    assert len(expected) == 9
+    assert [ap.frame_at(i).get_frame_data() for i in range(9)] == expected
+    # THEN we expect batches to match as well
+    pytest.importorskip("numpy")
+    assert [pf.get_frame_data() for pf in ap.evaluate_batch(range(9))] == expected
+
+
+def test_keyframes_validation():
+    with pytest.raises(ValueError):
+        KeyframeValue([])
+    with pytest.raises(ValueError):
+        KeyframeValue([(0, 0), (0, 1)])
+    with pytest.raises(ValueError):
+        KeyframeValue([(0, 0), (1, 1)], interpolation="cubic")
+    with pytest.raises(ValueError):
+        KeyframePoint([(0, 0), (1, 1)])
@@ -0,0 +1,39 @@
+from pycommon.maths import Point
+import pytest
+
+
+def test_point_arithmetic():
+    # GIVEN two points
+    a = Point(1, 2, 3)
+    b = Point(0.5, 0.25, 4)
+    # WHEN we combine them with operators
+    # THEN we expect component-wise results as new points
+    assert (a + b).toList() == [1.5, 2.25, 7]
+    assert (a - b).toList() == [0.5, 1.75, -1]
+    assert (a * 2).toList() == [2, 4, 6]
+    assert (a / 2).toList() == [0.5, 1, 1.5]
+    assert (a + 1).toList() == [2, 3, 4]
+    assert (-a).toList() == [-1, -2, -3]
+    assert a.toList() == [1, 2, 3]
+
+
+def test_point_is_immutable():
+    # GIVEN a point
+    point = Point.fromList([1, 2, 3])
+    # THEN we expect its coordinates to be read-only
+    with pytest.raises(AttributeError):
+        point.x = 5
+    with pytest.raises(AttributeError):
+        point.w = 5
+    # THEN we expect points to compare and hash by value
+    assert point == Point(1, 2, 3)
+    assert len({point, Point(1, 2, 3)}) == 1
+
+
+def test_point_validation():
+    # WHEN we construct a point from invalid values
+    # THEN we expect a ValueError
+    with pytest.raises(ValueError):
+        Point('a', 2, 3)
+    with pytest.raises(ValueError):
+        Point.fromList([1, 2])
@@ -0,0 +1,29 @@
+from pycommon.maths import Point
+from pycommon.merge_patch import apply_merge_patch, make_merge_patch, same_value
+import json
+
+
+def test_merge_patch_round_trip():
+    # GIVEN a base frame, and a frame with a changed, a removed, a nested and an added value
+    base = {'camera': {'eye': [0, 0, 1], 'fov': 60}, 'lights': [1], 'removed': 1}
+    target = {'camera': {'eye': [0, 1, 1], 'fov': 60}, 'lights': [1], 'added': 2}
+    # WHEN we compute the patch
+    patch = make_merge_patch(base, target)
+    # THEN we expect only the changes, and the patch to turn base into target
+    assert patch == {'camera': {'eye': [0, 1, 1]}, 'removed': None, 'added': 2}
+    assert apply_merge_patch(base, patch) == target
+
+
+def test_merge_patch_types():
+    # GIVEN values that are equal in Python but encoded to different json
+    for before, after in [(1, 1.0), (True, 1), ([1, 2], [1.0, 2]), ({'fov': 1}, {'fov': 1.0}),
+                          (Point(1, 2, 3), Point(1.0, 2, 3))]:
+        base = {'a': before, 'b': 0}
+        target = {'a': after, 'b': 0}
+        # WHEN we compute the patch
+        patch = make_merge_patch(base, target)
+        # THEN we expect the change of type to be patched, so the patched frame is encoded like the frame itself
+        assert not same_value(before, after)
+        assert 'a' in patch and 'b' not in patch
+        assert json.dumps(apply_merge_patch(base, patch), default=Point.toList) == \
+            json.dumps(target, default=Point.toList)
@@ -0,0 +1,36 @@
+from pycommon.preview import PreviewRenderer, frame_axes, to_ppm
+import pytest
+
+np = pytest.importorskip("numpy")
+
+
+def test_frame_axes():
+    # GIVEN a frame with its z axis only
+    o, x, y, z = frame_axes({'o': [1, 2, 3], 'z': [0, 0, 2]})
+    # THEN we expect orthonormal axes around the normalized z axis
+    assert o.tolist() == [1, 2, 3]
+    assert z.tolist() == [0, 0, 1]
+    axes = np.array([x, y, z])
+    assert axes @ axes.T == pytest.approx(np.eye(3))
+
+
+def test_render():
+    # GIVEN a sphere lit from the camera, on a background
+    frame = {
+        'camera': {'eye': [0, 0, 10], 'target': [0, 0, 0]},
+        'resolution': [200, 100],
+        'surfaces': [{'frame': {'o': [0, 0, 0]}, 'size': 1, 'material': {'kd': [1, 0, 0]}}],
+        'lights': [{'type': 'direction', 'frame': {'z': [0, 0, -1]}, 'intensity': [1, 1, 1]}],
+    }
+    # WHEN we render it
+    colors = PreviewRenderer(width=32).render(frame)
+    # THEN we expect the aspect ratio of the resolution
+    assert colors.shape == (16, 32, 3)
+    # THEN we expect the ambient and the diffuse light on the sphere, facing the light, and the background around it
+    assert 1.1 < colors[8, 16, 0] <= 1.2
+    assert colors[8, 16, 1:].tolist() == [0, 0]
+    assert colors[0, 0] == pytest.approx([0.2, 0.2, 0.2])
+    # THEN we expect a binary ppm, clamped to the full intensity
+    ppm = to_ppm(colors)
+    assert ppm.startswith(b"P6\n32 16\n255\n")
+    assert ppm[len(b"P6\n32 16\n255\n") + (8 * 32 + 16) * 3] == 255
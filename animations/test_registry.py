@@ -0,0 +1,37 @@
+from pycommon import registry
+from pycommon.animated_property import AnimatedProperty
+import pytest
+
+
+def test_scene_module_name():
+    # GIVEN scene names
+    # THEN we expect the module of each scene by naming convention
+    assert registry.scene_module_name("PlanetScene") == "scene_planet"
+    assert registry.scene_module_name("MovingCameraScene") == "scene_moving_camera"
+    assert registry.scene_module_name("Orbit3DScene") == "scene_orbit3_d"
+
+
+def test_get_scene_by_convention():
+    # GIVEN a scene only known by the name of its module
+    # WHEN we look it up
+    Scene = registry.get_scene("PlanetScene")
+    # THEN we expect the class from that module
+    assert Scene.__name__ == "PlanetScene"
+    assert Scene.__module__.endswith("scene_planet")
+    assert "PlanetScene" in registry.available_scenes()
+
+
+def test_register_scene(monkeypatch):
+    # GIVEN a scene registered in-process
+    monkeypatch.setattr(registry, "_scenes", {})
+    registry.register_scene("EmptyScene", AnimatedProperty)
+    # THEN we expect it to be found and listed
+    assert registry.get_scene("EmptyScene") is AnimatedProperty
+    assert "EmptyScene" in registry.available_scenes()
+
+
+def test_unknown_scene():
+    # GIVEN a scene that does not exist
+    # THEN we expect a ValueError naming it
+    with pytest.raises(ValueError, match="NoSuchScene"):
+        registry.get_scene("NoSuchScene")
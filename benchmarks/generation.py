@@ -0,0 +1,258 @@
+""" Benchmarks for frame generation: the AnimatedProperty iteration engine, lerps, serialization and framebuilder.
+
+Run from the repository root, results are printed and written as json so that runs can be compared:
+
+    python -m benchmarks.generation -o results.json
+    python -m benchmarks.generation --quick --compare results.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import framebuilder
+from animations.pycommon import batch, frame_cache
+from animations.pycommon.animated_property import AnimatedProperty
+from animations.pycommon.lerp_property import LerpPoint
+from animations.pycommon.maths import Point
+from animations.pycommon.scene_planet import PlanetScene
+
+
+def measure(func, repeat):
+    """ run func several times and keep the fastest run
+
+    :func: a function without arguments, returning the number of frames it generated
+    :repeat: the number of runs
+    :returns: a tuple of the number of frames and the fastest run in seconds
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        num_frames = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return num_frames, best
+
+
+def children_scene(kind, num_children, num_frames):
+    """ an AnimatedProperty with num_children children of the same kind, lasting num_frames frames """
+    ap = AnimatedProperty()
+    ap.register_child_property('frames', range(num_frames), property_type="iterated")
+    ap.register_child_property('scale', 2, property_type="static")
+    for i in range(num_children):
+        name = f"{kind}{i}"
+        if kind == 'static':
+            ap.register_child_property(name, i, property_type="static")
+        elif kind == 'iterated':
+            ap.register_child_property(name, list(range(num_frames)), property_type="iterated")
+        elif kind == 'dynamic':
+            ap.register_child_property(name, i, dynamic_updater=lambda pf, name=name: pf.props[name] + 1)
+        elif kind == 'derived':
+            # dynamic properties declaring inputs that never change
+            ap.register_child_property(name, i, dynamic_updater=lambda pf, i=i: pf.props['scale'] * i,
+                                       depends_on=['scale'])
+        elif kind == 'nested':
+            child = AnimatedProperty()
+            child.register_child_property('value', i, property_type="static")
+            ap.register_child_property(name, child)
+    return ap
+
+
+def lerp_chain(num_segments, segment_frames):
+    """ an AnimatedProperty with a camera path of num_segments LerpPoints chained with append_child_property """
+    ap = AnimatedProperty()
+    for i in range(num_segments):
+        segment = LerpPoint.from_interval(Point(i, 0, 0), Point(i + 1, 1, 1), segment_frames)
+        if i == 0:
+            ap.register_child_property('eye', segment)
+        else:
+            ap.append_child_property('eye', segment)
+    return ap
+
+
+def count_frames(frames):
+    return sum(1 for _ in frames)
+
+
+def bench_children(quick):
+    num_frames = 500 if quick else 2000
+    for kind in ['static', 'iterated', 'dynamic', 'derived', 'nested']:
+        for num_children in ([1, 10] if quick else [1, 10, 100]):
+            ap = children_scene(kind, num_children, num_frames)
+            yield f"children/{kind}/{num_children}", {'kind': kind, 'children': num_children}, \
+                lambda ap=ap: count_frames(ap)
+
+
+def bench_lerp_chain(quick):
+    for num_segments in ([10, 100] if quick else [10, 100, 1000]):
+        ap = lerp_chain(num_segments, 100)
+        num_frames = num_segments * 100
+        params = {'segments': num_segments, 'segment_frames': 100}
+        yield f"lerp_chain/iterate/{num_segments}", params, lambda ap=ap: count_frames(ap)
+        yield f"lerp_chain/seek/{num_segments}", params, \
+            lambda ap=ap, num_frames=num_frames: count_frames(ap.frame_at(i) for i in range(0, num_frames, 97))
+        if batch.np is not None:
+            yield f"lerp_chain/batch/{num_segments}", params, \
+                lambda ap=ap, num_frames=num_frames: len(ap.evaluate_batch(range(num_frames)))
+
+
+def bench_serialization(quick):
+    num_frames = 1000 if quick else 10000
+    frames = list(PlanetScene(num_frames))
+    params = {'scene': 'PlanetScene', 'frames': num_frames}
+    yield "serialization/get_frame_data", params, \
+        lambda: count_frames(frame.get_frame_data() for frame in frames)
+    yield "serialization/json", params, \
+        lambda: count_frames(json.dumps(frame.get_frame_data()) for frame in frames)
+    for serializer in framebuilder.SERIALIZERS:
+        if serializer == 'orjson' and framebuilder.orjson is None:
+            continue
+        yield f"serialization/encoder/{serializer}", params, \
+            lambda serializer=serializer: encode_frames(frames, serializer)
+
+
+def settling_scene(num_children, num_frames, settle_frames=10):
+    """ an AnimatedProperty with num_children spheres moving for settle_frames frames, then kept where they stopped
+    while the animation goes on for num_frames frames """
+    ap = AnimatedProperty()
+    ap.register_child_property('frames', range(num_frames), property_type="iterated")
+    for i in range(num_children):
+        sphere = AnimatedProperty()
+        sphere.register_child_property('center', LerpPoint.from_interval(Point(i, 0, 0), Point(i, 1, 0), settle_frames))
+        sphere.register_child_property('radius', 0.5, property_type="static")
+        ap.register_child_property(f"sphere{i}", sphere, end_action='keep')
+    return ap
+
+
+def bench_frame_cache(quick):
+    num_frames = 500 if quick else 2000
+    for num_children in ([10] if quick else [10, 100]):
+        for kind, scene in [('nested', children_scene('nested', num_children, num_frames)),
+                            ('settling', settling_scene(num_children, num_frames))]:
+            frames = list(scene)
+            params = {'kind': kind, 'children': num_children, 'frames': num_frames}
+            yield f"frame_cache/{kind}/off/{num_children}", params, \
+                lambda frames=frames: count_frames(frame.get_frame_data() for frame in frames)
+            yield f"frame_cache/{kind}/on/{num_children}", params, lambda frames=frames: cached_frame_data(frames)
+
+
+def cached_frame_data(frames):
+    with frame_cache.FrameDataCache():
+        return count_frames(frame.get_frame_data() for frame in frames)
+
+
+def encode_frames(frames, serializer):
+    """ encode frames like framebuilder does, reusing the unchanged parts of the scene """
+    encoder = framebuilder.FrameEncoder(framebuilder.get_serializer(serializer))
+    return count_frames(encoder.encode(frame.get_frame_data()) for frame in frames)
+
+
+def bench_framebuilder(quick, sizes):
+    for num_frames in ([1000] if quick else sizes):
+        for mode, options in [('files', []), ('container', ['--format', 'container']), ('delta', ['--delta']),
+                              ('jobs4', ['--jobs', '4'])]:
+            name = f"framebuilder/{mode}/{num_frames}"
+            params = {'scene': 'PlanetScene', 'frames': num_frames, 'options': options}
+            yield name, params, lambda num_frames=num_frames, options=options: run_framebuilder(num_frames, options)
+
+
+def run_framebuilder(num_frames, options):
+    """ build PlanetScene scaled to num_frames from scratch, discarding framebuilder's output on stdout """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        frame_file = os.path.join(tmp_dir, 'frames.json')
+        with open(frame_file, 'w') as f:
+            json.dump({'scene': 'PlanetScene', 'params': {'num_frames': num_frames}}, f)
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            framebuilder.main([frame_file, os.path.join(tmp_dir, 'out'), '--force'] + options)
+    return num_frames
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(quick=False, sizes=(10000, 100000), pattern=None, repeat=3):
+    """ run the benchmarks
+
+    :quick: use smaller sizes, for a quick check
+    :sizes: the number of frames of the end-to-end framebuilder benchmarks
+    :pattern: only run benchmarks whose name contains pattern
+    :repeat: the number of runs of each benchmark, the fastest one is kept
+    :returns: the results as a json serializable dictionary
+    """
+    suites = [bench_children(quick), bench_lerp_chain(quick), bench_serialization(quick), bench_frame_cache(quick),
+              bench_framebuilder(quick, sizes)]
+    results = {}
+    for suite in suites:
+        for name, params, func in suite:
+            if pattern is not None and pattern not in name:
+                continue
+            # end-to-end builds are slow enough that one run is representative
+            num_frames, seconds = measure(func, 1 if name.startswith("framebuilder/") else repeat)
+            results[name] = {'params': params, 'frames': num_frames, 'seconds': seconds,
+                             'frames_per_sec': num_frames / seconds}
+            print(f"{name:40} {num_frames:8} frames {seconds:9.4f}s {num_frames / seconds:12.0f} frames/s")
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': None if batch.np is None else batch.np.__version__,
+            'revision': git_revision(),
+            'quick': quick,
+        },
+        'results': results,
+    }
+
+
+def compare(results, baseline, threshold):
+    """ print the speed of each benchmark relative to a baseline run
+
+    :returns: the names of the benchmarks slower than threshold times the baseline
+    """
+    regressions = []
+    for name, result in results['results'].items():
+        if name not in baseline['results']:
+            continue
+        ratio = result['frames_per_sec'] / baseline['results'][name]['frames_per_sec']
+        print(f"{name:40} {ratio:6.2f}x")
+        if ratio < threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark frame generation.")
+    parser.add_argument('-o', '--output', metavar='PATH', help="write the results as json to PATH")
+    parser.add_argument('--quick', action='store_true', help="use small sizes, for a quick check")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000],
+                        help="number of frames of the end-to-end framebuilder benchmarks (default: 10000 100000)")
+    parser.add_argument('-k', metavar='PATTERN', dest='pattern', help="only run benchmarks whose name contains PATTERN")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per benchmark, the fastest is kept (default: 3)")
+    parser.add_argument('--compare', metavar='BASELINE', help="compare with the json results of a previous run")
+    parser.add_argument('--threshold', type=float, default=0.8,
+                        help="with --compare, fail if a benchmark runs slower than THRESHOLD times the baseline")
+    args = parser.parse_args(argv)
+
+    results = run(args.quick, args.sizes, args.pattern, args.repeat)
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.compare is not None:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"regressions: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -15,11 +15,16 @@ confirm() {
 	esac
 }
 
-if [ $# -ne 1 ]; then
-	echo "Usage $0 [animation_script.json]"
+if [ $# -lt 1 ]; then
+	echo "Usage $0 [animation_script.json] [framebuilder options, e.g. --every 10 or --fps 60]"
+	echo "The video is built at FPS frames per second (default: 1)"
 	exit -1
 fi
 animation_script=$1
+shift
+# the options after the animation script are passed on to framebuilder.py
+framebuilder_options=("$@")
+fps=${FPS:-1}
 if [ ! -f "$animation_script" ]; then
 	echo $animation_script does not exist.
 	exit -1
@@ -28,41 +33,91 @@ animation_name=${animation_script##*/}
 animation_name=${animation_name%.*}
 scene_data_dir=scenes/$animation_name/scene_data
 scene_images_dir=scenes/$animation_name/scene_images
+dirty_list=scenes/$animation_name/dirty_frames.txt
 video_path=scenes/$animation_name/output.mp4
 
 echo animation_name: $animation_name
 
-if [ ! -d $scene_data_dir ] ||
-	confirm "$scene_data_dir already has $(ls -l $scene_data_dir | wc -l) frame files. Rebuild frame data?"; then
-	mkdir -p $scene_data_dir
-	echo building frame data...
-	echo python3 framebuilder.py $animation_script $scene_data_dir
-	python3 framebuilder.py $animation_script $scene_data_dir
-	if [ $? -ne 0 ]; then
-		echo failed building frame data.
-		exit -2
-	fi
-	echo frame data written to $scene_data_dir
+# the frames are json files in the scene data directory, or a single container with --format container
+format=files
+for ((i = 0; i < ${#framebuilder_options[@]}; i++)); do
+	case ${framebuilder_options[i]} in
+		--format)
+			format=${framebuilder_options[i + 1]}
+			;;
+		--format=*)
+			format=${framebuilder_options[i]#--format=}
+			;;
+	esac
+done
+case $format in
+	files)
+		scene_data=$scene_data_dir
+		;;
+	container)
+		scene_data=$scene_data_dir/frames.jsonl
+		;;
+	*)
+		echo "$0 does not support --format $format, frames can be piped to the renderer with:"
+		echo "python3 framebuilder.py $animation_script --format pipe | dart raytrace.dart - $scene_images_dir"
+		exit -1
+		;;
+esac
+
+mkdir -p $scene_data_dir
+echo building frame data...
+echo python3 framebuilder.py $animation_script $scene_data_dir --dirty-list $dirty_list "${framebuilder_options[@]}"
+python3 framebuilder.py $animation_script $scene_data_dir --dirty-list $dirty_list "${framebuilder_options[@]}"
+if [ $? -ne 0 ]; then
+	echo failed building frame data.
+	exit -2
 fi
+echo frame data written to $scene_data_dir
 
 if [ ! -d $scene_images_dir ] ||
-	confirm "$scene_images_dir already has $(ls -l $scene_images_dir | wc -l) frame images. Rebuild frame images?"; then
+	confirm "$scene_images_dir already has $(ls -l $scene_images_dir | wc -l) frame images. Rebuild all frame images?"; then
 	mkdir -p $scene_images_dir
 	echo building frame images...
-	echo dart raytrace.dart $scene_data_dir $scene_images_dir
-	dart raytrace.dart $scene_data_dir $scene_images_dir
+	echo dart raytrace.dart $scene_data $scene_images_dir
+	dart raytrace.dart $scene_data $scene_images_dir
 	if [ $? -ne 0 ]; then
 		echo failed building frame images.
 		exit -2
 	fi
 	echo frame images written to $scene_images_dir
+elif [ -s $dirty_list ]; then
+	echo building $(wc -l < $dirty_list) changed frame images...
+	echo dart raytrace.dart $scene_data $scene_images_dir $dirty_list
+	dart raytrace.dart $scene_data $scene_images_dir $dirty_list
+	if [ $? -ne 0 ]; then
+		echo failed building frame images.
+		exit -2
+	fi
+	echo frame images written to $scene_images_dir
+else
+	echo frame images are up to date.
 fi
 
+# remove images of frames that no longer exist, a container holding one frame per line
+if [ $format = container ]; then
+	num_frames=$(wc -l < $scene_data)
+fi
+for image in $scene_images_dir/*.ppm; do
+	[ -f "$image" ] || continue
+	frame=${image##*/}
+	frame=${frame%.ppm}
+	if [ $format = container ]; then
+		[ $((10#$frame)) -lt $num_frames ] || rm -f "$image"
+	else
+		[ -f "$scene_data_dir/$frame.json" ] || rm -f "$image"
+	fi
+done
+
 if confirm "Build video to $video_path?"; then
 	echo building video...
-	echo ffmpeg -r 1 -pattern_type glob -i "${scene_images_dir}/*.ppm" \
+	echo ffmpeg -r $fps -pattern_type glob -i "${scene_images_dir}/*.ppm" \
 		   -vcodec libx264 -crf 15 -pix_fmt yuv420p $video_path
-	ffmpeg -r 1 -pattern_type glob -i "${scene_images_dir}/*.ppm" \
+	ffmpeg -r $fps -pattern_type glob -i "${scene_images_dir}/*.ppm" \
 		   -vcodec libx264 -crf 15 -pix_fmt yuv420p $video_path
 	if [ $? -ne 0 ]; then
 		echo failed building video.
@@ -0,0 +1,33 @@
+import 'dart:convert';
+import 'dart:io';
+import 'dart:typed_data';
+
+// Reads the frames of a container written by `framebuilder.py --format container`.
+// The container holds one json frame per line, and `<container>.idx` holds the
+// little-endian uint64 offset of every frame followed by the size of the container.
+class FrameContainer {
+    RandomAccessFile _file;
+    ByteData _index;
+
+    FrameContainer(String path) {
+        _file = File(path).openSync();
+        _index = ByteData.view(File('$path.idx').readAsBytesSync().buffer);
+    }
+
+    int get length => _index.lengthInBytes ~/ 8 - 1;
+
+    int _offset(int i) => _index.getUint64(i * 8, Endian.little);
+
+    // reads frame i as a json string, without reading the other frames
+    String frameJson(int i) {
+        var start = _offset(i);
+        _file.setPositionSync(start);
+        // skip the newline ending the frame
+        return utf8.decode(_file.readSync(_offset(i + 1) - start - 1));
+    }
+
+    // file name of frame i, matching the names of the per-frame json files
+    static String frameName(int i) => '${i.toString().padLeft(4, '0')}.json';
+
+    void close() => _file.closeSync();
+}
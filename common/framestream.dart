@@ -0,0 +1,28 @@
+import 'dart:convert';
+import 'dart:typed_data';
+
+// Reads the frames streamed by `framebuilder.py --format pipe`.
+// Each frame is the little-endian uint32 size of the frame, followed by the frame as json.
+// Frames are yielded as soon as they are complete. While the listener is paused, reading the
+// input is paused as well, so the producer blocks on a full pipe instead of buffering frames here.
+Stream<String> readFrameStream(Stream<List<int>> input) async* {
+    var pending = BytesBuilder(copy: false);
+    await for (var chunk in input) {
+        pending.add(chunk);
+        var bytes = pending.takeBytes();
+        var offset = 0;
+        while (bytes.length - offset >= 4) {
+            var size = ByteData.view(bytes.buffer, bytes.offsetInBytes + offset, 4).getUint32(0, Endian.little);
+            if (bytes.length - offset - 4 < size) {
+                break;
+            }
+            yield utf8.decode(Uint8List.view(bytes.buffer, bytes.offsetInBytes + offset + 4, size));
+            offset += 4 + size;
+        }
+        // keep the incomplete record for the next chunk
+        pending.add(Uint8List.view(bytes.buffer, bytes.offsetInBytes + offset, bytes.length - offset));
+    }
+    if (pending.isNotEmpty) {
+        throw FormatException('frame stream ends within a record');
+    }
+}
@@ -42,3 +42,15 @@ class NumDouble {
     static double fromJson(JsonLoader loader) => loader.data.toDouble();
 }
 
+
+// Applies a JSON merge patch (RFC 7386), as written by `framebuilder.py --delta`.
+// Nested maps are patched recursively, null removes a key, anything else replaces the value.
+dynamic applyMergePatch(dynamic base, dynamic patch) {
+    if(patch is! Map) return patch;
+    var result = base is Map ? Map.from(base) : {};
+    patch.forEach((key, value) {
+        if(value == null) result.remove(key);
+        else result[key] = applyMergePatch(result[key], value);
+    });
+    return result;
+}
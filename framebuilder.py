@@ -1,37 +1,1155 @@
-import sys
-import os
+import argparse
+from collections import namedtuple
+import contextlib
+import copy
+import hashlib
 import json
+import marshal
+import math
+import multiprocessing
+import os
+import queue
+import re
+import sys
+import threading
+from itertools import count, islice
+from time import monotonic, perf_counter
 
+from animations.pycommon import frame_cache, profiling
+from animations.pycommon.frame_container import INDEX_SUFFIX, FrameContainerWriter
+from animations.pycommon.frame_stream import DEFAULT_BUFFER_SIZE, FrameStreamWriter
 from animations.pycommon.maths import Point
-from animations.pycommon.scene_planet import PlanetScene
+from animations.pycommon.merge_patch import make_merge_patch, same_value
+from animations.pycommon.registry import get_scene
+from animations.pycommon.resample import ResampledProperty, sample_times
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# written to the output directory, holds the content hash of every frame file
+MANIFEST_NAME = ".manifest.json"
+# the container written to the output directory with --format container
+CONTAINER_NAME = "frames.jsonl"
+# the base scene written to the output directory with --delta, frames are merge patches against it
+BASE_NAME = ".base.json"
+# the frame rate of the timeline of an animation script that does not set "fps"
+DEFAULT_FPS = 30
+# the threads writing frame files, and the number of encoded frames waiting for them
+DEFAULT_WRITE_THREADS = 4
+DEFAULT_WRITE_QUEUE = 64
+# the frames a writer thread takes from the queue at once
+WRITE_BATCH = 8
+# the seconds between two progress lines
+PROGRESS_INTERVAL = 1.0
+
+
+class OptionError(ValueError):
+
+    """Raised for build options that are invalid or cannot be combined, reported by the command line as a usage error.
+    Errors found while building, such as values the serializer refuses or invalid scene parameters, are other
+    ValueErrors.
+    """
+
+
+def load_scene(frame_file):
+    """ construct the scene described by an animation script
+
+    :frame_file: path to a json file with the name of the scene and the keyword arguments to initialize it,
+                 or the content of that file as a dictionary
+    :returns: the scene, an AnimatedProperty object
+    :raises: a ValueError if the scene is unknown, see registry.get_scene
+
+    """
+    return _scene_from_script(load_script(frame_file))
+
+
+def load_script(frame_file):
+    """ read an animation script, see load_scene
+
+    :returns: the script as a dictionary
+    """
+    if isinstance(frame_file, dict):
+        return frame_file
+    with open(frame_file) as f:
+        return json.load(f)
+
+
+def _scene_from_script(frame_data):
+    scene_name = frame_data['scene'] # the name of the scene
+    params = frame_data['params'] # should be a dictionary, passed as keyword argument for initializing scene
+    Scene = get_scene(scene_name)
+    return Scene(**params)
+
+
+def load_timeline(frame_file, every=1, fps=None, duration=None):
+    """ construct the scene of an animation script, evaluated only at the times of the frames to be written.
+    The frame rate of the timeline of the scene is the "fps" of the script, DEFAULT_FPS if not set.
+
+    :frame_file: same as in load_scene
+    :every: same as in sample_times
+    :fps: same as in sample_times
+    :duration: same as in sample_times
+    :returns: the scene, wrapped in a ResampledProperty if its timeline is resampled
+    :raises: a ValueError if the options are invalid, or if a scene that never ends is resampled
+
+    """
+    frame_data = load_script(frame_file)
+    scene = _scene_from_script(frame_data)
+    if every == 1 and fps is None and duration is None:
+        return scene
+    times = sample_times(count_frames(scene), every, fps, duration, frame_data.get('fps', DEFAULT_FPS))
+    return ResampledProperty(scene, times)
+
 
-scenes = {
-        'PlanetScene': PlanetScene,
+def frame_hash(data):
+    """ the content hash of a serialized frame, as stored in the manifest
+
+    :data: the frame as json bytes, or as a string
+    """
+    if isinstance(data, str):
+        data = data.encode()
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _encode_default(obj):
+    """ encode the objects json encoders do not know: Points, and NumPy arrays and scalars """
+    if isinstance(obj, Point):
+        return [obj.x, obj.y, obj.z]
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class JsonSerializer:
+
+    """Encodes frame data with the stdlib json module, in compact form. Numbers can be written differently than by
+    OrjsonSerializer, e.g. 1e-05 instead of 0.00001, so the manifest records the serializer of the hashes.
+    NaN and infinities, which are not json, raise a ValueError.
+    """
+
+    name = 'json'
+
+    # encoding the values that did not change once pays off, see FrameEncoder
+    reuse_fragments = True
+
+    def __init__(self):
+        self._encode = json.JSONEncoder(separators=(',', ':'), default=_encode_default, allow_nan=False).encode
+
+    def dumps(self, obj):
+        """ :returns: obj as json bytes """
+        return self._encode(obj).encode()
+
+
+class OrjsonSerializer:
+
+    """Encodes frame data with orjson, which encodes NumPy arrays natively, and NaN and infinities as null"""
+
+    name = 'orjson'
+
+    # encoding a frame at once takes less time than comparing its values with the previous frames, see FrameEncoder
+    reuse_fragments = False
+
+    def dumps(self, obj):
+        """ :returns: obj as json bytes """
+        return orjson.dumps(obj, default=_encode_default, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+SERIALIZERS = {
+        'json': JsonSerializer,
+        'orjson': OrjsonSerializer,
 }
 
-def usage():
-    print(f"Usage: python3 {sys.argv[0]} [frames.json] [output_dir]")
 
-if len(sys.argv) != 3:
-    usage()
-    exit(-1)
+def get_serializer(name="auto"):
+    """ create a serializer
+
+    :name: a name in SERIALIZERS, or auto to use orjson when it is installed and the json module otherwise
+    :returns: an object with a dumps(obj) method returning json bytes, and the name of the serializer
+    :raises: an OptionError if the serializer is unknown or not installed
+    """
+    if name == "auto":
+        name = "json" if orjson is None else "orjson"
+    if name not in SERIALIZERS:
+        raise OptionError(f"unknown serializer [{name}]")
+    if name == "orjson" and orjson is None:
+        raise OptionError("serializer [orjson] is not installed")
+    return SERIALIZERS[name]()
+
+
+class _Copy:
+
+    """A deep copy of a value FrameEncoder compares the next frames with"""
+
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+
+class FrameEncoder:
+
+    """Encodes the frames of an animation one after the other, reusing the encoded value of every top-level key
+    whose value is the same as in the previous frames (see same_value), such as the surfaces and lights of a scene with
+    a moving camera.
+
+    The first value of each key is copied to compare the next frames with, so values mutated in place are detected.
+    The copy is the marshal encoding of the value, which tells 1, 1.0 and True apart like json does and is quick to
+    compare, or a deep copy compared with same_value for values marshal cannot encode, such as Points.
+    Once a key changes, its value is encoded on every frame without comparing it again, and once every key has
+    changed, frames are encoded as a whole.
+    Frames are encoded as a whole as well with serializers that set reuse_fragments to False.
+    """
+
+    def __init__(self, serializer):
+        """
+        :serializer: a serializer, see get_serializer
+        """
+        self.serializer = serializer
+        # key -> (copy of the value, encoded "key":value) for keys that did not change so far, see _snapshot
+        self._fragments = {}
+        self._changing = set()
+
+    def encode(self, frame_data):
+        """ :returns: frame_data as json bytes, the same as serializer.dumps(frame_data) """
+        dumps = self.serializer.dumps
+        if not getattr(self.serializer, 'reuse_fragments', True) or not isinstance(frame_data, dict) or any(type(key) is not str for key in frame_data):
+            return dumps(frame_data)
+        if self._changing and not self._fragments:
+            # nothing is left to reuse, encode the frame at once
+            return dumps(frame_data)
+        parts = []
+        for key, value in frame_data.items():
+            if key in self._changing:
+                parts.append(dumps(key) + b":" + dumps(value))
+                continue
+            fragment = self._fragments.get(key)
+            if fragment is not None and self._same(fragment[0], value):
+                parts.append(fragment[1])
+                continue
+            part = dumps(key) + b":" + dumps(value)
+            if fragment is None:
+                self._fragments[key] = (self._snapshot(value), part)
+            else:
+                del self._fragments[key]
+                self._changing.add(key)
+            parts.append(part)
+        return b"{" + b",".join(parts) + b"}"
+
+    @staticmethod
+    def _snapshot(value):
+        try:
+            # version 2 writes no back-references, which would depend on reference counts
+            return marshal.dumps(value, 2)
+        except ValueError:
+            return _Copy(copy.deepcopy(value))
+
+    @staticmethod
+    def _same(snapshot, value):
+        if isinstance(snapshot, _Copy):
+            return same_value(snapshot.value, value)
+        try:
+            return marshal.dumps(value, 2) == snapshot
+        except ValueError:
+            return False
+
+
+def _read_manifest(path):
+    """ :returns: the manifest at path as a dictionary, None if it does not exist """
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def load_manifest(out_dir):
+    """ read the content hashes of the frames written by a previous build
+
+    :out_dir: the output directory of the previous build
+    :returns: a dictionary of hashes by frame file name, empty if there was no previous build
+
+    """
+    manifest = _read_manifest(os.path.join(out_dir, MANIFEST_NAME))
+    return {} if manifest is None else manifest['frames']
+
+
+def save_manifest(out_dir, hashes, serializer=None):
+    """ record the content hashes of the frames of a build
+
+    :serializer: the name of the serializer the frames were encoded with, their hashes are only compared with the
+                 hashes of frames encoded by the same serializer
+    """
+    with open(os.path.join(out_dir, MANIFEST_NAME), "w") as f:
+        json.dump({'serializer': serializer, 'frames': hashes}, f, indent=0, sort_keys=True)
+
+
+def _fsync_dir(path):
+    """ make the files created in a directory durable, once they are synced themselves """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class _Progress:
+
+    """Counts the frames done, and prints a line about them at most every interval seconds and the last line when
+    flushed. Frames can be done from several threads.
+    """
+
+    def __init__(self, num_frames=None, interval=PROGRESS_INTERVAL):
+        self.num_frames = num_frames
+        self.interval = interval
+        self.count = 0
+        self._last_time = None
+        self._pending = None
+        self._lock = threading.Lock()
+
+    def done(self, message=None):
+        """ count a frame as done
+
+        :message: what was done with the frame, None to count it without reporting it
+        """
+        with self._lock:
+            self.count += 1
+            if message is None:
+                return
+            progress = self.count if self.num_frames is None else f"{self.count}/{self.num_frames}"
+            self._pending = f"({progress}) {message}"
+            now = monotonic()
+            if self._last_time is None or now - self._last_time >= self.interval:
+                self._last_time = now
+                self._print()
+
+    def flush(self):
+        with self._lock:
+            self._print()
+
+    def _print(self):
+        if self._pending is not None:
+            print(self._pending)
+            self._pending = None
+
+
+class FrameFileWriter:
+
+    """Writes each frame into its own json file in the output directory.
+
+    Files are written by a pool of threads draining a bounded queue, so the frames are evaluated and encoded while
+    earlier ones are being stored, and at most queue_depth encoded frames wait in memory. Frames that did not change
+    are looked up in a listing of the output directory taken once, instead of checking each file.
+    """
+
+    def __init__(self, out_dir, num_frames=None, threads=DEFAULT_WRITE_THREADS, queue_depth=DEFAULT_WRITE_QUEUE,
+                 fsync=False, progress_interval=PROGRESS_INTERVAL):
+        """
+        :out_dir: the output directory
+        :num_frames: the number of frames the writer is given, to report the progress as (i/N); None if unknown
+        :threads: the number of threads writing files, 0 to write them from the caller's thread
+        :queue_depth: the number of frames waiting to be written, write blocks while the queue is full
+        :fsync: sync every file to storage, and the output directory when closed
+        :progress_interval: the seconds between two progress lines
+        """
+        self.out_dir = out_dir
+        self.num_frames = num_frames
+        self.fsync = fsync
+        self._progress = _Progress(num_frames, progress_interval)
+        # the names of the files in the output directory, listed when a frame that did not change is first written
+        self._existing = None
+        self._error = None
+        self._closed = False
+        self._queue = queue.Queue(queue_depth) if threads else None
+        self._threads = [threading.Thread(target=self._drain, daemon=True) for _ in range(threads)]
+        for thread in self._threads:
+            thread.start()
+
+    def write(self, out_file, data, changed):
+        """ write a serialized frame, skipping frames that did not change and are already written
+
+        :out_file: the file name of the frame
+        :data: the serialized frame, as json bytes
+        :changed: whether the frame differs from the previous build
+        :returns: whether the frame was written, or queued to be written
+        :raises: the error of a writer thread that failed to write an earlier frame
+        """
+        if self._error is not None:
+            raise self._error
+        if not changed:
+            if self._existing is None:
+                self._existing = set(os.listdir(self.out_dir))
+            if out_file in self._existing:
+                self._progress.done()
+                return False
+        out_name = os.path.join(self.out_dir, out_file)
+        if self._queue is None:
+            self._write_file(out_name, data)
+        else:
+            self._queue.put((out_name, data))
+        return True
+
+    def _write_file(self, out_name, data):
+        """ write a frame file, and report it once written """
+        with open(out_name, "wb") as f:
+            f.write(data)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        self._progress.done(f"Written frame data to {out_name}")
+
+    def _drain(self):
+        """ write the frames of the queue until close() queues None """
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < WRITE_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            for item in batch:
+                if item is None:
+                    # None is queued last, pass it on to stop the other threads
+                    self._queue.put(None)
+                    return
+                # after an error, keep draining so that write does not block
+                if self._error is None:
+                    try:
+                        self._write_file(*item)
+                    except Exception as e:
+                        self._error = e
+
+    def close(self):
+        """ wait for the queued frames to be written
+
+        :raises: the error of a writer thread that failed to write a frame
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self._queue is not None:
+            self._queue.put(None)
+            for thread in self._threads:
+                thread.join()
+        self._progress.flush()
+        if self._error is not None:
+            raise self._error
+        if self.fsync:
+            _fsync_dir(self.out_dir)
+
+
+class ContainerFrameWriter:
+
+    """Streams all frames into a single container, see FrameContainerWriter"""
+
+    def __init__(self, path, fsync=False):
+        """
+        :path: the path of the container
+        :fsync: sync the container and its index to storage when closed
+        """
+        self.container = FrameContainerWriter(path, fsync)
+
+    def write(self, out_file, data, changed):
+        """ same as FrameFileWriter.write, but every frame is appended since the container is rewritten as a whole
+
+        :returns: whether the frame changed
+        """
+        self.container.append(data)
+        return changed
+
+    def close(self):
+        self.container.close()
+
+
+class PipeFrameWriter:
+
+    """Streams all frames to a binary stream as length-prefixed records, see FrameStreamWriter"""
+
+    def __init__(self, stream, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.stream = FrameStreamWriter(stream, buffer_size)
+
+    def write(self, out_file, data, changed):
+        """ same as FrameFileWriter.write, but every frame is streamed since the consumer keeps nothing
+
+        :returns: True
+        """
+        self.stream.append(data)
+        return True
+
+    def close(self):
+        self.stream.close()
+
+
+def encode_frames(scene, start=0, stop=None, base=None, serializer=None, step=1):
+    """ serialize a range of frames one at a time, holding nothing but the current frame
+
+    :scene: the scene to be written
+    :start: the first frame to be written
+    :stop: the frame to stop before, None to write until the scene ends
+    :base: the frame data of the base scene, to write each frame as a merge patch against it; None to write full frames
+    :serializer: the serializer encoding the frames, see get_serializer; None for the default one
+    :step: the distance between two frames written
+    :returns: an iterator of tuples of the frame file name, the frame as json bytes, and its content hash
+
+    """
+    encoder = FrameEncoder(serializer or get_serializer())
+    profiler = profiling.active_profiler()
+    if scene._can_seek():
+        frames = scene.frames(start, stop, step)
+    else:
+        # scenes with dynamic properties, or yielding frames of their own from __iter__, are replayed once
+        frames = islice(iter(scene), start, stop, step)
+    for i, frame in zip(count(start, step), frames):
+        frame_data = frame.get_frame_data()
+        if profiler is not None:
+            serialize_start = perf_counter()
+        if base is not None:
+            frame_data = make_merge_patch(base, frame_data)
+        data = encoder.encode(frame_data)
+        digest = frame_hash(data)
+        if profiler is not None:
+            profiler.root.add('serialize', perf_counter() - serialize_start)
+        yield f"{i:04}.json", data, digest
+
+
+def _write_frame(writer, out_file, data, changed, profiler):
+    """ writer.write, timed when profiling """
+    if profiler is None:
+        return writer.write(out_file, data, changed)
+    write_start = perf_counter()
+    try:
+        return writer.write(out_file, data, changed)
+    finally:
+        profiler.root.add('write', perf_counter() - write_start)
+
+
+def write_frames(scene, writer, start=0, stop=None, manifest=None, base=None, serializer=None, step=1):
+    """ serialize a range of frames and pass them to a writer.
+    Frames whose content hash matches the manifest are reported as unchanged.
+
+    :scene: the scene to be written
+    :writer: a FrameFileWriter, ContainerFrameWriter or PipeFrameWriter
+    :start: same as in encode_frames
+    :stop: same as in encode_frames
+    :manifest: the hashes of a previous build by frame file name, None to treat every frame as changed
+    :base: same as in encode_frames
+    :serializer: same as in encode_frames
+    :step: same as in encode_frames
+    :returns: a tuple of the hashes of the frames by file name, and the list of file names the writer wrote as changed
+
+    """
+    manifest = manifest or {}
+    hashes = {}
+    written = []
+    profiler = profiling.active_profiler()
+    for out_file, data, digest in encode_frames(scene, start, stop, base, serializer, step):
+        hashes[out_file] = digest
+        if _write_frame(writer, out_file, data, manifest.get(out_file) != digest, profiler):
+            written.append(out_file)
+    return hashes, written
+
+
+class ManifestWriter:
+
+    """Streams the content hashes of the frames into the manifest as they are written, in the format of save_manifest.
+    The manifest replaces the previous one when closed, a build that fails leaves the previous manifest in place.
+    """
+
+    def __init__(self, out_dir, serializer=None):
+        """
+        :out_dir: the output directory
+        :serializer: same as in save_manifest
+        """
+        self.path = os.path.join(out_dir, MANIFEST_NAME)
+        self._file = open(self.path + ".tmp", "w")
+        self._file.write(f'{{"serializer": {json.dumps(serializer)}, "frames": {{')
+        self._separator = "\n"
+
+    def add(self, out_file, digest):
+        # frame file names and hex digests need no escaping
+        self._file.write(f'{self._separator}"{out_file}": "{digest}"')
+        self._separator = ",\n"
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.write("\n}}")
+        self._file.close()
+        os.replace(self.path + ".tmp", self.path)
+
+
+def write_frames_bounded(scene, writer, out_dir, base=None, serializer=None, dirty_list=None, base_hash=None):
+    """ write all frames of a scene with memory that does not grow with the number of frames.
+    Every frame is written as changed, since comparing with the previous build needs its whole manifest in memory;
+    the manifest and the dirty list are streamed to disk instead of being collected.
+
+    :scene: the scene to be written
+    :writer: a FrameFileWriter or ContainerFrameWriter
+    :out_dir: the output directory, the manifest is written to
+    :base: same as in encode_frames
+    :serializer: same as in encode_frames
+    :dirty_list: a path to write the names of the frame files written to, one per line; None not to write it
+    :base_hash: the content hash of the base scene file written for base, recorded in the manifest
+    :returns: a tuple of the number of frames, and the number of frames the writer wrote as changed
+
+    """
+    serializer = serializer or get_serializer()
+    num_frames = 0
+    num_written = 0
+    profiler = profiling.active_profiler()
+    with contextlib.ExitStack() as stack:
+        manifest = stack.enter_context(contextlib.closing(ManifestWriter(out_dir, serializer.name)))
+        # frames queued by the writer are stored before the manifest lists them
+        stack.callback(writer.close)
+        dirty = None if dirty_list is None else stack.enter_context(open(dirty_list, "w"))
+        if base_hash is not None:
+            manifest.add(BASE_NAME, base_hash)
+        for out_file, data, digest in encode_frames(scene, base=base, serializer=serializer):
+            manifest.add(out_file, digest)
+            num_frames += 1
+            if _write_frame(writer, out_file, data, True, profiler):
+                num_written += 1
+                if dirty is not None:
+                    dirty.write(f"{out_file}\n")
+    return num_frames, num_written
+
+
+def remove_frames_from(out_dir, num_frames):
+    """ remove the frame files numbered num_frames and above, left by a longer previous build.
+    Scans the output directory instead of reading the previous manifest.
+
+    :returns: the number of files removed
+    """
+    removed = 0
+    with os.scandir(out_dir) as entries:
+        for entry in entries:
+            name, ext = os.path.splitext(entry.name)
+            if ext == ".json" and name.isdigit() and int(name) >= num_frames:
+                os.remove(entry.path)
+                removed += 1
+    return removed
+
+
+def remove_stale_frames(out_dir, manifest, hashes):
+    """ remove the frame files of a previous build that the current build no longer has
+
+    :returns: the list of file names removed
+    """
+    removed = sorted(set(manifest) - set(hashes))
+    for out_file in removed:
+        try:
+            os.remove(os.path.join(out_dir, out_file))
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def known_num_frames(scene):
+    """ the number of frames of a scene if it is known without iterating, see AnimatedProperty.__len__
+
+    :returns: the number of frames, None if the scene never ends or its length is unknown
+    """
+    try:
+        return len(scene)
+    except TypeError:
+        return None
+
+
+def count_frames(scene):
+    """ the number of frames of a scene, replaying it only if its length cannot be known otherwise
+
+    :raises: a ValueError if the scene never ends
+    """
+    num_frames = scene._num_frames()
+    if num_frames is None:
+        return sum(1 for _ in scene)
+    if num_frames == math.inf:
+        raise ValueError("Cannot split the frames of a scene that never ends")
+    return num_frames
+
+
+def shard_frames(num_frames, shard, num_shards, interleave=False):
+    """ the frames of one of num_shards shards of an animation, which together cover every frame once
+
+    :num_frames: the number of frames of the animation
+    :shard: the number of the shard, from 0 to num_shards - 1
+    :num_shards: the number of shards
+    :interleave: give each shard every num_shards-th frame instead of a contiguous range
+    :returns: a range of frame numbers
+
+    """
+    if interleave:
+        return range(shard, num_frames, num_shards)
+    return range(num_frames * shard // num_shards, num_frames * (shard + 1) // num_shards)
+
+
+def shard_manifest_name(shard, num_shards):
+    """ the name of the manifest written by a shard, next to its frames """
+    return f".shard-{shard}-of-{num_shards}.json"
+
+
+_SHARD_MANIFEST = re.compile(r"^\.shard-(\d+)-of-(\d+)\.json$")
+
+
+def load_shard_manifest(out_dir, shard, num_shards):
+    """ same as load_manifest, for the frames of a shard written by a previous build """
+    manifest = _read_manifest(os.path.join(out_dir, shard_manifest_name(shard, num_shards)))
+    return {} if manifest is None else manifest['frames']
+
+
+def save_shard_manifest(out_dir, shard, num_shards, frames, num_frames, hashes, serializer=None):
+    """ record the frames a shard wrote, so that shards copied into one directory can be checked and merged
+
+    :frames: the range of frames of the shard, see shard_frames
+    :num_frames: the number of frames of the whole animation
+    :hashes: the hashes of the frames of the shard by file name
+    :serializer: same as in save_manifest
+    """
+    with open(os.path.join(out_dir, shard_manifest_name(shard, num_shards)), "w") as f:
+        json.dump({
+            'shard': shard,
+            'shards': num_shards,
+            'num_frames': num_frames,
+            'range': {'start': frames.start, 'stop': frames.stop, 'step': frames.step},
+            'frames': hashes,
+            'serializer': serializer,
+        }, f, indent=0, sort_keys=True)
+
+
+def merge_shards(out_dir):
+    """ check that the shards copied into a directory cover every frame of the animation once,
+    and write the manifest of the whole animation from the manifests of the shards
+
+    :out_dir: the directory holding the frames and manifests of every shard
+    :returns: the hashes of all frames by file name
+    :raises: a ValueError if shards are missing, or belong to different animations or splits, or were encoded by
+             different serializers
+
+    """
+    shards = {}
+    for name in os.listdir(out_dir):
+        match = _SHARD_MANIFEST.match(name)
+        if match is not None:
+            with open(os.path.join(out_dir, name)) as f:
+                shards[int(match.group(1)), int(match.group(2))] = json.load(f)
+    if not shards:
+        raise ValueError(f"No shard manifest found in [{out_dir}]")
+    splits = {num_shards for _, num_shards in shards}
+    if len(splits) != 1:
+        raise ValueError(f"Shards of different splits [{sorted(splits)}] in [{out_dir}]")
+    num_shards = splits.pop()
+    missing = sorted(set(range(num_shards)) - {shard for shard, _ in shards})
+    if missing:
+        raise ValueError(f"Shards {missing} of [{num_shards}] are missing in [{out_dir}]")
+    lengths = {manifest['num_frames'] for manifest in shards.values()}
+    if len(lengths) != 1:
+        raise ValueError(f"Shards of animations with different numbers of frames [{sorted(lengths)}]")
+    num_frames = lengths.pop()
+    serializers = {manifest.get('serializer') for manifest in shards.values()}
+    if len(serializers) != 1:
+        raise ValueError(f"Shards encoded by different serializers {sorted(map(str, serializers))}")
+    hashes = {}
+    for manifest in shards.values():
+        hashes.update(manifest['frames'])
+    missing = [f"{i:04}.json" for i in range(num_frames) if f"{i:04}.json" not in hashes]
+    if missing:
+        raise ValueError(f"Frames {missing[:10]} are not in any shard")
+    save_manifest(out_dir, hashes, serializers.pop())
+    return hashes
+
+
+# the scene of a worker process, loaded once by _init_worker
+_worker_scene = None
+
+
+def _init_worker(frame_file, timeline):
+    global _worker_scene
+    _worker_scene = load_timeline(frame_file, **timeline)
+
+
+def _write_chunk(chunk):
+    out_dir, start, stop, manifest, base, part, profile, serializer, cache_size, write_options = chunk
+    writer = FrameFileWriter(out_dir, stop - start, **write_options) if part is None else ContainerFrameWriter(part)
+    profiler = profiling.Profiler(type(_worker_scene).__name__) if profile else contextlib.nullcontext()
+    try:
+        with profiler, _cached(cache_size):
+            hashes, written = write_frames(_worker_scene, writer, start, stop, manifest, base,
+                                           get_serializer(serializer))
+    finally:
+        writer.close()
+    return hashes, written, profiler.report() if profile else None
+
+
+def write_frames_parallel(frame_file, out_dir, jobs, manifest=None, container=None, base=None, serializer="auto",
+                          timeline=None, frame_cache=0, write_options=None):
+    """ write all frames of a scene with several worker processes, each writing a contiguous range of frames.
+    The ranges are planned up front from the length of the scene, which is only replayed if its length is unknown.
+    Workers seek to the start of their range, or replay up to it if the scene cannot seek.
+
+    :frame_file: path to the animation script, loaded once by each worker
+    :out_dir: the directory to write the frames to
+    :jobs: the number of worker processes
+    :manifest: same as in write_frames
+    :container: a ContainerFrameWriter to stream the frames into, None to write one file per frame.
+                Each worker writes its range into a container of its own, which are concatenated in order.
+    :base: same as in write_frames
+    :serializer: the name of the serializer, see get_serializer
+    :timeline: the keyword arguments of load_timeline, to write the frames at other times than the frames of the
+               scene; None to write the frames of the scene
+    :frame_cache: the size of the frame data cache of each worker, see _cached; 0 not to cache frame data
+    :write_options: the keyword arguments of the FrameFileWriter of each worker, None for the defaults
+    :returns: same as write_frames. When profiling, the profile of each worker is merged into the active profiler.
+
+    """
+    profiler = profiling.active_profiler()
+    timeline = timeline or {}
+    num_frames = count_frames(load_timeline(frame_file, **timeline))
+    parts = [None] * jobs if container is None else \
+        [os.path.join(out_dir, f".{CONTAINER_NAME}.part{k}") for k in range(jobs)]
+    ranges = [shard_frames(num_frames, k, jobs) for k in range(jobs)]
+    chunks = [(out_dir, ranges[k].start, ranges[k].stop, manifest, base, parts[k], profiler is not None, serializer,
+               frame_cache, write_options or {}) for k in range(jobs)]
+    hashes = {}
+    written = []
+    with multiprocessing.Pool(jobs, initializer=_init_worker, initargs=(frame_file, timeline)) as pool:
+        for chunk_hashes, chunk_written, report in pool.map(_write_chunk, chunks):
+            hashes.update(chunk_hashes)
+            written += chunk_written
+            if report is not None:
+                profiler.root.merge(report)
+    if container is not None:
+        for part in parts:
+            container.container.append_container(part)
+            os.remove(part)
+            os.remove(part + INDEX_SUFFIX)
+    return hashes, written
+
+
+def stream_frames(scene, stream, serializer=None, buffer_size=DEFAULT_BUFFER_SIZE):
+    """ stream all frames of a scene in order as length-prefixed records, for a consumer reading them as they come
+
+    :scene: the scene to be streamed
+    :stream: a binary stream, e.g. sys.stdout.buffer
+    :serializer: same as in write_frames
+    :buffer_size: the number of bytes buffered before writing them to the stream, see FrameStreamWriter
+    :returns: the number of frames streamed
+
+    """
+    writer = PipeFrameWriter(stream, buffer_size)
+    num_frames = 0
+    profiler = profiling.active_profiler()
+    with contextlib.closing(writer):
+        # nothing is collected per frame, streaming runs in constant memory
+        for out_file, data, _ in encode_frames(scene, serializer=serializer):
+            _write_frame(writer, out_file, data, True, profiler)
+            num_frames += 1
+    return num_frames
+
+
+def parse_shard(text):
+    """ parse the argument of --shard, i/N """
+    try:
+        shard, num_shards = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/N, got [{text}]")
+    if not 0 <= shard < num_shards:
+        raise argparse.ArgumentTypeError(f"shard [{shard}] is not between 0 and {num_shards - 1}")
+    return shard, num_shards
+
+
+BuildResult = namedtuple('BuildResult', ['written', 'unchanged', 'removed'])
+BuildResult.__doc__ = """The number of frame files written, found unchanged, and removed by a build"""
+
+FORMATS = ['files', 'container', 'pipe']
+
+
+@contextlib.contextmanager
+def _profiled(scene, profile):
+    """ profile the block if profile is the path of a report, and write the report after it """
+    if profile is None:
+        yield
+        return
+    with profiling.Profiler(type(scene).__name__) as profiler:
+        yield
+    with open(profile, "w") as f:
+        json.dump(profiler.report(), f, indent=2)
+
+
+@contextlib.contextmanager
+def _cached(cache_size):
+    """ reuse the frame data of the parts of the scene that did not change in the block, keeping the frame data of at
+    most cache_size properties; frame data is built every time if cache_size is 0 """
+    if not cache_size:
+        yield
+        return
+    with frame_cache.FrameDataCache(cache_size):
+        yield
+
+
+def _check_timeline(every, fps, duration):
+    """ check the options of load_timeline before loading the scene, see sample_times """
+    if every < 1:
+        raise OptionError(f"--every must be at least 1, got [{every}]")
+    if fps is not None and fps <= 0:
+        raise OptionError(f"--fps must be positive, got [{fps}]")
+    if duration is not None and duration <= 0:
+        raise OptionError(f"--duration must be positive, got [{duration}]")
+
+
+def build(frame_file, out_dir, *, jobs=1, format='files', delta=False, force=False, dirty_list=None,
+          bounded_memory=False, shard=None, interleave=False, serializer='auto', profile=None,
+          every=1, fps=None, duration=None, frame_cache=0, write_threads=DEFAULT_WRITE_THREADS,
+          write_queue=DEFAULT_WRITE_QUEUE, fsync=False):
+    """ write the frame data of an animation, the same as running framebuilder.py from the command line.
+    Can be called many times from one process, e.g. by a tool building several animations.
+
+    :frame_file: the path of the animation script, or the script itself as a dictionary
+    :out_dir: the directory to write the frame data to
+    :jobs: the number of worker processes writing frames in parallel
+    :format: files|container, see FORMATS; use stream() for pipe
+    :delta: write every frame as a merge patch against the first frame
+    :force: rewrite every frame, even if it did not change since the last build
+    :dirty_list: a path to write the names of the frame files that changed to, None not to write it
+    :bounded_memory: keep memory independent of the number of frames, see write_frames_bounded
+    :shard: a tuple (i, N) to write only the frames of shard i out of N, None to write every frame
+    :interleave: with shard, give each shard every N-th frame instead of a contiguous range
+    :serializer: the name of the serializer, see get_serializer
+    :profile: a path to write the profile of the build to, None not to profile
+    :every: only write every k-th frame, for drafts
+    :fps: the frame rate of the frames written, see load_timeline; None for the frame rate of the scene
+    :duration: the length in seconds of the frames written, see load_timeline; None for the length of the scene
+    :frame_cache: the number of frame data kept to reuse for the parts of the scene that did not change since a
+                  previous frame, see frame_cache.FrameDataCache; 0 to build the frame data of every frame
+    :write_threads: the number of threads writing frame files, 0 to write them while evaluating the scene
+    :write_queue: the number of encoded frames waiting for the threads writing frame files
+    :fsync: sync the frame data to storage before returning
+    :returns: a BuildResult
+    :raises: an OptionError if the options are invalid or cannot be combined, and a ValueError for errors found while
+             building, e.g. an unknown scene or values the serializer refuses
+
+    """
+    if jobs < 1:
+        raise OptionError("--jobs must be at least 1")
+    if frame_cache < 0:
+        raise OptionError("--frame-cache must not be negative")
+    if write_threads < 0:
+        raise OptionError("--write-threads must not be negative")
+    if write_queue < 1:
+        raise OptionError("--write-queue must be at least 1")
+    if format not in ('files', 'container'):
+        raise OptionError(f"unknown format [{format}] for a build to a directory")
+    if bounded_memory and jobs != 1:
+        raise OptionError("--bounded-memory writes from a single process, it cannot be combined with --jobs")
+    if interleave and shard is None:
+        raise OptionError("--interleave requires --shard")
+    if shard is not None and (jobs != 1 or bounded_memory or format != 'files'):
+        raise OptionError("--shard writes frame files from a single process, "
+                          "it cannot be combined with --jobs, --bounded-memory or --format container")
+    _check_timeline(every, fps, duration)
+    serializer_name = serializer
+    serializer = get_serializer(serializer)
+
+    os.makedirs(out_dir, exist_ok=True)
+    if shard is not None:
+        previous = _read_manifest(os.path.join(out_dir, shard_manifest_name(*shard)))
+    elif bounded_memory:
+        # the previous manifest grows with the number of frames, a bounded build rewrites every frame instead
+        previous = None
+    else:
+        previous = _read_manifest(os.path.join(out_dir, MANIFEST_NAME))
+    # serializers write some numbers differently, hashes of frames encoded by another one cannot be compared
+    same_serializer = previous is not None and previous.get('serializer') == serializer.name
+    previous = {} if previous is None else previous['frames']
+    manifest = previous if same_serializer and not force else {}
+    timeline = {'every': every, 'fps': fps, 'duration': duration}
+    write_options = {'threads': write_threads, 'queue_depth': write_queue, 'fsync': fsync}
+    scene = load_timeline(frame_file, **timeline)
+    with _profiled(scene, profile), _cached(frame_cache):
+        base = None
+        base_hashes = {}
+        if delta:
+            base = next(iter(scene), None)
+            base = {} if base is None else base.get_frame_data()
+            base_text = serializer.dumps(base)
+            with open(os.path.join(out_dir, BASE_NAME), "wb") as f:
+                f.write(base_text)
+            base_hashes[BASE_NAME] = frame_hash(base_text)
+            # patches against a different base are different frames, even if the patches are the same
+            if manifest.get(BASE_NAME) != base_hashes[BASE_NAME]:
+                manifest = {}
+        if shard is not None:
+            num_frames = count_frames(scene)
+            frames = shard_frames(num_frames, *shard, interleave)
+        if format == 'container':
+            writer = ContainerFrameWriter(os.path.join(out_dir, CONTAINER_NAME), fsync)
+        elif jobs == 1:
+            writer = FrameFileWriter(out_dir, len(frames) if shard is not None else known_num_frames(scene),
+                                     **write_options)
+        else:
+            # each worker process writes its frame files with a writer of its own
+            writer = None
+        with contextlib.nullcontext() if writer is None else contextlib.closing(writer):
+            if bounded_memory:
+                num_frames, num_written = write_frames_bounded(
+                    scene, writer, out_dir, base, serializer, dirty_list, base_hashes.get(BASE_NAME))
+            elif shard is not None:
+                # seekable scenes jump straight to the frames of the shard
+                hashes, written = write_frames(scene, writer, frames.start, frames.stop, manifest, base, serializer,
+                                               frames.step)
+            elif jobs == 1:
+                hashes, written = write_frames(scene, writer, manifest=manifest, base=base, serializer=serializer)
+            else:
+                hashes, written = write_frames_parallel(
+                    frame_file, out_dir, jobs, manifest, writer, base, serializer_name, timeline, frame_cache,
+                    write_options)
+    if bounded_memory:
+        return BuildResult(num_written, num_frames - num_written, remove_frames_from(out_dir, num_frames))
+    num_unchanged = len(hashes) - len(written)
+    hashes.update(base_hashes)
+    # only the frames of this shard are removed, other shards may write to the same directory
+    removed = remove_stale_frames(out_dir, previous, hashes)
+    if shard is not None:
+        save_shard_manifest(out_dir, *shard, frames, num_frames, hashes, serializer.name)
+    else:
+        save_manifest(out_dir, hashes, serializer.name)
+    if dirty_list is not None:
+        with open(dirty_list, "w") as f:
+            f.writelines(f"{out_file}\n" for out_file in written)
+    return BuildResult(len(written), num_unchanged, len(removed))
+
+
+def stream(frame_file, out=None, *, serializer='auto', buffer_size=DEFAULT_BUFFER_SIZE, profile=None,
+           every=1, fps=None, duration=None, frame_cache=0):
+    """ stream all frames of an animation as length-prefixed records, see stream_frames
+
+    :frame_file: same as in build
+    :out: a binary stream, stdout if None
+    :serializer: same as in build
+    :buffer_size: same as in stream_frames
+    :profile: same as in build
+    :every: same as in build
+    :fps: same as in build
+    :duration: same as in build
+    :frame_cache: same as in build
+    :returns: the number of frames streamed
+    :raises: same as build
+
+    """
+    if frame_cache < 0:
+        raise OptionError("--frame-cache must not be negative")
+    _check_timeline(every, fps, duration)
+    scene = load_timeline(frame_file, every, fps, duration)
+    serializer = get_serializer(serializer)
+    with _profiled(scene, profile), _cached(frame_cache):
+        return stream_frames(scene, sys.stdout.buffer if out is None else out, serializer, buffer_size)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write the frame data of an animation, one json file per frame.")
+    parser.add_argument('frame_file', metavar='frames.json', help="the animation script")
+    parser.add_argument('out_dir', metavar='output_dir', nargs='?',
+                        help="the directory to write the frame data to, not used with --format pipe")
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help="number of worker processes writing frames in parallel (default: 1)")
+    parser.add_argument('--format', choices=FORMATS, default='files',
+                        help="write one json file per frame, stream all frames into "
+                             f"{CONTAINER_NAME} with an offset index, or stream them to stdout as length-prefixed "
+                             "records for a renderer reading them as they come (default: files)")
+    parser.add_argument('--pipe-buffer', type=int, default=DEFAULT_BUFFER_SIZE, metavar='BYTES',
+                        help=f"with --format pipe, bytes buffered before writing to stdout (default: {DEFAULT_BUFFER_SIZE})")
+    parser.add_argument('--delta', action='store_true',
+                        help=f"write the first frame once as the base scene {BASE_NAME}, and every frame as a json "
+                             "merge patch against it, so parts of the scene that never change are written once")
+    parser.add_argument('--force', action='store_true',
+                        help="rewrite every frame, even if it did not change since the last build")
+    parser.add_argument('--dirty-list', metavar='PATH',
+                        help="write the names of the frame files that changed to PATH, one per line")
+    parser.add_argument('--bounded-memory', action='store_true',
+                        help="keep memory independent of the number of frames, for very long animations: every frame "
+                             "is rewritten, and the manifest and dirty list are streamed to disk")
+    parser.add_argument('--shard', type=parse_shard, metavar='i/N',
+                        help="only write the frames of shard i out of N (counting from 0), to render on several "
+                             "machines; the frames keep their numbers in the whole animation")
+    parser.add_argument('--interleave', action='store_true',
+                        help="with --shard, give each shard every N-th frame instead of a contiguous range")
+    parser.add_argument('--merge-shards', action='store_true',
+                        help="check that the shards copied into output_dir cover every frame, and write the "
+                             "manifest of the whole animation")
+    parser.add_argument('--serializer', choices=['auto'] + list(SERIALIZERS), default='auto',
+                        help="the json encoder, auto uses orjson when it is installed (default: auto)")
+    parser.add_argument('--every', type=int, default=1, metavar='K',
+                        help="only write every K-th frame, for drafts (default: 1)")
+    parser.add_argument('--fps', type=float,
+                        help="the frame rate of the frames written; the timeline of the scene, at the \"fps\" of the "
+                             f"animation script (default: {DEFAULT_FPS}), is evaluated at the times of these frames")
+    parser.add_argument('--duration', type=float, metavar='SECONDS',
+                        help="stretch the timeline of the scene to this many seconds")
+    parser.add_argument('--write-threads', type=int, metavar='N',
+                        help="threads writing frame files while the next frames are evaluated, 0 to write them in "
+                             f"turn (default: {DEFAULT_WRITE_THREADS})")
+    parser.add_argument('--write-queue', type=int, metavar='FRAMES',
+                        help="encoded frames waiting for the writer threads, bounding the memory they take "
+                             f"(default: {DEFAULT_WRITE_QUEUE})")
+    parser.add_argument('--fsync', action='store_true',
+                        help="sync the frame data to storage before exiting")
+    parser.add_argument('--frame-cache', type=int, default=0, metavar='SIZE',
+                        help="reuse the frame data of the parts of the scene that did not change since a previous "
+                             "frame, keeping at most SIZE of them; pays off for scenes with many parts holding still "
+                             "(default: 0, build the frame data of every frame)")
+    parser.add_argument('--profile', metavar='REPORT',
+                        help="time every property of the scene while writing and save the timings as json to REPORT")
+    args = parser.parse_args(argv)
 
-frame_file, out_dir = sys.argv[1:]
-os.makedirs(out_dir, exist_ok=True)
+    try:
+        if args.format == 'pipe':
+            # the options of builds to a directory, left unset by default
+            given = {'output_dir': args.out_dir is not None, '--jobs': args.jobs != 1, '--delta': args.delta,
+                     '--force': args.force, '--dirty-list': args.dirty_list is not None,
+                     '--bounded-memory': args.bounded_memory, '--shard': args.shard is not None,
+                     '--interleave': args.interleave, '--merge-shards': args.merge_shards,
+                     '--write-threads': args.write_threads is not None, '--write-queue': args.write_queue is not None,
+                     '--fsync': args.fsync}
+            conflicts = [name for name, is_given in given.items() if is_given]
+            if conflicts:
+                raise OptionError("--format pipe streams every frame to stdout from a single process, it cannot be "
+                                  f"combined with {', '.join(conflicts)}")
+            return pipe_main(args)
+        if args.out_dir is None:
+            raise OptionError("output_dir is required unless --format pipe")
+        if args.merge_shards:
+            try:
+                hashes = merge_shards(args.out_dir)
+            except ValueError as e:
+                # the shards in the directory do not make a whole animation, the options are fine
+                sys.exit(f"{parser.prog}: error: {e}")
+            print(f"{len(hashes)} frames merged")
+            return
+        result = build(args.frame_file, args.out_dir, jobs=args.jobs, format=args.format, delta=args.delta,
+                       force=args.force, dirty_list=args.dirty_list, bounded_memory=args.bounded_memory,
+                       shard=args.shard, interleave=args.interleave, serializer=args.serializer,
+                       profile=args.profile, every=args.every, fps=args.fps, duration=args.duration,
+                       frame_cache=args.frame_cache,
+                       write_threads=DEFAULT_WRITE_THREADS if args.write_threads is None else args.write_threads,
+                       write_queue=DEFAULT_WRITE_QUEUE if args.write_queue is None else args.write_queue,
+                       fsync=args.fsync)
+    except OptionError as e:
+        parser.error(str(e))
+    print(f"{result.written} frames written, {result.unchanged} unchanged, {result.removed} removed")
 
-with open(frame_file) as f:
-    frame_data = json.load(f)
 
-scene_name = frame_data['scene'] # the name of the scene
-params = frame_data['params'] # should be a dictionary, passed as keyword argument for initializing scene
-Scene = scenes[scene_name]
-scene = Scene(**params)
-it = iter(scene)
-for i, frame in enumerate(scene):
-    out_file = f"{i:04}.json"
-    out_name = os.path.join(out_dir, out_file)
-    with open(out_name, "w") as f:
-        json.dump(frame.get_frame_data(), f)
-    print(f"Written frame data to {out_name}")
+def pipe_main(args):
+    try:
+        num_frames = stream(args.frame_file, serializer=args.serializer, buffer_size=args.pipe_buffer,
+                            profile=args.profile, every=args.every, fps=args.fps, duration=args.duration,
+                            frame_cache=args.frame_cache)
+    except BrokenPipeError:
+        # the consumer stopped reading, silence the error flushing stdout again at exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+    # stdout carries the frames
+    print(f"{num_frames} frames streamed", file=sys.stderr)
 
 
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+import argparse
+import json
+import os
+import sys
+from itertools import islice
+
+from animations.pycommon.frame_container import INDEX_SUFFIX, FrameContainerReader
+from animations.pycommon.frame_stream import read_frame_stream
+from animations.pycommon.merge_patch import apply_merge_patch
+from animations.pycommon.preview import PreviewRenderer, to_ppm
+
+# the base scene written next to the frames by framebuilder.py --delta
+BASE_NAME = ".base.json"
+
+
+def _load_base(directory):
+    path = os.path.join(directory, BASE_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def read_frames(source, every=1):
+    """ read the frames written by framebuilder.py, in order
+
+    :source: a directory of frame files, a container written with --format container, a single frame file,
+             or - for the records streamed on stdin with --format pipe
+    :every: only read every k-th frame
+    :returns: an iterator of (name, frame data) pairs, frames written with --delta are applied to their base
+    """
+    if source == '-':
+        records = islice(enumerate(read_frame_stream(sys.stdin.buffer)), 0, None, every)
+        for i, data in records:
+            yield f"{i:04}.json", json.loads(data)
+        return
+    if os.path.isdir(source):
+        base = _load_base(source)
+        names = sorted(name for name in os.listdir(source) if name.endswith('.json') and not name.startswith('.'))
+        for name in names[::every]:
+            with open(os.path.join(source, name)) as f:
+                frame = json.load(f)
+            yield name, frame if base is None else apply_merge_patch(base, frame)
+        return
+    if os.path.exists(source + INDEX_SUFFIX):
+        base = _load_base(os.path.dirname(source))
+        with FrameContainerReader(source) as reader:
+            for i in range(0, len(reader), every):
+                yield f"{i:04}.json", reader[i] if base is None else apply_merge_patch(base, reader[i])
+        return
+    with open(source) as f:
+        yield os.path.basename(source), json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Render low resolution previews of the frame data written by framebuilder.py, one ppm per frame.")
+    parser.add_argument('source', metavar='scene_data',
+                        help="a directory of frame files, a frames.jsonl container, a single frame file, "
+                             "or - to read frames streamed with --format pipe from stdin")
+    parser.add_argument('out_dir', metavar='preview_dir', help="the directory to write the previews to")
+    parser.add_argument('-w', '--width', type=int, default=64,
+                        help="the width of the previews in pixels, the height keeps the aspect ratio (default: 64)")
+    parser.add_argument('--every', type=int, default=1, metavar='K',
+                        help="only render every K-th frame (default: 1)")
+    parser.add_argument('--no-shadows', action='store_true', help="skip the shadow rays, for an even faster preview")
+    args = parser.parse_args(argv)
+    if args.width < 1:
+        parser.error("--width must be at least 1")
+    if args.every < 1:
+        parser.error("--every must be at least 1")
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    renderer = PreviewRenderer(args.width, shadows=not args.no_shadows)
+    num_frames = 0
+    for name, frame in read_frames(args.source, args.every):
+        with open(os.path.join(args.out_dir, os.path.splitext(name)[0] + '.ppm'), 'wb') as f:
+            f.write(to_ppm(renderer.render(frame)))
+        num_frames += 1
+    print(f"{num_frames} previews written to {args.out_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,11 @@
+import 'dart:async';
+import 'dart:convert';
 import 'dart:io';
 import 'dart:math';
 import 'dart:isolate';
 
+import 'common/framecontainer.dart';
+import 'common/framestream.dart';
 import 'common/image.dart';
 import 'common/jsonloader.dart';
 import 'common/maths.dart';
@@ -234,9 +238,14 @@ void computeScene(args) {
     var scenePath = args[0];
     var framePath = args[1];
     var sendPort = args[2];
+    var sceneJson = args[3];                    // the scene as a json string if it comes from a container
+    var baseJson = args[4];                     // the base scene if the scene is a patch against it
     // Determine where to write the rendered image.
     print('Scene: $scenePath...');
-    var loader = JsonLoader(path:scenePath);    // load json file
+    var sceneData = jsonDecode(sceneJson ?? File(scenePath).readAsStringSync());
+    if(baseJson != null)
+        sceneData = applyMergePatch(jsonDecode(baseJson), sceneData);
+    var loader = JsonLoader(data:sceneData);
     var scene = Scene.fromJson(loader);         // parse json file as Scene
 
     // override scene's resolution
@@ -248,52 +257,118 @@ void computeScene(args) {
     sendPort.send(framePath);
 }
 
+// Renders the frames streamed on stdin by `framebuilder.py --format pipe` as they arrive, so that the first
+// images are rendered while the next frames are still being generated. Reading stops while all isolates
+// are busy, which blocks framebuilder on a full pipe instead of buffering frames in memory.
+Future<void> renderFrameStream(Stream<String> frames, String framesDir, int maxThread) {
+    var done = Completer<void>();
+    var receivePort = ReceivePort();
+    int started = 0;
+    int completedTasks = 0;
+    bool inputDone = false;
+    StreamSubscription<String> subscription;
+    subscription = frames.listen((sceneJson) {
+        var frameFile = '${framesDir}/${FrameContainer.frameName(started).replaceAll(".json", ".ppm")}';
+        Isolate.spawn(computeScene, ['frame ${started}', frameFile, receivePort.sendPort, sceneJson, null]);
+        started += 1;
+        if (started - completedTasks >= maxThread) {
+            subscription.pause();
+        }
+    }, onDone: () {
+        inputDone = true;
+        if (completedTasks == started) {
+            receivePort.close();
+        }
+    });
+    receivePort.listen((framePath) {
+        completedTasks += 1;
+        print("(${completedTasks}/${started}) ${framePath} done!");
+        if (subscription.isPaused) {
+            subscription.resume();
+        }
+        if (inputDone && completedTasks == started) {
+            receivePort.close();
+        }
+    }, onDone: () {
+        print("Done!");
+        done.complete();
+    });
+    return done.future;
+}
+
 void main(args) async {
     // ad-hoc functionality, should be replaced by direct video generator
-    if (args.length != 2) {
-        print("Invalid arguments. Usage: raytrace.dart [scenesDir] [framesDir]");
+    if (args.length != 2 && args.length != 3) {
+        print("Invalid arguments. Usage: raytrace.dart [scenesDir|frames.jsonl|-] [framesDir] [dirtyList]");
         return;
     }
     var scenesDir = args[0];
     var framesDir = args[1];
-    // list all scene files in scenesDir
-    var sceneFiles = Directory(scenesDir).listSync().map((file) => file.path);
+    // ray trace each scene in parallel
+    const int maxThread = 4;
+    // frames streamed by `framebuilder.py --format pipe` on stdin
+    if (scenesDir == '-') {
+        Directory('${framesDir}').createSync(recursive:true);
+        await renderFrameStream(readFrameStream(stdin), framesDir, maxThread);
+        return;
+    }
+    // scenesDir is either a directory of json files, or a container written by `framebuilder.py --format container`
+    FrameContainer container = FileSystemEntity.isFileSync(scenesDir) ? FrameContainer(scenesDir) : null;
+    Iterable<String> sceneFiles;
+    if (container != null) {
+        // name the frames in the container like the json files they replace
+        sceneFiles = List.generate(container.length, (i) => FrameContainer.frameName(i));
+    } else {
+        // list all scene files in scenesDir, skipping hidden files such as the frame manifest
+        sceneFiles = Directory(scenesDir).listSync()
+                .map((file) => file.path)
+                .where((path) => !path.split('/').last.startsWith('.'));
+    }
+    // only render the scene files named in dirtyList (one file name per line), if given
+    if (args.length == 3) {
+        var dirtyFiles = File(args[2]).readAsLinesSync().where((line) => line.isNotEmpty).toSet();
+        sceneFiles = sceneFiles.where((path) => dirtyFiles.contains(path.split('/').last));
+    }
+    sceneFiles = sceneFiles.toList();
+    // frames written with `framebuilder.py --delta` are patches against the base scene next to them
+    var baseFile = File(container != null ? '${File(scenesDir).parent.path}/.base.json' : '${scenesDir}/.base.json');
+    String baseJson = baseFile.existsSync() ? baseFile.readAsStringSync() : null;
     var sceneFilesIt = sceneFiles.iterator;
     // Make sure images folder exists, because this is where all generated images will be saved
     Directory('${framesDir}').createSync(recursive:true);
 
-    // ray trace each scene in parallel
-    const int maxThread = 4;
     int currNumThread = 0;
     int maxTasks = sceneFiles.length;
     int completedTasks = 0;
     var receivePort = ReceivePort();
-    receivePort.listen((framePath) {
-    	completedTasks += 1;
-        print("(${completedTasks}/${maxTasks}) ${framePath} done!");
-        // add in new task if there is capacity
+    // spawns an isolate for the next scene, returns false if there is none left
+    bool spawnNextScene() {
         var cont = sceneFilesIt.moveNext();
-        if (!cont) { 
+        if (!cont) {
             receivePort.close();
-            return;
+            container?.close();
+            return false;
         }
         var sceneFile = sceneFilesIt.current;
         var baseName = sceneFile.split('/').last.replaceAll(".json", ".ppm");
         var frameFile = '${framesDir}/${baseName}';
-        Isolate.spawn(computeScene, [sceneFile, frameFile, receivePort.sendPort]);
+        // frames of a container are read here and passed to the isolate as json
+        var sceneJson = container?.frameJson(int.parse(sceneFile.replaceAll(".json", "")));
+        Isolate.spawn(computeScene, [sceneFile, frameFile, receivePort.sendPort, sceneJson, baseJson]);
+        return true;
+    }
+    receivePort.listen((framePath) {
+    	completedTasks += 1;
+        print("(${completedTasks}/${maxTasks}) ${framePath} done!");
+        // add in new task if there is capacity
+        spawnNextScene();
     }, onDone: () {
         print("Done!");
     });
     // start the first maxThread jobs
     for (int i=0; i < maxThread; i++) {
-        var cont = sceneFilesIt.moveNext();
-        if (!cont) { 
-            receivePort.close();
+        if (!spawnNextScene()) {
             return;
         }
-        var sceneFile = sceneFilesIt.current;
-        var baseName = sceneFile.split('/').last.replaceAll(".json", ".ppm");
-        var frameFile = '${framesDir}/${baseName}';
-        Isolate.spawn(computeScene, [sceneFile, frameFile, receivePort.sendPort]);
     }
 }
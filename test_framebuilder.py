@@ -0,0 +1,432 @@
+import contextlib
+import os
+
+import framebuilder
+import pytest
+from animations.pycommon import registry
+from animations.pycommon.animated_property import AnimatedProperty
+
+
+@pytest.fixture
+def frame_file():
+    return os.path.join(os.path.dirname(__file__), 'animations', 'moving_camera.json')
+
+
+def read_frames(out_dir):
+    frames = {}
+    for name in sorted(os.listdir(out_dir)):
+        if name.startswith('.'):
+            continue
+        with open(os.path.join(out_dir, name), 'rb') as f:
+            frames[name] = f.read()
+    return frames
+
+
+def test_parallel_matches_serial(frame_file, tmp_path):
+    # GIVEN the same animation built serially and with several jobs
+    framebuilder.main([frame_file, str(tmp_path / 'serial')])
+    framebuilder.main([frame_file, str(tmp_path / 'parallel'), '--jobs', '3'])
+    # THEN we expect byte-identical frame files
+    serial = read_frames(tmp_path / 'serial')
+    assert len(serial) == 1000
+    assert read_frames(tmp_path / 'parallel') == serial
+
+
+def test_incremental_rebuild(frame_file, tmp_path):
+    out_dir = tmp_path / 'frames'
+    dirty_list = tmp_path / 'dirty.txt'
+    # GIVEN a complete build
+    framebuilder.main([frame_file, str(out_dir), '--dirty-list', str(dirty_list)])
+    assert len(dirty_list.read_text().split()) == 1000
+    # WHEN one frame file goes missing, a stale frame is left behind, and we rebuild
+    os.remove(out_dir / '0042.json')
+    (out_dir / '1000.json').write_text('{}')
+    manifest = framebuilder.load_manifest(out_dir)
+    manifest['1000.json'] = 'stale'
+    framebuilder.save_manifest(out_dir, manifest, framebuilder.get_serializer().name)
+    framebuilder.main([frame_file, str(out_dir), '--dirty-list', str(dirty_list)])
+    # THEN we expect only the missing frame to be rewritten, and the stale frame to be removed
+    assert dirty_list.read_text().split() == ['0042.json']
+    assert not (out_dir / '1000.json').exists()
+    assert len(framebuilder.load_manifest(out_dir)) == 1000
+
+
+def test_container_format(frame_file, tmp_path):
+    from animations.pycommon.frame_container import FrameContainerReader
+    # GIVEN the same animation written as files, and as a container serially and with several jobs
+    framebuilder.main([frame_file, str(tmp_path / 'files')])
+    framebuilder.main([frame_file, str(tmp_path / 'serial'), '--format', 'container'])
+    framebuilder.main([frame_file, str(tmp_path / 'parallel'), '--format', 'container', '--jobs', '3'])
+    files = read_frames(tmp_path / 'files')
+    for out_dir in ['serial', 'parallel']:
+        # THEN we expect a single container holding the same frames
+        output = read_frames(tmp_path / out_dir)
+        assert sorted(output) == ['frames.jsonl', 'frames.jsonl.idx']
+        assert output['frames.jsonl'] == b''.join(text + b'\n' for text in files.values())
+        # THEN we expect any frame to be readable directly
+        with FrameContainerReader(str(tmp_path / out_dir / 'frames.jsonl')) as reader:
+            assert len(reader) == 1000
+            assert reader.frame_bytes(999) == files['0999.json']
+            assert reader[-1] == reader[999]
+
+
+def test_delta_frames(frame_file, tmp_path):
+    import json
+    from animations.pycommon.merge_patch import apply_merge_patch
+    # GIVEN the same animation written as full frames and as patches against a base scene
+    framebuilder.main([frame_file, str(tmp_path / 'full')])
+    framebuilder.main([frame_file, str(tmp_path / 'delta'), '--delta', '--jobs', '2'])
+    full = read_frames(tmp_path / 'full')
+    delta = read_frames(tmp_path / 'delta')
+    # THEN we expect the invariant parts of the scene to be left out of the frames
+    assert sum(map(len, delta.values())) < sum(map(len, full.values())) / 5
+    assert json.loads(delta['0500.json']).keys() == {'camera'}
+    # THEN we expect each frame to be restored by patching the base scene
+    base = json.loads((tmp_path / 'delta' / framebuilder.BASE_NAME).read_text())
+    for name, text in full.items():
+        assert apply_merge_patch(base, json.loads(delta[name])) == json.loads(text)
+    # WHEN we rebuild without patches
+    framebuilder.main([frame_file, str(tmp_path / 'delta')])
+    # THEN we expect the base scene to be removed
+    assert read_frames(tmp_path / 'delta') == full
+    assert not (tmp_path / 'delta' / framebuilder.BASE_NAME).exists()
+
+
+def test_serializers_match(frame_file, tmp_path):
+    pytest.importorskip("orjson")
+    # GIVEN the same animation written with the stdlib json module and with orjson
+    framebuilder.main([frame_file, str(tmp_path / 'json'), '--serializer', 'json'])
+    framebuilder.main([frame_file, str(tmp_path / 'orjson'), '--serializer', 'orjson'])
+    # THEN we expect byte-identical frame files, as the scene has no numbers the serializers write differently
+    assert read_frames(tmp_path / 'json') == read_frames(tmp_path / 'orjson')
+    assert framebuilder.get_serializer('json').dumps(1e-05) != framebuilder.get_serializer('orjson').dumps(1e-05)
+    # WHEN we rebuild with the other serializer
+    dirty_list = tmp_path / 'dirty.txt'
+    framebuilder.main([frame_file, str(tmp_path / 'json'), '--serializer', 'orjson', '--dirty-list', str(dirty_list)])
+    # THEN we expect the hashes of the previous build not to be trusted, and every frame to be rewritten
+    assert len(dirty_list.read_text().split()) == 1000
+    # THEN we expect NaN, which is not json, to be refused by the json module
+    with pytest.raises(ValueError):
+        framebuilder.get_serializer('json').dumps(float('nan'))
+
+
+def test_frame_encoder_reuses_unchanged_values():
+    from animations.pycommon.maths import Point
+    encoder = framebuilder.FrameEncoder(framebuilder.get_serializer('json'))
+    # GIVEN a static value that is mutated in place, and a value that changes every frame
+    static = {'surfaces': [1, 2]}
+    for i in range(3):
+        frame_data = {'camera': Point(i, 0, 0), 'static': static, 'lights': [{'o': [0, 1, 2]}]}
+        # WHEN we encode the frames one after the other
+        # THEN we expect the same bytes as encoding each frame on its own
+        assert encoder.encode(frame_data) == framebuilder.get_serializer('json').dumps(frame_data)
+        assert framebuilder.json.loads(encoder.encode(frame_data))['camera'] == [i, 0, 0]
+        static['surfaces'].append(i)
+
+
+
+def test_frame_encoder_detects_changes_of_type():
+    encoder = framebuilder.FrameEncoder(framebuilder.get_serializer('json'))
+    # GIVEN nested values that change type but stay equal in Python
+    frames = [{'camera': {'fov': 1}, 'x': [1]}, {'camera': {'fov': 1.0}, 'x': [True]}]
+    for frame_data in frames:
+        # WHEN we encode the frames one after the other
+        # THEN we expect the same bytes as encoding each frame on its own
+        assert encoder.encode(frame_data) == framebuilder.get_serializer('json').dumps(frame_data)
+
+
+def test_pipe_format(frame_file, tmp_path):
+    import subprocess
+    import sys
+    from animations.pycommon.frame_stream import read_frame_stream
+    # GIVEN the same animation written as files, and streamed to stdout
+    framebuilder.main([frame_file, str(tmp_path / 'files')])
+    process = subprocess.Popen([sys.executable, framebuilder.__file__, frame_file, '--format', 'pipe',
+                                '--pipe-buffer', '4096'], stdout=subprocess.PIPE)
+    # WHEN we read the frames as they arrive
+    frames = list(read_frame_stream(process.stdout))
+    # THEN we expect the same frames, in order, and nothing else on stdout
+    assert process.wait() == 0
+    assert frames == list(read_frames(tmp_path / 'files').values())
+    # THEN we expect the options of builds to a directory to be refused rather than ignored
+    for options in [['--shard', '0/2'], ['--bounded-memory'], ['--force'], ['--merge-shards'],
+                    ['--write-threads', '4'], ['--fsync']]:
+        with pytest.raises(SystemExit):
+            framebuilder.main([frame_file, '--format', 'pipe'] + options)
+
+
+def test_bounded_memory(frame_file, tmp_path):
+    # GIVEN a complete build with a stale frame left over from a longer animation
+    framebuilder.main([frame_file, str(tmp_path / 'full')])
+    (tmp_path / 'bounded').mkdir()
+    (tmp_path / 'bounded' / '1000.json').write_text('{}')
+    # WHEN we build with bounded memory
+    dirty_list = tmp_path / 'dirty.txt'
+    framebuilder.main([frame_file, str(tmp_path / 'bounded'), '--bounded-memory', '--dirty-list', str(dirty_list)])
+    # THEN we expect the same frames and manifest, every frame written, and the stale frame removed
+    assert read_frames(tmp_path / 'bounded') == read_frames(tmp_path / 'full')
+    assert framebuilder.load_manifest(tmp_path / 'bounded') == framebuilder.load_manifest(tmp_path / 'full')
+    assert len(dirty_list.read_text().split()) == 1000
+    # THEN we expect an incremental build to find every frame unchanged
+    framebuilder.main([frame_file, str(tmp_path / 'bounded'), '--dirty-list', str(dirty_list)])
+    assert dirty_list.read_text() == ''
+
+
+BOUNDED_SCRIPT = """
+import os, resource, sys
+import framebuilder
+from animations.pycommon.animated_property import AnimatedProperty
+from animations.pycommon.lerp_property import LerpPoint
+from animations.pycommon.maths import Point
+
+class Timeline(AnimatedProperty):
+    # the camera path of PlanetScene, with a dynamic property so that frames are iterated rather than seeked
+    def __init__(self, num_frames):
+        super().__init__()
+        self.register_child_property('cameraEye', LerpPoint.from_interval(
+            Point(22, 0, 50), Point(22, 20, 0), num_frames // 2))
+        self.append_child_property('cameraEye', LerpPoint.from_interval(
+            Point(22, 20, 0), Point(22, 0, -50), num_frames - num_frames // 2))
+        self.register_child_property('cameraTarget', LerpPoint.from_interval(
+            Point(-20, 0, 0), Point(40, 0, 0), num_frames))
+        self.register_child_property('frame', 0, dynamic_updater=lambda pf: pf.props['frame'] + 1)
+
+    def get_frame_data(self, property_frame):
+        return {'camera': {'eye': property_frame.props['cameraEye'].get_frame_data(),
+                           'target': property_frame.props['cameraTarget'].get_frame_data()},
+                'frame': property_frame.props['frame']}
+
+class PeakRss(framebuilder.PipeFrameWriter):
+    def write(self, out_file, data, changed):
+        if out_file in ('100000.json', '999999.json'):
+            print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+        return super().write(out_file, data, changed)
+
+with open(os.devnull, 'wb') as devnull:
+    writer = PeakRss(devnull)
+    num_frames, _ = framebuilder.write_frames_bounded(Timeline(1000000), writer, sys.argv[1])
+    writer.close()
+print(num_frames)
+"""
+
+
+def test_bounded_memory_rss(tmp_path):
+    import subprocess
+    import sys
+    # GIVEN a bounded build of a million frames, in a process of its own
+    output = subprocess.run([sys.executable, '-c', BOUNDED_SCRIPT, str(tmp_path)], capture_output=True, text=True,
+                            check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.split()
+    # THEN we expect the peak RSS after the last frame to be about the same as after 100k frames (in KiB)
+    rss_100k, rss_1m, num_frames = map(int, output)
+    assert num_frames == 1000000
+    assert rss_1m - rss_100k < 8 * 1024
+
+
+@pytest.mark.parametrize('interleave', [[], ['--interleave']])
+def test_shards(frame_file, tmp_path, interleave):
+    import shutil
+    # GIVEN a complete build, and the same animation split into 3 shards built separately
+    framebuilder.main([frame_file, str(tmp_path / 'full')])
+    merged = tmp_path / 'merged'
+    merged.mkdir()
+    for shard in range(3):
+        out_dir = tmp_path / f'shard{shard}'
+        framebuilder.main([frame_file, str(out_dir), '--shard', f'{shard}/3'] + interleave)
+        # THEN we expect each shard to write only its own frames
+        assert len(read_frames(out_dir)) in (333, 334)
+        # WHEN we copy the shards into one directory before merging
+        with pytest.raises(SystemExit):
+            framebuilder.main([frame_file, str(merged), '--merge-shards'])
+        for name in os.listdir(out_dir):
+            shutil.copy(out_dir / name, merged / name)
+    framebuilder.main([frame_file, str(merged), '--merge-shards'])
+    # THEN we expect the same numbered frames and manifest as the complete build
+    assert read_frames(merged) == read_frames(tmp_path / 'full')
+    assert framebuilder.load_manifest(merged) == framebuilder.load_manifest(tmp_path / 'full')
+
+
+def test_build_in_process(frame_file, tmp_path):
+    # GIVEN an animation script given as a dictionary
+    script = {'scene': 'PlanetScene', 'params': {'num_frames': 20}}
+    # WHEN we build it twice from the same process
+    first = framebuilder.build(script, str(tmp_path / 'out'))
+    second = framebuilder.build(script, str(tmp_path / 'out'))
+    # THEN we expect the second build to find every frame unchanged
+    assert first == framebuilder.BuildResult(written=20, unchanged=0, removed=0)
+    assert second == framebuilder.BuildResult(written=0, unchanged=20, removed=0)
+    # WHEN we build a shorter animation into the same directory
+    result = framebuilder.build({'scene': 'PlanetScene', 'params': {'num_frames': 10}}, str(tmp_path / 'out'),
+                                force=True)
+    # THEN we expect the frames past its end to be removed
+    assert result.written == 10 and result.removed == 10
+    assert len(read_frames(tmp_path / 'out')) == 10
+    # THEN we expect options that cannot be combined to raise a ValueError
+    with pytest.raises(ValueError):
+        framebuilder.build(script, str(tmp_path / 'out'), jobs=2, bounded_memory=True)
+    with pytest.raises(ValueError):
+        framebuilder.build({'scene': 'NoSuchScene', 'params': {}}, str(tmp_path / 'out'))
+
+
+class CounterScene(AnimatedProperty):
+    # a scene yielding frames of its own from __iter__, which cannot seek
+    def __init__(self, num_frames):
+        super().__init__()
+        self.num_frames = num_frames
+
+    def __iter__(self):
+        for frame_num in range(self.num_frames):
+            yield self.PropertyFrame({'count': frame_num}, self, frame_num)
+
+
+def test_scene_with_custom_iteration(tmp_path, monkeypatch):
+    # GIVEN a scene yielding frames of its own from __iter__
+    monkeypatch.setitem(registry._scenes, 'CounterScene', CounterScene)
+    script = {'scene': 'CounterScene', 'params': {'num_frames': 5}}
+    # WHEN we build it, in full and as a shard
+    framebuilder.build(script, str(tmp_path / 'full'))
+    framebuilder.build(script, str(tmp_path / 'shard'), shard=(1, 2))
+    # THEN we expect the frames it yields
+    assert list(read_frames(tmp_path / 'full').values()) == [b'{"count":%d}' % i for i in range(5)]
+    assert read_frames(tmp_path / 'shard') == {'0002.json': b'{"count":2}', '0003.json': b'{"count":3}',
+                                                '0004.json': b'{"count":4}'}
+
+
+def test_option_errors(tmp_path, monkeypatch):
+    import json
+
+    def value_scene(value):
+        if value < 0:
+            raise ValueError(f"value [{value}] must not be negative")
+        scene = AnimatedProperty()
+        scene.register_child_property('value', value, property_type="static")
+        scene.end_at(1)
+        return scene
+
+    # GIVEN a scene refusing some params, and animation scripts that are valid or not for the json serializer
+    monkeypatch.setitem(registry._scenes, 'ValueScene', value_scene)
+    scripts = {}
+    for name, value in [('valid', 1.0), ('nan', float('nan')), ('negative', -1.0)]:
+        scripts[name] = str(tmp_path / f'{name}.json')
+        with open(scripts[name], 'w') as f:
+            json.dump({'scene': 'ValueScene', 'params': {'value': value}}, f)
+    # WHEN options are invalid
+    # THEN we expect an OptionError, reported by the command line as a usage error
+    with pytest.raises(framebuilder.OptionError):
+        framebuilder.build(scripts['valid'], str(tmp_path / 'out'), every=0)
+    with pytest.raises(SystemExit) as exit_info:
+        framebuilder.main([scripts['valid'], str(tmp_path / 'out'), '--jobs', '0'])
+    assert exit_info.value.code == 2
+    # WHEN the options are valid but the build fails
+    # THEN we expect the ValueError of the build itself
+    for name in ['nan', 'negative']:
+        with pytest.raises(ValueError) as error_info:
+            framebuilder.main([scripts[name], str(tmp_path / 'out'), '--serializer', 'json'])
+        assert not isinstance(error_info.value, framebuilder.OptionError)
+
+
+def test_resampled_timeline(tmp_path):
+    # GIVEN an animation of 30 frames, at the default frame rate of the timeline
+    script = {'scene': 'PlanetScene', 'params': {'num_frames': 30}}
+    framebuilder.build(script, str(tmp_path / 'full'))
+    full = read_frames(tmp_path / 'full')
+    # WHEN we write every 4th frame as a draft
+    framebuilder.build(script, str(tmp_path / 'draft'), every=4)
+    # THEN we expect the frames of the full build, numbered in order
+    draft = read_frames(tmp_path / 'draft')
+    assert list(draft.values()) == list(full.values())[::4]
+    assert list(draft) == [f"{i:04}.json" for i in range(8)]
+    # WHEN we write it at twice the frame rate, serially and with several jobs
+    framebuilder.build(script, str(tmp_path / 'fps'), fps=2 * framebuilder.DEFAULT_FPS)
+    framebuilder.build(script, str(tmp_path / 'fps_parallel'), fps=2 * framebuilder.DEFAULT_FPS, jobs=2)
+    # THEN we expect twice the frames, from the same first frame to the same last frame
+    frames = read_frames(tmp_path / 'fps')
+    assert len(frames) == 60
+    assert frames['0000.json'] == full['0000.json'] and frames['0059.json'] == full['0029.json']
+    assert read_frames(tmp_path / 'fps_parallel') == frames
+    # WHEN we stretch it to a duration
+    result = framebuilder.build(script, str(tmp_path / 'fps'), duration=2, fps=10)
+    # THEN we expect the number of frames of that duration
+    assert result.written + result.unchanged == 20 and result.removed == 40
+
+
+def test_resampled_last_frame(tmp_path, monkeypatch):
+    from animations.pycommon.resample import sample_times
+    # GIVEN a size for which the frames in between are not evenly spread in exact arithmetic
+    times = sample_times(16, fps=50)
+    # THEN we expect the last time to be exactly the last frame
+    assert len(times) == 27 and times[-1] == 15
+    # WHEN we resample a scene that cannot seek, and one that can
+    monkeypatch.setitem(registry._scenes, 'CounterScene', CounterScene)
+    framebuilder.build({'scene': 'CounterScene', 'params': {'num_frames': 16}}, str(tmp_path / 'counter'), fps=50)
+    framebuilder.build({'scene': 'PlanetScene', 'params': {'num_frames': 16}}, str(tmp_path / 'planet'))
+    framebuilder.build({'scene': 'PlanetScene', 'params': {'num_frames': 16}}, str(tmp_path / 'fps'), fps=50)
+    # THEN we expect both to end with the last frame of the timeline
+    assert read_frames(tmp_path / 'counter')['0026.json'] == b'{"count":15}'
+    assert read_frames(tmp_path / 'fps')['0026.json'] == read_frames(tmp_path / 'planet')['0015.json']
+
+
+def test_threaded_writer(frame_file, tmp_path, capsys):
+    # GIVEN the same animation built with the frame files written in turn, and by threads through a short queue
+    framebuilder.build(frame_file, str(tmp_path / 'serial'), write_threads=0)
+    serial_output = capsys.readouterr().out
+    framebuilder.main([frame_file, str(tmp_path / 'threaded'), '--write-threads', '3', '--write-queue', '2', '--fsync'])
+    # THEN we expect byte-identical frame files
+    assert read_frames(tmp_path / 'threaded') == read_frames(tmp_path / 'serial')
+    # THEN we expect the progress to be printed now and then, ending with the last frame
+    lines = serial_output.splitlines()
+    assert 1 <= len(lines) < 1000
+    assert lines[-1].startswith("(1000/1000) Written frame data to")
+
+
+def test_threaded_writer_error(tmp_path):
+    # GIVEN a writer whose threads cannot write to the output directory
+    writer = framebuilder.FrameFileWriter(str(tmp_path / 'missing'), threads=2, queue_depth=1)
+    # WHEN we write frames
+    # THEN we expect the error of the threads to be raised by a later write or by close, and close to be safe to repeat
+    with pytest.raises(FileNotFoundError):
+        with contextlib.closing(writer):
+            for i in range(100):
+                writer.write(f"{i:04}.json", b"{}", True)
+    writer.close()
+
+
+def test_writer_progress_after_write(tmp_path, capsys, monkeypatch):
+    # GIVEN a threaded writer that reports every frame, and a check of each file reported as written
+    writer = framebuilder.FrameFileWriter(str(tmp_path), 10, threads=2, progress_interval=0)
+    reported = []
+    monkeypatch.setattr(framebuilder, 'print', lambda line: reported.append(
+        os.path.exists(line.rsplit(' ', 1)[-1])), raising=False)
+    # WHEN we write frames
+    with contextlib.closing(writer):
+        for i in range(10):
+            writer.write(f"{i:04}.json", b"{}", True)
+    # THEN we expect every frame to be reported once its file exists
+    assert reported == [True] * 10
+
+
+def test_parallel_build_writer(frame_file, tmp_path, monkeypatch):
+    # GIVEN a count of the frame file writers created in this process
+    writers = []
+    original = framebuilder.FrameFileWriter.__init__
+
+    def init(self, *args, **kwargs):
+        writers.append(self)
+        original(self, *args, **kwargs)
+    monkeypatch.setattr(framebuilder.FrameFileWriter, '__init__', init)
+    # WHEN we build in several processes, and in this one
+    framebuilder.build(frame_file, str(tmp_path / 'parallel'), jobs=2)
+    framebuilder.build(frame_file, str(tmp_path / 'serial'))
+    # THEN we expect only the build in this process to create a writer here
+    assert len(writers) == 1
+
+
+def test_numpy_imported_on_first_use(frame_file, tmp_path):
+    import subprocess
+    import sys
+    # GIVEN a build of a scene that is not evaluated in batches, in a process of its own
+    script = ("import sys, framebuilder; framebuilder.build(sys.argv[1], sys.argv[2]); "
+              "print('numpy' in sys.modules)")
+    output = subprocess.run([sys.executable, '-c', script, frame_file, str(tmp_path)], capture_output=True, text=True,
+                            check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.split()
+    # THEN we expect NumPy not to be imported
+    assert output[-1] == 'False'
@@ -0,0 +1,33 @@
+import os
+
+import framebuilder
+import preview
+import pytest
+
+pytest.importorskip("numpy")
+
+
+def read_previews(out_dir):
+    previews = {}
+    for name in sorted(os.listdir(out_dir)):
+        with open(os.path.join(out_dir, name), 'rb') as f:
+            previews[name] = f.read()
+    return previews
+
+
+def test_preview_formats(tmp_path):
+    # GIVEN the same animation written as frame files, as a container and as patches against a base scene
+    script = {'scene': 'PlanetScene', 'params': {'num_frames': 12}}
+    framebuilder.build(script, str(tmp_path / 'files'))
+    framebuilder.build(script, str(tmp_path / 'container'), format='container')
+    framebuilder.build(script, str(tmp_path / 'delta'), delta=True)
+    # WHEN we preview every third frame of each
+    preview.main([str(tmp_path / 'files'), str(tmp_path / 'files_preview'), '--every', '3'])
+    preview.main([str(tmp_path / 'container' / framebuilder.CONTAINER_NAME), str(tmp_path / 'container_preview'),
+                  '--every', '3'])
+    preview.main([str(tmp_path / 'delta'), str(tmp_path / 'delta_preview'), '--every', '3'])
+    # THEN we expect the same previews
+    previews = read_previews(tmp_path / 'files_preview')
+    assert list(previews) == ['0000.ppm', '0003.ppm', '0006.ppm', '0009.ppm']
+    assert read_previews(tmp_path / 'container_preview') == previews
+    assert read_previews(tmp_path / 'delta_preview') == previews